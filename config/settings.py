@@ -6,7 +6,7 @@
 
 import os
 from dataclasses import dataclass
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 @dataclass
 class Config:
@@ -22,11 +22,56 @@ class Config:
     temperature: float = 0.1
     max_retries: int = 3
     retry_delay: int = 2
+    retry_max_delay: float = 60.0  # Максимальная вычисленная задержка между повторами (Retry-After сервера - как есть)
+    retry_budget: float = 300.0  # Общий лимит ожидания повторов одного вызова (сек)
+    connect_timeout: float = 10.0
+    read_timeout: float = 120.0
+    gzip_min_bytes: Optional[int] = None  # Сжимать тела запросов больше N байт (None - не сжимать)
+    streaming: bool = False  # Потоковые ответы (SSE): TTFT, токены/сек, раннее обнаружение зависаний
+    stream_stall_timeout: float = 30.0  # Максимальная пауза в потоке ответа (сек)
+    
+    # Кэш ответов LLM
+    cache_enabled: bool = True
+    cache_path: str = "cache/llm_cache.sqlite"
+    cache_max_mb: int = 512
+    cache_ttl_days: float = 30.0
+    cache_compression: str = "zstd"  # zstd (если установлен zstandard) / zlib / none
+    cache_bypass: bool = False  # Не читать кэш (ответы все равно сохраняются)
+    
+    # Контрольные точки прогонов (продолжение прерванного анализа)
+    # Включаются явно: каждый прогон хранит в checkpoint_dir копию транскриптов и все ответы API
+    checkpoint_enabled: bool = False
+    checkpoint_dir: str = "runs"
+    
+    # Кэш метаданных моделей (/models)
+    models_cache_path: str = "cache/models.json"
+    models_cache_ttl_hours: float = 24.0
     
     # Настройки обработки
-    chunk_size: int = 8000
-    chunk_overlap: int = 1000
+    chunk_size: Optional[int] = None  # Бюджет токенов чанка транскрипта (None - доля контекста модели)
+    chunk_overlap: int = 300  # Перекрытие соседних чанков в токенах (целыми репликами)
+    stage_context_tokens: int = 2500  # Контекст промпта этапа: релевантные фрагменты саммари и транскрипта
+    duplicate_threshold: Optional[float] = 0.85  # Сходство, начиная с которого транскрипт - дубликат (None - не искать)
+    drop_duplicates: bool = True  # False - только предупреждать о дубликатах
     min_quote_length: int = 50
+    max_workers: int = 3  # Количество интервью, анализируемых одновременно
+    max_concurrent_requests: int = 8  # Общий лимит одновременных запросов к API
+    adaptive_concurrency: bool = True  # Снижать лимит запросов при 429/5xx и росте задержки, повышать при норме
+    min_concurrent_requests: int = 1  # Нижняя граница адаптивного лимита
+    fan_out_stages: bool = False  # Параллельный запуск этапов внутри интервью
+    extraction_mode: str = "staged"  # staged - отдельный вызов на этап, fused - один вызов на интервью
+    structured_output: bool = True  # JSON-схема ответа в response_format (для моделей со structured_outputs)
+    repair_invalid: bool = True  # Исправлять невалидные ответы этапов (локально или вызовом по фрагменту)
+    max_continuations: int = 2  # Продолжений ответа, обрезанного по max_tokens
+    # Маршруты этапов: {"chunk": {"model": "anthropic/claude-3-haiku", "max_tokens": 2048, "cascade": True}}
+    # (model "auto" - самая дешевая из router_models; этап "*" - маршрут по умолчанию)
+    stage_routes: Optional[Dict[str, Any]] = None
+    router_models: Optional[list] = None  # Модели-кандидаты для маршрутов с model "auto"
+    adaptive_limits: bool = True  # max_tokens и таймауты этапов по истории вызовов (маршрут их переопределяет)
+    call_profile_path: Optional[str] = "cache/call_profile.json"  # История вызовов между прогонами
+    async_max_in_flight: int = 64  # Лимит запросов в полете для асинхронного анализа
+    async_call_timeout: float = 180.0  # Дедлайн одного вызова API в асинхронном режиме (сек)
+    cross_group_tokens: Optional[int] = None  # Бюджет токенов группы кросс-анализа (None - по контексту модели)
     
     # Настройки отчетов
     output_formats: list = None
@@ -50,7 +95,21 @@ class Config:
             'model': self.openrouter_model,
             'base_url': self.openrouter_base_url,
             'max_tokens': self.max_tokens,
-            'temperature': self.temperature
+            'temperature': self.temperature,
+            'connect_timeout': self.connect_timeout,
+            'read_timeout': self.read_timeout,
+            'gzip_min_bytes': self.gzip_min_bytes,
+            'streaming': self.streaming,
+            'stream_stall_timeout': self.stream_stall_timeout
+        }
+    
+    def get_cache_config(self) -> Dict[str, Any]:
+        """Получение конфигурации кэша ответов"""
+        return {
+            'path': self.cache_path,
+            'max_bytes': self.cache_max_mb * 1024 * 1024,
+            'ttl': self.cache_ttl_days * 24 * 3600 if self.cache_ttl_days else None,
+            'compression': self.cache_compression
         }
     
     def get_analysis_config(self) -> Dict[str, Any]:
@@ -58,7 +117,27 @@ class Config:
         return {
             'chunk_size': self.chunk_size,
             'chunk_overlap': self.chunk_overlap,
+            'stage_context_tokens': self.stage_context_tokens,
+            'duplicate_threshold': self.duplicate_threshold,
+            'drop_duplicates': self.drop_duplicates,
             'min_quote_length': self.min_quote_length,
             'max_retries': self.max_retries,
-            'retry_delay': self.retry_delay
+            'retry_delay': self.retry_delay,
+            'retry_max_delay': self.retry_max_delay,
+            'retry_budget': self.retry_budget,
+            'max_workers': self.max_workers,
+            'max_concurrent_requests': self.max_concurrent_requests,
+            'adaptive_concurrency': self.adaptive_concurrency,
+            'min_concurrent_requests': self.min_concurrent_requests,
+            'fan_out_stages': self.fan_out_stages,
+            'extraction_mode': self.extraction_mode,
+            'structured_output': self.structured_output,
+            'repair_invalid': self.repair_invalid,
+            'max_continuations': self.max_continuations,
+            'stage_routes': self.stage_routes,
+            'router_models': self.router_models,
+            'adaptive_limits': self.adaptive_limits,
+            'async_max_in_flight': self.async_max_in_flight,
+            'async_call_timeout': self.async_call_timeout,
+            'cross_group_tokens': self.cross_group_tokens
         }
@@ -5,17 +5,74 @@
 """
 
 import json
-import re
 import time
+import asyncio
+import threading
+import concurrent.futures
 import numpy as np
-from typing import List, Dict, Any, Optional, Union
-from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Union, Callable, Tuple, Awaitable
+from dataclasses import dataclass, field, asdict
 from tqdm import tqdm
 
-from .openrouter_client import OpenRouterClient
-from .brief_manager import BriefManager
+from .openrouter_client import OpenRouterClient, CompletionResult
+from .async_client import AsyncOpenRouterClient
+from .retry import RetryPolicy, APIError
+from .cache import ResponseCache, make_cache_key
+from .streaming import StreamItemSink
+from .checkpoint import RunCheckpoint
+from .chunking import TurnChunker
+from .tokens import estimate_tokens
+from .retrieval import build_passage_index
+from .dedup import find_near_duplicates, DuplicateReport
+from .quote_index import TranscriptIndex, verify_summary_quotes, verify_insight_quotes, quote_verification_stats
+from .json_extract import (parse_stage_response, summarize_parse_stats, StageParse, STAGE_SCHEMAS,
+                           PARSE_OK, PARSE_FAILED, PARSE_PARTIAL)
+from .schemas import structured_output_mode, response_format_for, fields_schema, MODE_PROMPT, MODE_JSON_SCHEMA
+from .call_profile import CallProfile
+from .concurrency import AdaptiveLimiter
+from .routing import (ModelRouter, RouteDecision, parse_routes, cascade_verdict, summarize_cascade_stats,
+                      REPAIR_SUFFIX)
+from .repair import (RepairRequest, DEFAULT_MAX_CONTINUATIONS, is_truncated, repair_locally, salvage,
+                     build_repair_request, apply_repair, is_improved, merge_continuation, summarize_repair_stats)
+from .brief_manager import BriefManager, BriefData
 from .data_models import InterviewSummary, ResearchFindings
 
+# Версия шаблонов промптов: входит в ключ кэша, менять при правке промптов
+PROMPT_TEMPLATE_VERSION = "25.2"
+
+# Сколько секунд считается действительной успешная проверка подключения
+PREFLIGHT_TTL = 600
+
+# Контекст модели, если /models недоступен
+DEFAULT_CONTEXT_LENGTH = 128000
+
+# Кросс-анализ: доля контекста под данные одной группы и число результатов на одно слияние
+CROSS_CONTEXT_FRACTION = 0.5
+CROSS_REDUCE_FAN_IN = 4
+
+# Доля контекста модели под текст одного чанка транскрипта (остальное - бриф, инструкции и ответ)
+CHUNK_CONTEXT_FRACTION = 0.1
+
+# Запросы для отбора фрагментов саммари и транскрипта под каждый этап
+STAGE_CONTEXT_QUERIES = {
+    'profile': "респондент профиль возраст профессия работа должность опыт стаж семья город образование "
+               "привычки мотивация образ жизни технологии тема интерес",
+    'pains': "проблема боль сложно трудно неудобно раздражает мешает бесит долго ошибка не работает "
+             "нужно хочу хотелось потребность ожидаю важно не хватает приходится",
+    'emotions': "чувствую эмоция нравится радует расстраивает злюсь боюсь переживаю доволен разочарован "
+                "удивился обидно приятно страшно инсайт понял оказалось",
+    'quotes': "цитата говорит сказал считаю думаю уверен противоречие но однако хотя зато с одной стороны "
+              "на самом деле обычно всегда никогда",
+    'business': "деньги стоимость цена платить подписка выручка затраты конкуренты альтернатива обходной путь "
+                "решение возможность улучшение предложение компания бизнес",
+}
+
+# Объединенный режим получает контекст на все этапы сразу
+FUSED_CONTEXT_MULTIPLIER = 2
+
+# Поля профиля респондента - списки (RespondentProfile) в обоих режимах извлечения
+PROFILE_LIST_FIELDS = ('motivations', 'unique_traits')
+
 @dataclass
 class AnalysisResult:
     """Результат анализа"""
@@ -25,165 +82,632 @@ class AnalysisResult:
     analysis_duration: float = 0.0
     api_calls: int = 0
     total_cost: float = 0.0
+    usage_ledger: List[Dict[str, Any]] = field(default_factory=list)  # Токены/стоимость/задержка каждого вызова
+    token_usage: Dict[str, Any] = field(default_factory=dict)  # Итоги и разбивка по этапам
+    cross_analysis: Dict[str, Any] = field(default_factory=dict)  # Агрегат кросс-анализа (для добавления интервью)
+    run_metadata: Dict[str, Any] = field(default_factory=dict)  # Параметры прогона (группы кросс-анализа и т.п.)
+    # Проанализированные транскрипты (для поиска дубликатов при добавлении интервью)
+    transcripts: List[str] = field(default_factory=list, repr=False)
+
+@dataclass
+class _AsyncRun:
+    """Состояние одного прогона конвейера
+    
+    max_interviews - интервью, анализируемых одновременно (None - все);
+    fan_out - чанки и этапы интервью отправляются одновременно, а не по очереди.
+    """
+    client: AsyncOpenRouterClient
+    slots: asyncio.Semaphore
+    call_timeout: Optional[float] = None
+    extraction_mode: str = "staged"
+    max_interviews: Optional[int] = None
+    fan_out: bool = True
 
 class OpenRouterAnalyzer:
     """Основной класс анализатора с использованием OpenRouter API"""
     
-    def __init__(self, api_key: str, model: str = "anthropic/claude-3.5-sonnet"):
-        self.client = OpenRouterClient(api_key, model)
+    def __init__(self, api_key: str, model: str = "anthropic/claude-3.5-sonnet", max_workers: int = 3,
+                 max_concurrent_requests: int = 8, fan_out_stages: bool = False,
+                 connect_timeout: float = 10.0, read_timeout: float = 120.0,
+                 gzip_min_bytes: Optional[int] = None, async_max_in_flight: int = 64,
+                 async_call_timeout: Optional[float] = 180.0, max_retries: int = 3,
+                 retry_delay: float = 2.0, retry_max_delay: float = 60.0, retry_budget: float = 300.0,
+                 max_tokens: int = 8192, temperature: float = 0.1,
+                 response_cache: Optional[ResponseCache] = None, cache_bypass: bool = False,
+                 models_cache_path: Optional[str] = "cache/models.json", models_cache_ttl: float = 24 * 3600,
+                 extraction_mode: str = "staged", base_url: str = "https://openrouter.ai/api/v1",
+                 streaming: bool = False, stream_stall_timeout: float = 30.0,
+                 checkpoint_dir: Optional[str] = None, cross_group_tokens: Optional[int] = None,
+                 chunk_size: Optional[int] = None, chunk_overlap: int = 300,
+                 stage_context_tokens: int = 2500, duplicate_threshold: Optional[float] = 0.85,
+                 drop_duplicates: bool = True, structured_output: bool = True, repair_invalid: bool = True,
+                 max_continuations: int = DEFAULT_MAX_CONTINUATIONS,
+                 stage_routes: Optional[Dict[str, Dict[str, Any]]] = None, router_models: Optional[List[str]] = None,
+                 adaptive_limits: bool = True, call_profile_path: Optional[str] = None,
+                 adaptive_concurrency: bool = True, min_concurrent_requests: int = 1):
+        # Общая политика повторов для синхронного и асинхронного клиентов
+        self.retry_policy = RetryPolicy(max_retries=max_retries, base_delay=retry_delay,
+                                        max_delay=retry_max_delay, total_budget=retry_budget)
+        
+        # Адаптивный лимит запросов в полете (AIMD по 429/5xx и задержке), общий для всех клиентов:
+        # начинает с половины max_concurrent_requests и медленным стартом растет до предела текущего
+        # прогона (max_concurrent_requests или async_max_in_flight, см. _create_run), пока нет перегрузки.
+        self.limiter = AdaptiveLimiter(initial=max(min_concurrent_requests, max_concurrent_requests // 2),
+                                       min_limit=min_concurrent_requests,
+                                       max_limit=max_concurrent_requests) if adaptive_concurrency else None
+        
+        # Пул соединений рассчитан на глобальный лимит одновременных запросов
+        self.client = OpenRouterClient(api_key, model, pool_size=max_concurrent_requests,
+                                       connect_timeout=connect_timeout, read_timeout=read_timeout,
+                                       gzip_min_bytes=gzip_min_bytes, retry_policy=self.retry_policy,
+                                       models_cache_path=models_cache_path, models_cache_ttl=models_cache_ttl,
+                                       base_url=base_url, limiter=self.limiter)
         self.brief_manager = BriefManager()
         self.analysis_config = {
-            'chunk_size': 8000,
-            'chunk_overlap': 1000,
+            'chunk_size': chunk_size,  # токенов; None - доля контекста модели
+            'chunk_overlap': chunk_overlap,  # токенов, целыми репликами
+            'stage_context_tokens': stage_context_tokens,  # контекст промпта этапа (саммари + транскрипт)
+            'duplicate_threshold': duplicate_threshold,  # сходство почти одинаковых транскриптов (None - не искать)
+            'drop_duplicates': drop_duplicates,  # False - только предупреждать о дубликатах
             'min_quote_length': 50,
-            'max_retries': 3
+            'max_retries': max_retries,
+            'max_workers': max_workers,
+            'max_concurrent_requests': max_concurrent_requests,
+            'fan_out_stages': fan_out_stages,
+            'async_max_in_flight': async_max_in_flight,
+            'async_call_timeout': async_call_timeout,
+            'max_tokens': max_tokens,
+            'temperature': temperature,
+            'extraction_mode': extraction_mode,  # staged - 5-6 вызовов по этапам, fused - один вызов
+            'streaming': streaming,  # SSE: TTFT, скорость генерации и обнаружение зависаний
+            'stream_stall_timeout': stream_stall_timeout,
+            'cross_group_tokens': cross_group_tokens,  # None - по контексту модели
+            'structured_output': structured_output,  # response_format с JSON-схемой этапа, если модель поддерживает
+            'repair_invalid': repair_invalid,  # исправление невалидных ответов вместо пустого результата этапа
+            'max_continuations': max_continuations,  # продолжений ответа, обрезанного по max_tokens
+            'stage_routes': stage_routes or {},  # этап -> модель, max_tokens, temperature, timeout, cascade
+            'router_models': list(router_models or []),  # кандидаты для маршрутов с model="auto"
+            'adaptive_limits': adaptive_limits,  # max_tokens и таймауты этапов по истории вызовов
+            'adaptive_concurrency': adaptive_concurrency,  # лимит запросов в полете по 429/5xx и задержке
+            'min_concurrent_requests': min_concurrent_requests
         }
         
-        # Статистика
+        # Профиль вызовов: фактические токены ответа и задержки по этапам и моделям
+        # (call_profile_path - файл профиля между прогонами, None - только в памяти)
+        self.call_profile = CallProfile(call_profile_path) if adaptive_limits else None
+        
+        # Маршрутизация вызовов по этапам (без таблицы - все этапы на основной модели)
+        self.router = ModelRouter(parse_routes(stage_routes), model, max_tokens, temperature,
+                                  self.client.get_model_info, router_models, self.call_profile)
+        
+        # Кэш ответов (None - без кэша); cache_bypass - не читать кэш, только обновлять
+        self.cache = response_cache
+        self.cache_bypass = cache_bypass
+        
+        # Контрольные точки: каждый прогон сохраняется в checkpoint_dir/<run_id> (None - не сохранять)
+        self.checkpoint_dir = checkpoint_dir
+        self._checkpoint: Optional[RunCheckpoint] = None
+        self._resume_checkpoint: Optional[RunCheckpoint] = None
+        
+        # Слушатель потоковых ответов: stream_listener(stage, interview_id, key, item)
+        # получает элементы массивов JSON (например, pain_points) до конца ответа
+        self.stream_listener: Optional[Callable[[str, Optional[int], Optional[str], Any], None]] = None
+        
+        # Статистика (обновляется из нескольких потоков)
         self.api_calls = 0
         self.total_cost = 0.0
+        self.usage_ledger: List[Dict[str, Any]] = []
+        self.run_metadata: Dict[str, Any] = {}
+        self._stats_lock = threading.Lock()
+        
+        # Индексы транскриптов текущего прогона для проверки цитат (номер интервью -> индекс)
+        self._quote_indices: Dict[int, TranscriptIndex] = {}
+        
+        # Результаты разбора JSON ответов по этапам (этап -> статус -> число ответов)
+        self._parse_stats: Dict[str, Dict[str, int]] = {}
+        
+        # Режим структурированного вывода каждой модели (json_schema / json_object / prompt)
+        self._structured_modes: Dict[str, str] = {}
+        
+        # Исправления ответов по этапам: продолжения, локальные исправления, вызовы исправления
+        self._repair_stats: Dict[str, Dict[str, int]] = {}
+        
+        # Каскад дешевая -> сильная модель по этапам: попытки, эскалации и их причины
+        self._cascade_stats: Dict[str, Dict[str, int]] = {}
+        
+        # Предварительная проверка API (выполняется в фоне при запуске UI)
+        self._preflight_lock = threading.Lock()
+        self._warmup_thread: Optional[threading.Thread] = None
+        self._preflight_result: Optional[Dict[str, Any]] = None
     
     def set_brief(self, brief_content: str) -> bool:
         """Установка брифа исследования"""
         return self.brief_manager.load_brief(brief_content)
     
-    def test_api_connection(self) -> bool:
-        """Тестирование подключения к API"""
-        print("🔌 Тестирование подключения к OpenRouter API...")
-        success = self.client.test_connection()
-        if success:
-            print("✅ Подключение успешно!")
+    def start_warmup(self):
+        """Фоновый прогрев: проверка ключа, каталог моделей и цены
+        
+        Вызывается при запуске интерфейса, пока пользователь загружает бриф,
+        чтобы анализ не ждал сетевых запросов.
+        """
+        with self._preflight_lock:
+            if self._warmup_thread is not None and self._warmup_thread.is_alive():
+                return
+            if self._preflight_result and time.time() - self._preflight_result['checked_at'] < PREFLIGHT_TTL:
+                return
+            self._warmup_thread = threading.Thread(target=self._run_preflight, name="api-warmup", daemon=True)
+            self._warmup_thread.start()
+    
+    def _run_preflight(self):
+        """Проверка ключа и загрузка метаданных модели"""
+        auth = self.client.check_auth()
+        model_info = {}
+        if auth is not False:
             model_info = self.client.get_model_info()
             if "error" not in model_info:
-                print(f"📊 Модель: {model_info.get('name', 'Claude 3.5 Sonnet')}")
-                print(f"📏 Контекст: {model_info.get('context_length', 'N/A')} токенов")
+                # Цены всех моделей маршрутов - заранее, чтобы выбор модели не ждал сети
+                for model in self.router.models():
+                    self.client.get_model_pricing(model)
+        self._preflight_result = {
+            'auth': auth,
+            'model_info': model_info,
+            'checked_at': time.time()
+        }
+    
+    def test_api_connection(self) -> bool:
+        """Тестирование подключения к API (кэшированный preflight)"""
+        print("🔌 Тестирование подключения к OpenRouter API...")
+        self.start_warmup()
+        thread = self._warmup_thread
+        if thread is not None:
+            thread.join()
+        
+        preflight = self._preflight_result or {'auth': None, 'model_info': {}}
+        if preflight['auth'] is False:
+            print("❌ Подключение не удалось: API ключ отклонен!")
+            # Повторная проверка при следующем запуске
+            self._preflight_result = None
+            return False
+        
+        if preflight['auth'] is None:
+            print("⚠️ Ключ не проверен: подключение будет проверено первым запросом")
         else:
-            print("❌ Подключение не удалось!")
-        return success
+            print("✅ Подключение успешно!")
+        
+        model_info = preflight['model_info']
+        if model_info and "error" not in model_info:
+            print(f"📊 Модель: {model_info.get('name', 'Claude 3.5 Sonnet')}")
+            print(f"📏 Контекст: {model_info.get('context_length', 'N/A')} токенов")
+        return True
     
-    def analyze_transcripts(self, transcripts: List[str]) -> AnalysisResult:
-        """Основной метод анализа транскриптов"""
-        start_time = time.time()
+    def analyze_transcripts(self, transcripts: List[str], extraction_mode: Optional[str] = None) -> AnalysisResult:
+        """Основной метод анализа транскриптов (интервью по очереди)"""
+        return self._run_sync(self._analyze_async(
+            transcripts, engine="sequential", label="Анализ", extraction_mode=extraction_mode,
+            max_in_flight=self.analysis_config['max_concurrent_requests'], max_interviews=1,
+            fan_out=self.analysis_config['fan_out_stages']))
+    
+    def analyze_transcripts_parallel(self, transcripts: List[str], max_workers: Optional[int] = None,
+                                     extraction_mode: Optional[str] = None) -> AnalysisResult:
+        """Параллельный анализ транскриптов (до max_workers интервью одновременно)"""
+        return self._run_sync(self._analyze_async(
+            transcripts, engine="parallel", label="Параллельный анализ", extraction_mode=extraction_mode,
+            max_in_flight=self.analysis_config['max_concurrent_requests'],
+            max_interviews=max_workers or self.analysis_config['max_workers'],
+            fan_out=self.analysis_config['fan_out_stages']))
+    
+    def _run_sync(self, coro: Awaitable[AnalysisResult]) -> AnalysisResult:
+        """Выполнение асинхронного конвейера из синхронного кода
         
-        print(f"🧠 Начинаю анализ {len(transcripts)} транскриптов...")
+        Синхронные методы - обертки над асинхронным конвейером. Если в потоке
+        уже работает event loop (Jupyter), конвейер выполняется в отдельном потоке.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(coro)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, coro).result()
+    
+    def resume_analysis(self, run_dir: str, engine: Optional[str] = None) -> AnalysisResult:
+        """Продолжение прерванного прогона из каталога контрольных точек
         
-        if not self.test_api_connection():
-            raise Exception("Не удалось подключиться к API")
+        Готовые интервью и ответы API берутся из контрольной точки; заново
+        выполняются только недостающие шаги, включая кросс-анализ и финальные выводы.
+        """
+        checkpoint = RunCheckpoint(run_dir)
+        if not checkpoint.manifest:
+            raise ValueError(f"Контрольная точка не найдена: {run_dir}")
         
-        # Проверка количества интервью
-        if len(transcripts) < 3:
-            print(f"⚠️  ВНИМАНИЕ: Рекомендуется минимум 3 интервью для качественного анализа!")
+        status = checkpoint.get_status()
+        print(f"♻️ Продолжение прогона {status['run_id']}: готово {status['completed_interviews']}"
+              f"/{status['total_interviews']} интервью, сохранено шагов: {status['saved_steps']}")
         
-        # Анализ каждого интервью
-        interview_summaries = []
-        for i, transcript in enumerate(tqdm(transcripts, desc="Анализ интервью")):
-            print(f"\n📝 Анализ интервью {i+1}/{len(transcripts)}...")
-            summary = self._deep_analyze_interview(transcript, i+1)
-            interview_summaries.append(summary)
+        # Бриф прогона нужен для тех же промптов, что и в исходном запуске;
+        # текущий бриф возвращается после продолжения
+        saved_brief = (self.brief_manager.brief_data, self.brief_manager.has_brief)
+        brief = checkpoint.manifest.get('brief')
+        current = asdict(self.brief_manager.brief_data) if self.brief_manager.has_brief else None
+        if brief != current:
+            print("⚠️ Бриф прогона отличается от текущего: продолжение идет с брифом прогона"
+                  if brief else "⚠️ Прогон запущен без брифа: текущий бриф не используется при продолжении")
+        self.brief_manager.brief_data = BriefData(**brief) if brief else BriefData()
+        self.brief_manager.has_brief = bool(brief)
         
-        # Кросс-анализ
-        print("\n🔍 Проведение кросс-анализа...")
-        cross_analysis = self._cross_analyze_interviews(interview_summaries)
+        transcripts = checkpoint.load_transcripts()
+        extraction_mode = checkpoint.manifest.get('extraction_mode')
+        engine = engine or checkpoint.manifest.get('engine', 'parallel')
         
-        # Генерация финальных выводов
-        print("\n📊 Генерация финальных выводов...")
-        findings = self._generate_final_findings(interview_summaries, cross_analysis)
+        self._resume_checkpoint = checkpoint
+        try:
+            if engine == 'incremental':
+                first_id = checkpoint.manifest['first_interview_id']
+                base = AnalysisResult(
+                    interview_summaries=[summary for summary in checkpoint.load_all_summaries()
+                                         if summary.interview_id < first_id],
+                    api_calls=checkpoint.manifest.get('base_api_calls', 0),
+                    total_cost=checkpoint.manifest.get('base_total_cost', 0.0),
+                    usage_ledger=checkpoint.load_artifact('base_usage_ledger') or [],
+                    cross_analysis=checkpoint.load_artifact('base_cross_analysis') or {},
+                    transcripts=checkpoint.load_artifact('base_transcripts') or []
+                )
+                return self.add_transcripts(base, transcripts, extraction_mode=extraction_mode)
+            if engine == 'async':
+                return self._run_sync(self.analyze_transcripts_async(transcripts, extraction_mode=extraction_mode))
+            if engine == 'parallel':
+                return self.analyze_transcripts_parallel(transcripts, extraction_mode=extraction_mode)
+            return self.analyze_transcripts(transcripts, extraction_mode=extraction_mode)
+        finally:
+            self._resume_checkpoint = None
+            self.brief_manager.brief_data, self.brief_manager.has_brief = saved_brief
+    
+    def _filter_duplicates(self, transcripts: List[str], base: Optional[List[str]] = None,
+                           first_id: int = 1) -> Tuple[List[str], List[int]]:
+        """Поиск почти одинаковых транскриптов перед анализом (с записью в run_metadata)
         
-        # Создание результата
-        result = AnalysisResult(
-            interview_summaries=interview_summaries,
-            research_findings=findings,
-            total_interviews=len(transcripts),
-            analysis_duration=time.time() - start_time,
-            api_calls=self.api_calls,
-            total_cost=self.total_cost
+        Один и тот же разговор часто загружают дважды (.txt и .docx, очищенная
+        версия): дубликат удваивает стоимость и счет болей в кросс-анализе.
+        base - уже проанализированные транскрипты (при добавлении интервью):
+        новый транскрипт, совпадающий с одним из них, тоже считается дубликатом.
+        
+        Возвращает оставленные транскрипты и их номера интервью: номер -
+        first_id + позиция транскрипта во входном списке, поэтому после
+        пропуска дубликата номера остальных интервью не сдвигаются.
+        """
+        checkpoint = self._resume_checkpoint
+        if checkpoint is not None:
+            # Транскрипты прогона сохранены уже без дубликатов: номера и отчет - из контрольной точки
+            if checkpoint.manifest.get('duplicates'):
+                self.run_metadata['duplicates'] = checkpoint.manifest['duplicates']
+            return transcripts, (checkpoint.manifest.get('interview_ids') or
+                                 list(range(first_id, first_id + len(transcripts))))
+        
+        interview_ids = list(range(first_id, first_id + len(transcripts)))
+        threshold = self.analysis_config['duplicate_threshold']
+        base = base or []
+        if not threshold or not transcripts or len(base) + len(transcripts) < 2:
+            return transcripts, interview_ids
+        
+        # Из группы дубликатов остается самый ранний текст, поэтому прежние транскрипты не отбрасываются
+        offset = len(base)
+        combined = find_near_duplicates(base + transcripts, threshold)
+        report = DuplicateReport(
+            total=len(transcripts),
+            kept=[i - offset for i in combined.kept if i >= offset],
+            duplicates={i - offset: (original - offset, similarity)
+                        for i, (original, similarity) in combined.duplicates.items() if i >= offset}
         )
+        report.saved_tokens = sum(estimate_tokens(transcripts[i]) for i in report.duplicates)
+        if not report.has_duplicates:
+            return transcripts, interview_ids
         
-        print(f"\n✅ Анализ завершен за {result.analysis_duration:.1f} сек")
-        print(f"📡 API вызовов: {self.api_calls}")
-        print(f"💰 Примерная стоимость: ${self.total_cost:.4f}")
+        for index, (original, similarity) in sorted(report.duplicates.items()):
+            match = (f"уже проанализированным транскриптом {original + offset + 1}" if original < 0
+                     else f"{original + 1}")
+            print(f"♊ Транскрипт {index + 1} почти совпадает с {match} (сходство {similarity:.0%})")
+        dropped = self.analysis_config['drop_duplicates']
+        # Отрицательный original - номер среди прежних транскриптов: original + base_transcripts
+        self.run_metadata['duplicates'] = {**report.to_dict(), 'base_transcripts': offset, 'dropped': dropped}
+        if not dropped:
+            print(f"⚠️ Дубликатов: {len(report.duplicates)} - будут проанализированы (drop_duplicates=False)")
+            return transcripts, interview_ids
         
-        return result
+        skipped = [interview_ids[i] for i in sorted(report.duplicates)]
+        self.run_metadata['duplicates']['skipped_interview_ids'] = skipped
+        print(f"✂️ Пропущено дубликатов: {len(report.duplicates)}, "
+              f"экономия ~{report.saved_tokens:,} токенов транскриптов")
+        print(f"   Номера интервью - по порядку загрузки, без номеров {', '.join(map(str, skipped))}")
+        return [transcripts[i] for i in report.kept], [interview_ids[i] for i in report.kept]
     
-    def analyze_transcripts_parallel(self, transcripts: List[str]) -> AnalysisResult:
-        """Параллельный анализ транскриптов"""
+    def _begin_checkpoint(self, transcripts: List[str], extraction_mode: Optional[str], engine: str,
+                          extra: Optional[Dict[str, Any]] = None) -> bool:
+        """Контрольная точка прогона: продолжаемая (resume_analysis) или новая
+        
+        Возвращает True, если создана новая контрольная точка.
+        """
+        if self._resume_checkpoint is not None:
+            self._checkpoint = self._resume_checkpoint
+            self._checkpoint.update_manifest(status="running")
+            return False
+        
+        self._checkpoint = None
+        if not self.checkpoint_dir:
+            return False
+        try:
+            self._checkpoint = RunCheckpoint.create(self.checkpoint_dir, transcripts, {
+                'engine': engine,
+                'model': self.client.model,
+                'extraction_mode': extraction_mode or self.analysis_config['extraction_mode'],
+                'prompt_version': PROMPT_TEMPLATE_VERSION,
+                'brief': asdict(self.brief_manager.brief_data) if self.brief_manager.has_brief else None,
+                **(extra or {})
+            })
+            print(f"💾 Контрольные точки: {self._checkpoint.run_dir}")
+            return True
+        except OSError as e:
+            print(f"⚠️ Контрольные точки отключены: {e}")
+            return False
+    
+    def load_analysis_result(self, run_dir: str) -> AnalysisResult:
+        """Результат завершенного прогона из каталога контрольных точек
+        
+        Нужен, чтобы добавлять интервью к исследованию в следующих сессиях.
+        """
+        checkpoint = RunCheckpoint(run_dir)
+        if checkpoint.manifest.get('status') != 'complete':
+            raise ValueError(f"Прогон не завершен: {run_dir} (используйте resume_analysis)")
+        
+        findings_data = checkpoint.load_artifact('research_findings')
+        ledger = checkpoint.load_artifact('usage_ledger') or []
+        return AnalysisResult(
+            interview_summaries=checkpoint.load_all_summaries(),
+            research_findings=ResearchFindings(**findings_data) if findings_data else None,
+            total_interviews=checkpoint.manifest.get('study_interviews', 0),
+            api_calls=checkpoint.manifest.get('study_api_calls', 0),
+            total_cost=checkpoint.manifest.get('study_total_cost', 0.0),
+            usage_ledger=ledger,
+            token_usage=self._summarize_usage(ledger),
+            cross_analysis=checkpoint.load_artifact('cross_analysis') or {},
+            transcripts=(checkpoint.load_artifact('base_transcripts') or []) + checkpoint.load_transcripts()
+        )
+    
+    def add_transcripts(self, existing_result: AnalysisResult, new_transcripts: List[str],
+                        max_workers: Optional[int] = None,
+                        extraction_mode: Optional[str] = None) -> AnalysisResult:
+        """Добавление новых интервью к готовому результату
+        
+        Анализируются только новые транскрипты; кросс-анализ обновляется по
+        сохраненному агрегату (existing_result.cross_analysis) и данным новых
+        интервью, без повторной передачи всех прежних саммари. Финальные выводы
+        строятся по обновленному кросс-анализу.
+        """
+        return self._run_sync(self._add_transcripts_async(existing_result, new_transcripts, max_workers,
+                                                          extraction_mode))
+    
+    async def _add_transcripts_async(self, existing_result: AnalysisResult, new_transcripts: List[str],
+                                     max_workers: Optional[int], extraction_mode: Optional[str]) -> AnalysisResult:
+        """Добавление новых интервью (см. add_transcripts)"""
         start_time = time.time()
+        base_summaries = list(existing_result.interview_summaries)
+        first_id = max((s.interview_id for s in base_summaries), default=0) + 1
         
-        print(f"🧠 Начинаю параллельный анализ {len(transcripts)} транскриптов...")
+        print(f"➕ Добавляю {len(new_transcripts)} интервью к {len(base_summaries)} проанализированным...")
+        self._reset_run_stats()
+        base_transcripts = list(existing_result.transcripts)
+        if base_summaries and not base_transcripts:
+            print("⚠️ Транскрипты прежних интервью недоступны: дубликаты ищутся только среди новых")
+        new_transcripts, interview_ids = self._filter_duplicates(new_transcripts, base=base_transcripts,
+                                                                 first_id=first_id)
+        if not new_transcripts:
+            print("ℹ️ Новых интервью нет: все транскрипты уже проанализированы")
+            return existing_result
         
-        if not self.test_api_connection():
+        created = self._begin_checkpoint(new_transcripts, extraction_mode, engine="incremental", extra={
+            'first_interview_id': first_id,
+            'base_interviews': len(base_summaries),
+            'base_api_calls': existing_result.api_calls,
+            'base_total_cost': existing_result.total_cost,
+            'interview_ids': interview_ids,
+            'duplicates': self.run_metadata.get('duplicates')
+        })
+        if created:
+            # Прежние саммари и агрегат - в ту же контрольную точку: прогон самодостаточен
+            for summary in base_summaries:
+                self._checkpoint.save_summary(summary)
+            self._checkpoint.save_artifact('base_cross_analysis', existing_result.cross_analysis)
+            self._checkpoint.save_artifact('base_usage_ledger', existing_result.usage_ledger)
+            self._checkpoint.save_artifact('base_transcripts', base_transcripts)
+        
+        if not await asyncio.to_thread(self.test_api_connection):
             raise Exception("Не удалось подключиться к API")
         
-        # Проверка количества интервью
-        if len(transcripts) < 3:
-            print(f"⚠️  ВНИМАНИЕ: Рекомендуется минимум 3 интервью для качественного анализа!")
+        run = self._create_run(extraction_mode, self.analysis_config['max_concurrent_requests'],
+                               max_interviews=max_workers or self.analysis_config['max_workers'],
+                               fan_out=self.analysis_config['fan_out_stages'])
+        async with run.client:
+            new_summaries = await self._analyze_interview_batch_async(run, new_transcripts, interview_ids)
+            all_summaries = base_summaries + new_summaries
         
-        # Простой параллельный анализ (без ThreadPoolExecutor для упрощения)
-        interview_summaries = []
-        for i, transcript in enumerate(tqdm(transcripts, desc="Параллельный анализ")):
-            print(f"\n📝 Анализ интервью {i+1}/{len(transcripts)}...")
-            summary = self._deep_analyze_interview(transcript, i+1)
-            interview_summaries.append(summary)
+            if existing_result.cross_analysis:
+                print("\n🔍 Обновление кросс-анализа...")
+                cross_analysis = await self._merge_cross_analysis_async(run, existing_result.cross_analysis,
+                                                                        len(base_summaries), new_summaries)
+            else:
+                cross_analysis = {}
+            if not cross_analysis:
+                # Нет агрегата (старый результат) или обновление не удалось - полный кросс-анализ
+                print("\n🔍 Проведение кросс-анализа...")
+                cross_analysis = await self._cross_analyze_interviews_async(run, all_summaries)
         
-        # Кросс-анализ
-        print("\n🔍 Проведение кросс-анализа...")
-        cross_analysis = self._cross_analyze_interviews(interview_summaries)
+            print("\n📊 Генерация финальных выводов...")
+            findings = await self._generate_final_findings_async(run, all_summaries, cross_analysis)
+            self.run_metadata['http_pool'] = run.client.get_pool_stats()
         
-        # Генерация финальных выводов
-        print("\n📊 Генерация финальных выводов...")
-        findings = self._generate_final_findings(interview_summaries, cross_analysis)
+        return self._build_analysis_result(all_summaries, findings, cross_analysis, len(all_summaries),
+                                           start_time, label="Добавление интервью", base=existing_result,
+                                           transcripts=new_transcripts)
+    
+    def _build_analysis_result(self, interview_summaries: List[InterviewSummary], findings: ResearchFindings,
+                               cross_analysis: Dict[str, Any], total_interviews: int, start_time: float,
+                               label: str, base: Optional[AnalysisResult] = None,
+                               transcripts: Optional[List[str]] = None) -> AnalysisResult:
+        """Создание результата и вывод итоговой статистики
         
-        # Создание результата
+        base - предыдущий результат при добавлении интервью: вызовы, стоимость,
+        журнал расхода и транскрипты суммируются с ним. transcripts -
+        проанализированные в этом прогоне транскрипты.
+        """
+        with self._stats_lock:
+            ledger = (list(base.usage_ledger) if base else []) + list(self.usage_ledger)
+        self._verify_findings_quotes(interview_summaries, findings)
+        with self._stats_lock:
+            self.run_metadata['json_parsing'] = summarize_parse_stats(self._parse_stats)
+            self.run_metadata['structured_output'] = dict(self._structured_modes)
+            self.run_metadata['repairs'] = summarize_repair_stats(self._repair_stats)
+            if self.call_profile is not None:
+                self.run_metadata['call_limits'] = self.call_profile.summary()
+            self.run_metadata['retries'] = self.retry_policy.metrics.snapshot()
+            if self.limiter is not None:
+                self.run_metadata['concurrency'] = self.limiter.snapshot()
+            if self.router.enabled:
+                self.run_metadata['routing'] = {
+                    'routes': {stage: asdict(route) for stage, route in self.router.routes.items()},
+                    'cascade': summarize_cascade_stats(self._cascade_stats)
+                }
         result = AnalysisResult(
             interview_summaries=interview_summaries,
             research_findings=findings,
-            total_interviews=len(transcripts),
+            total_interviews=total_interviews,
             analysis_duration=time.time() - start_time,
-            api_calls=self.api_calls,
-            total_cost=self.total_cost
+            api_calls=self.api_calls + (base.api_calls if base else 0),
+            total_cost=self.total_cost + (base.total_cost if base else 0.0),
+            usage_ledger=ledger,
+            token_usage=self._summarize_usage(ledger),
+            cross_analysis=cross_analysis,
+            run_metadata=dict(self.run_metadata),
+            transcripts=(list(base.transcripts) if base else []) + list(transcripts or [])
         )
         
-        print(f"\n✅ Параллельный анализ завершен за {result.analysis_duration:.1f} сек")
+        print(f"\n✅ {label} завершен за {result.analysis_duration:.1f} сек")
         print(f"📡 API вызовов: {self.api_calls}")
-        print(f"💰 Примерная стоимость: ${self.total_cost:.4f}")
+        print(f"💰 Стоимость: ${self.total_cost:.4f}")
+        if base is not None:
+            print(f"📚 Всего по исследованию: {result.api_calls} вызовов, ${result.total_cost:.4f}")
+        print(f"🔢 Токены: {result.token_usage['prompt_tokens']} ввод / "
+              f"{result.token_usage['completion_tokens']} вывод "
+              f"({result.token_usage['cached_tokens']} из кэша)")
+        if self.cache is not None:
+            cache_stats = self.cache.get_stats()
+            print(f"📦 Кэш: {result.token_usage['cache_hits']} попаданий, "
+                  f"hit rate {cache_stats['hit_rate']:.0%}, записей {cache_stats['entries']}, "
+                  f"не сохранено испорченных ответов: {cache_stats['rejected']}")
+        streaming = result.token_usage.get('streaming')
+        if streaming:
+            print(f"⚡ Потоковый режим: TTFT {streaming['ttft_avg']:.2f} сек (p95 {streaming['ttft_p95']:.2f}), "
+                  f"{streaming['tokens_per_sec_avg']:.0f} токенов/сек")
+        quotes = result.run_metadata.get('quote_verification')
+        if quotes and quotes['total']:
+            print(f"🔎 Цитаты: {quotes['verified']} подтверждено, {quotes['approximate']} приблизительно, "
+                  f"{quotes['unverified']} не найдено в транскриптах")
+        parsing = result.run_metadata['json_parsing']
+        if parsing['failed'] or parsing['partial']:
+            stages = ", ".join(f"{stage}: {counts['failed']}" for stage, counts in parsing['by_stage'].items()
+                               if counts['failed'])
+            print(f"🧩 JSON: не разобрано {parsing['failed']} ответов ({parsing['failure_rate']:.1%})"
+                  + (f" [{stages}]" if stages else "") + f", с отброшенными полями: {parsing['partial']}")
+        if len(result.token_usage['by_model']) > 1:
+            print("🔀 По моделям: " + ", ".join(f"{model}: {usage['calls']} вызовов, ${usage['cost']:.4f}"
+                                             for model, usage in result.token_usage['by_model'].items()))
+        cascade = result.run_metadata.get('routing', {}).get('cascade')
+        if cascade and cascade['attempts']:
+            print(f"⤴️ Каскад: {cascade['escalated']} эскалаций из {cascade['attempts']} "
+                  f"({cascade['escalation_rate']:.0%})")
+        repairs = result.run_metadata['repairs']
+        if repairs['continued'] or repairs['invalid']:
+            print(f"🩹 Исправлено ответов: {repairs['continued_ok']}/{repairs['continued']} обрезанных, "
+                  f"{repairs['fixed_local'] + repairs['fixed_call'] + repairs['salvaged']}/{repairs['invalid']} "
+                  f"невалидных ({repairs['repair_calls']} вызовов исправления), "
+                  f"сэкономлено ~{repairs['tokens_saved']} токенов")
+        retry_stats = result.run_metadata['retries']
+        if retry_stats['retries']:
+            print(f"🔁 Повторов: {retry_stats['retries']} (429: {retry_stats['rate_limited']}), "
+                  f"ожидание: {retry_stats['total_wait']:.1f} сек")
+        concurrency = result.run_metadata.get('concurrency')
+        if concurrency:
+            print(f"🚦 Лимит запросов в полете: {concurrency['limit']} "
+                  f"(от {concurrency['lowest_limit']} до {concurrency['highest_limit']}), "
+                  f"снижений: {concurrency['throttle_events']} (429: {concurrency['rate_limited']}, "
+                  f"5xx: {concurrency['server_errors']}, задержка: {concurrency['latency_spikes']}), "
+                  f"пик очереди: {concurrency['peak_queue_depth']}")
+        pool = result.run_metadata.get('http_pool')
+        if pool and pool['pool_requests']:
+            print(f"🔌 Соединения: открыто {pool['connections_opened']} на {pool['pool_requests']} запросов "
+                  f"(переиспользование {pool['reuse_ratio']:.0%}, HTTP/2: {pool.get('http2_requests', 0)}), "
+                  f"сжато gzip: {pool['gzipped_requests']}")
+        limits = result.run_metadata.get('call_limits') or {}
+        learned = {key: value for key, value in limits.items() if value['max_tokens'] is not None}
+        if learned:
+            print("📐 Лимиты по истории: " + ", ".join(
+                f"{key.replace('|', ' @ ')}: {value['max_tokens']} токенов, {value['timeout']:.0f}с"
+                for key, value in learned.items()))
+        if self.call_profile is not None:
+            self.call_profile.save()
+        
+        checkpoint = self._checkpoint
+        if checkpoint is not None:
+            checkpoint.save_artifact('cross_analysis', cross_analysis)
+            checkpoint.save_artifact('research_findings', asdict(findings))
+            checkpoint.save_artifact('usage_ledger', result.usage_ledger)
+            checkpoint.update_manifest(status="complete", finished=time.strftime("%Y-%m-%d %H:%M:%S"),
+                                       api_calls=self.api_calls, total_cost=self.total_cost,
+                                       study_interviews=result.total_interviews,
+                                       study_api_calls=result.api_calls, study_total_cost=result.total_cost,
+                                       run_metadata=result.run_metadata)
+            if checkpoint.restored_steps or checkpoint.restored_summaries:
+                print(f"♻️ Из контрольной точки: {checkpoint.restored_summaries} интервью, "
+                      f"{checkpoint.restored_steps} ответов API")
         
         return result
     
-    def _deep_analyze_interview(self, transcript: str, interview_num: int) -> InterviewSummary:
-        """Глубокий анализ одного интервью"""
-        
-        # Разбиение на чанки
-        chunks = self._create_chunks(transcript)
-        
-        # Анализ каждого чанка
-        chunk_summaries = []
-        for i, chunk in enumerate(chunks):
-            if len(chunks) > 1:
-                print(f"   Анализ части {i+1}/{len(chunks)}...")
-            
-            summary = self._analyze_chunk(chunk, interview_num, i+1)
-            if summary:
-                chunk_summaries.append(summary)
-        
-        # Объединение результатов
-        combined_summary = "\n\n".join(chunk_summaries)
+    def _verify_findings_quotes(self, interview_summaries: List[InterviewSummary],
+                                findings: Optional[ResearchFindings]):
+        """Проверка цитат ключевых инсайтов и сводка проверки в run_metadata
         
-        # Детальный анализ
-        profile_analysis = self._analyze_profile_and_themes(combined_summary, interview_num)
-        pains_analysis = self._analyze_pains_and_needs(combined_summary, interview_num)
-        emotions_analysis = self._analyze_emotions_and_insights(combined_summary, interview_num)
-        quotes_analysis = self._analyze_quotes_and_contradictions(combined_summary, interview_num)
-        business_analysis = self._analyze_business_aspects(combined_summary, interview_num)
-        
-        # Анализ связанный с брифом
-        brief_findings = {}
-        if self.brief_manager.has_brief:
-            brief_findings = self._analyze_brief_related_content(combined_summary, interview_num)
+        Цитаты интервью проверяются сразу после их анализа (verify_summary_quotes).
+        Если транскрипты части интервью недоступны (добавление к прежнему
+        результату), цитаты инсайтов ищутся только в доступных.
+        """
+        insights = findings.key_insights if findings else []
+        if self._quote_indices:
+            verify_insight_quotes(insights, self._quote_indices)
+        self.run_metadata['quote_verification'] = quote_verification_stats(interview_summaries, insights)
+    
+    def _create_empty_summary(self, interview_num: int) -> InterviewSummary:
+        """Пустое саммари для интервью, анализ которого не удался"""
+        return InterviewSummary(interview_id=interview_num)
+    
+    def _restore_summary(self, interview_num: int) -> Optional[InterviewSummary]:
+        """Готовое саммари интервью из контрольной точки"""
+        if self._checkpoint is None:
+            return None
+        summary = self._checkpoint.load_summary(interview_num)
+        if summary is not None:
+            print(f"♻️ Интервью {interview_num} восстановлено из контрольной точки")
+        return summary
+    
+    def _assemble_interview_summary(self, interview_num: int, stage_results: Dict[str, Dict[str, Any]]) -> InterviewSummary:
+        """Сборка InterviewSummary из результатов этапов"""
+        profile_analysis = stage_results['profile']
+        pains_analysis = stage_results['pains']
+        emotions_analysis = stage_results['emotions']
+        quotes_analysis = stage_results['quotes']
+        business_analysis = stage_results['business']
+        brief_findings = stage_results.get('brief', {})
         
         # Создание итогового саммари
         summary_data = {
             'interview_id': interview_num,
-            'respondent_profile': profile_analysis.get('respondent_profile', {}),
+            'respondent_profile': self._normalize_profile(profile_analysis.get('respondent_profile', {})),
             'key_themes': profile_analysis.get('key_themes', []),
             'pain_points': pains_analysis.get('pain_points', []),
             'needs': pains_analysis.get('needs', []),
@@ -200,24 +724,66 @@ class OpenRouterAnalyzer:
         
         return InterviewSummary(**summary_data)
     
-    def _create_chunks(self, text: str) -> List[str]:
-        """Создание чанков для анализа"""
-        if len(text) <= self.analysis_config['chunk_size']:
-            return [text]
-        
-        chunks = []
-        start = 0
+    @staticmethod
+    def _normalize_profile(profile: Any) -> Dict[str, Any]:
+        """Профиль в форме RespondentProfile: списочные поля - списки, даже если модель вернула строку"""
+        if not isinstance(profile, dict):
+            return {}
+        profile = dict(profile)
+        for key in PROFILE_LIST_FIELDS:
+            value = profile.get(key)
+            if isinstance(value, str):
+                profile[key] = [value] if value.strip() else []
+            elif value is None and key in profile:
+                profile[key] = []
+        return profile
+    
+    def _build_stage_prompts(self, contexts: Dict[str, str], interview_num: int) -> Dict[str, str]:
+        """Промпты всех этапов детального анализа интервью (contexts - из _stage_contexts)"""
+        prompts = {
+            'profile': self._build_profile_prompt(contexts['profile'], interview_num),
+            'pains': self._build_pains_prompt(contexts['pains'], interview_num),
+            'emotions': self._build_emotions_prompt(contexts['emotions'], interview_num),
+            'quotes': self._build_quotes_prompt(contexts['quotes'], interview_num),
+            'business': self._build_business_prompt(contexts['business'], interview_num),
+        }
+        if self.brief_manager.has_brief:
+            prompts['brief'] = self._build_brief_prompt(contexts['brief'], interview_num)
+        return prompts
+    
+    def _stage_contexts(self, combined_summary: str, transcript: str, extraction_mode: str) -> Dict[str, str]:
+        """Контекст каждого этапа в пределах stage_context_tokens
         
-        while start < len(text):
-            end = start + self.analysis_config['chunk_size']
-            chunk = text[start:end]
-            chunks.append(chunk)
-            start += self.analysis_config['chunk_size'] - self.analysis_config['chunk_overlap']
+        Саммари чанков и исходный транскрипт индексируются BM25; этап получает
+        наиболее релевантные своему вопросу фрагменты, а не первые 3000 символов.
+        """
+        index = build_passage_index(combined_summary, transcript)
+        budget = self.analysis_config['stage_context_tokens']
+        queries = dict(STAGE_CONTEXT_QUERIES)
+        if self.brief_manager.has_brief:
+            brief = self.brief_manager.brief_data
+            queries['brief'] = " ".join(brief.research_goals + brief.research_questions +
+                                        [brief.target_audience, brief.business_context])
         
-        return chunks
+        if extraction_mode == 'fused':
+            return {'fused': index.pack(" ".join(queries.values()), budget * FUSED_CONTEXT_MULTIPLIER)}
+        return {stage: index.pack(query, budget) for stage, query in queries.items()}
     
-    def _analyze_chunk(self, chunk: str, interview_num: int, chunk_num: int) -> str:
-        """Анализ отдельного чанка"""
+    def _chunk_budget(self) -> int:
+        """Бюджет токенов одного чанка транскрипта"""
+        configured = self.analysis_config['chunk_size']
+        if configured:
+            return configured
+        context = self.router.context_length('chunk', self._model_context_length())
+        return max(int(context * CHUNK_CONTEXT_FRACTION), 2000)
+    
+    def _create_chunks(self, text: str) -> List[str]:
+        """Создание чанков для анализа: целые реплики в пределах бюджета токенов"""
+        chunker = TurnChunker(self._chunk_budget(), self.analysis_config['chunk_overlap'])
+        return chunker.chunk(text) or [text]
+    
+    def _build_chunk_prompt(self, chunk: str, interview_num: int, chunk_num: int) -> str:
+        """Промпт: анализ отдельного чанка"""
         context = self.brief_manager.get_brief_context()
         
         prompt = f"""{context}
@@ -256,11 +822,10 @@ class OpenRouterAnalyzer:
 ФРАГМЕНТ ИНТЕРВЬЮ:
 {chunk}"""
 
-        response = self._make_api_call(prompt)
-        return response
+        return prompt
     
-    def _analyze_profile_and_themes(self, summary: str, interview_num: int) -> Dict[str, Any]:
-        """Анализ профиля респондента и ключевых тем"""
+    def _build_profile_prompt(self, summary: str, interview_num: int) -> str:
+        """Промпт: анализ профиля респондента и ключевых тем"""
         context = self.brief_manager.get_brief_context()
         
         prompt = f"""{context}
@@ -275,10 +840,10 @@ class OpenRouterAnalyzer:
         "experience_level": "ТОЛЬКО реальный опыт из интервью",
         "context": "ТОЛЬКО реальный контекст из интервью",
         "tech_literacy": "ТОЛЬКО если есть данные",
-        "motivations": "ТОЛЬКО явные мотивации из интервью",
+        "motivations": ["ТОЛЬКО явные мотивации из интервью"],
         "lifestyle": "ТОЛЬКО если упоминается",
         "archetype": "На основе РЕАЛЬНЫХ данных",
-        "unique_traits": "ТОЛЬКО уникальные черты из интервью"
+        "unique_traits": ["ТОЛЬКО уникальные черты из интервью"]
     }},
     "key_themes": [
         {{
@@ -294,13 +859,12 @@ class OpenRouterAnalyzer:
 }}
 
 СУММАРИ ИНТЕРВЬЮ:
-{summary[:3000]}"""
+{summary}"""
 
-        response = self._make_api_call(prompt)
-        return self._extract_json(response)
+        return prompt
     
-    def _analyze_pains_and_needs(self, summary: str, interview_num: int) -> Dict[str, Any]:
-        """Анализ болей и потребностей"""
+    def _build_pains_prompt(self, summary: str, interview_num: int) -> str:
+        """Промпт: анализ болей и потребностей"""
         context = self.brief_manager.get_brief_context()
         
         prompt = f"""{context}
@@ -344,13 +908,12 @@ class OpenRouterAnalyzer:
 }}
 
 СУММАРИ:
-{summary[:3000]}"""
+{summary}"""
 
-        response = self._make_api_call(prompt)
-        return self._extract_json(response)
+        return prompt
     
-    def _analyze_emotions_and_insights(self, summary: str, interview_num: int) -> Dict[str, Any]:
-        """Анализ эмоций и инсайтов"""
+    def _build_emotions_prompt(self, summary: str, interview_num: int) -> str:
+        """Промпт: анализ эмоций и инсайтов"""
         context = self.brief_manager.get_brief_context()
         
         prompt = f"""{context}
@@ -394,13 +957,12 @@ class OpenRouterAnalyzer:
 }}
 
 СУММАРИ:
-{summary[:3000]}"""
+{summary}"""
 
-        response = self._make_api_call(prompt)
-        return self._extract_json(response)
+        return prompt
     
-    def _analyze_quotes_and_contradictions(self, summary: str, interview_num: int) -> Dict[str, Any]:
-        """Анализ важных цитат и противоречий"""
+    def _build_quotes_prompt(self, summary: str, interview_num: int) -> str:
+        """Промпт: анализ важных цитат и противоречий"""
         context = self.brief_manager.get_brief_context()
         
         prompt = f"""{context}
@@ -447,13 +1009,12 @@ class OpenRouterAnalyzer:
 }}
 
 СУММАРИ:
-{summary[:3000]}"""
+{summary}"""
 
-        response = self._make_api_call(prompt)
-        return self._extract_json(response)
+        return prompt
     
-    def _analyze_business_aspects(self, summary: str, interview_num: int) -> Dict[str, Any]:
-        """Анализ бизнес-аспектов и возможностей"""
+    def _build_business_prompt(self, summary: str, interview_num: int) -> str:
+        """Промпт: анализ бизнес-аспектов и возможностей"""
         context = self.brief_manager.get_brief_context()
         
         prompt = f"""{context}
@@ -496,13 +1057,12 @@ class OpenRouterAnalyzer:
 }}
 
 СУММАРИ:
-{summary[:3000]}"""
+{summary}"""
 
-        response = self._make_api_call(prompt)
-        return self._extract_json(response)
+        return prompt
     
-    def _analyze_brief_related_content(self, summary: str, interview_num: int) -> Dict[str, Any]:
-        """Анализ контента связанного с брифом"""
+    def _build_brief_prompt(self, summary: str, interview_num: int) -> str:
+        """Промпт: анализ контента связанного с брифом"""
         context = self.brief_manager.get_brief_context()
         questions = self.brief_manager.get_questions_for_analysis()
         goals = self.brief_manager.get_goals_for_analysis()
@@ -546,21 +1106,278 @@ class OpenRouterAnalyzer:
 }}
 
 СУММАРИ:
-{summary[:3000]}"""
+{summary}"""
+
+        return prompt
+    
+    def _split_fused_result(self, data: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """Разделение объединенного ответа на результаты этапов (как в режиме staged)"""
+        if not isinstance(data, dict):
+            data = {}
+        stage_results = {
+            'profile': {key: data[key] for key in ('respondent_profile', 'key_themes') if key in data},
+            'pains': {key: data[key] for key in ('pain_points', 'needs') if key in data},
+            'emotions': {key: data[key] for key in ('emotional_journey', 'insights', 'sentiment_score') if key in data},
+            'quotes': {key: data[key] for key in ('quotes', 'contradictions') if key in data},
+            'business': {key: data[key] for key in ('business_pains', 'user_problems', 'opportunities') if key in data},
+        }
+        if self.brief_manager.has_brief:
+            stage_results['brief'] = data.get('brief_related_findings') or {}
+        return stage_results
+    
+    def _build_fused_prompt(self, summary: str, interview_num: int) -> str:
+        """Промпт: вся структура InterviewSummary одним вызовом"""
+        context = self.brief_manager.get_brief_context()
+        
+        brief_block = ""
+        brief_schema = ""
+        if self.brief_manager.has_brief:
+            brief_block = f"""
+ЦЕЛИ ИССЛЕДОВАНИЯ:
+{json.dumps(self.brief_manager.get_goals_for_analysis(), ensure_ascii=False)}
+
+ВОПРОСЫ ИССЛЕДОВАНИЯ:
+{json.dumps(self.brief_manager.get_questions_for_analysis(), ensure_ascii=False)}
+"""
+            brief_schema = """,
+    "brief_related_findings": {
+        "goal_related_findings": [
+            {"goal": "Цель из брифа", "findings": [{"finding": "Что найдено", "quote": "ПОЛНАЯ цитата", "relevance": "Как относится к цели"}]}
+        ],
+        "question_related_findings": [
+            {"question": "Вопрос из брифа", "answers": [{"answer": "Ответ из интервью", "quote": "ПОЛНАЯ цитата", "confidence": "high/medium/low"}]}
+        ]
+    }"""
+        
+        prompt = f"""{context}
+Проведи ПОЛНЫЙ анализ интервью №{interview_num} за один проход: профиль, темы, боли и потребности, эмоции и инсайты, цитаты и противоречия, бизнес-аспекты.
+{brief_block}
+ПРАВИЛА:
+1. Используй ТОЛЬКО данные из интервью, ничего не додумывай
+2. Цитаты - ПОЛНЫЕ и ДОСЛОВНЫЕ (минимум 50 слов)
+3. Если данных для поля нет - оставь пустую строку или пустой список
+
+Верни ОДИН JSON:
+{{
+    "respondent_profile": {{
+        "demographics": "", "occupation": "", "experience_level": "", "context": "",
+        "tech_literacy": "", "motivations": [], "archetype": "", "unique_traits": []
+    }},
+    "key_themes": [
+        {{"theme": "", "description": "", "frequency": "", "importance": "", "quotes": [], "emotional_tone": "", "relevance_to_brief": ""}}
+    ],
+    "pain_points": [
+        {{"pain": "", "pain_type": "functional/process/emotional/social/financial", "root_cause": "", "symptoms": [],
+          "context": "", "severity": "critical/high/medium/low", "frequency": "", "impact": "",
+          "current_solution": "", "ideal_solution": "", "quotes": [], "emotional_impact": "", "relevance_to_brief": ""}}
+    ],
+    "needs": [
+        {{"need": "", "need_type": "functional/emotional/social/self-actualization", "job_to_be_done": "",
+          "current_satisfaction": "", "importance": "critical/high/medium/low", "triggers": [], "barriers": [],
+          "success_criteria": "", "quotes": [], "related_pains": [], "relevance_to_brief": ""}}
+    ],
+    "emotional_journey": [
+        {{"moment": "", "trigger": "", "emotion": "", "emotion_family": "primary/secondary/social/cognitive",
+          "intensity": 5, "valence": "positive/negative/mixed", "duration": "", "body_language": "", "quote": "",
+          "coping": "", "impact": "", "underlying_need": "", "relevance_to_brief": ""}}
+    ],
+    "insights": [
+        {{"insight": "", "insight_type": "behavioral/emotional/cognitive/motivational", "confidence": "high/medium/low",
+          "evidence": [], "contradiction": "", "hidden_motivation": "", "design_opportunity": "",
+          "business_impact": "", "quotes": [], "relevance_to_brief": ""}}
+    ],
+    "sentiment_score": 0.0,
+    "quotes": [
+        {{"text": "", "context": "", "significance": "", "reveals": {{"about_user": "", "about_product": "", "about_market": ""}},
+          "emotions": [], "keywords": [], "quote_type": "pain/need/insight/emotion/solution", "relevance_to_questions": ""}}
+    ],
+    "contradictions": [
+        {{"contradiction_type": "logical/emotional/behavioral/temporal/value", "severity": "high/medium/low",
+          "statement_1": {{"text": "", "context": ""}}, "statement_2": {{"text": "", "context": ""}},
+          "analysis": {{"nature": "", "possible_reasons": []}}, "full_quotes": []}}
+    ],
+    "business_pains": [
+        {{"pain": "", "source": "", "impact": {{"revenue": "", "costs": "", "efficiency": ""}}, "urgency": "critical/high/medium/low", "quotes": []}}
+    ],
+    "user_problems": [
+        {{"problem": "", "frequency": "", "severity": "blocker/major/minor", "workaround": "", "quotes": []}}
+    ],
+    "opportunities": [
+        {{"opportunity": "", "opportunity_type": "quick_win/strategic/innovation/optimization", "based_on_problems": [],
+          "value_proposition": "", "quotes": []}}
+    ]{brief_schema}
+}}
+
+СУММАРИ:
+{summary}"""
+
+        return prompt
+    
+    def _model_context_length(self) -> int:
+        """Длина контекста текущей модели (из кэшированного каталога /models)"""
+        info = self.client.get_model_info()
+        return int(info.get('context_length') or DEFAULT_CONTEXT_LENGTH) if "error" not in info else DEFAULT_CONTEXT_LENGTH
+    
+    def _cross_group_budget(self) -> int:
+        """Бюджет токенов данных одного промпта кросс-анализа"""
+        configured = self.analysis_config['cross_group_tokens']
+        if configured:
+            return configured
+        context = self.router.context_length('cross_analysis', self._model_context_length())
+        budget = int(context * CROSS_CONTEXT_FRACTION) - self.analysis_config['max_tokens']
+        return max(budget, 4000)
+    
+    def _cross_interview_data(self, summary: InterviewSummary) -> Dict[str, Any]:
+        """Данные одного интервью для кросс-анализа"""
+        return {
+            'interview_id': summary.interview_id,
+            'profile': summary.respondent_profile,
+            'pains': summary.pain_points or [],
+            'needs': summary.needs or []
+        }
+    
+    def _plan_cross_groups(self, summaries: List[InterviewSummary]) -> List[List[InterviewSummary]]:
+        """Разбиение интервью на группы по бюджету токенов (с записью в run_metadata)"""
+        budget = self._cross_group_budget()
+        groups, sizes = self._group_by_budget(summaries, budget)
+        self.run_metadata['cross_analysis'] = {
+            'group_token_budget': budget,
+            'groups': [{'interview_ids': [s.interview_id for s in group], 'estimated_tokens': size}
+                       for group, size in zip(groups, sizes)],
+            'reduce_levels': []
+        }
+        return groups
+    
+    def _plan_merge_groups(self, cross_analysis: Dict[str, Any],
+                           new_summaries: List[InterviewSummary]) -> List[List[InterviewSummary]]:
+        """Группы новых интервью для обновления кросс-анализа (с записью в run_metadata)
+        
+        Каждый промпт обновления содержит текущий агрегат, поэтому на данные
+        новых интервью остается бюджет кросс-анализа за вычетом агрегата (но
+        не меньше четверти бюджета).
+        """
+        budget = self._cross_group_budget()
+        aggregate = estimate_tokens(json.dumps(cross_analysis, ensure_ascii=False))
+        data_budget = max(budget - aggregate, budget // 4)
+        groups, sizes = self._group_by_budget(new_summaries, data_budget)
+        self.run_metadata['cross_merge'] = {
+            'group_token_budget': data_budget,
+            'aggregate_tokens': aggregate,
+            'groups': [{'interview_ids': [s.interview_id for s in group], 'estimated_tokens': size}
+                       for group, size in zip(groups, sizes)]
+        }
+        return groups
+    
+    def _group_by_budget(self, summaries: List[InterviewSummary], budget: int
+                         ) -> Tuple[List[List[InterviewSummary]], List[int]]:
+        """Последовательные группы интервью, данные которых укладываются в budget токенов"""
+        groups: List[List[InterviewSummary]] = []
+        sizes: List[int] = []
+        current: List[InterviewSummary] = []
+        current_tokens = 0
+        
+        for summary in summaries:
+            tokens = estimate_tokens(json.dumps(self._cross_interview_data(summary), ensure_ascii=False))
+            if current and current_tokens + tokens > budget:
+                groups.append(current)
+                sizes.append(current_tokens)
+                current, current_tokens = [], 0
+            current.append(summary)
+            current_tokens += tokens
+        groups.append(current)
+        sizes.append(current_tokens)
+        return groups, sizes
+    
+    def _plan_reduce_batches(self, partials: List[Tuple[Dict[str, Any], List[int]]]
+                             ) -> List[List[Tuple[Dict[str, Any], List[int]]]]:
+        """Группы частичных результатов для очередного уровня слияния
+        
+        В группе не больше CROSS_REDUCE_FAN_IN результатов и не больше бюджета
+        токенов, но не меньше двух - чтобы каждый уровень сокращал их число.
+        """
+        budget = self._cross_group_budget()
+        batches: List[List[Tuple[Dict[str, Any], List[int]]]] = []
+        current: List[Tuple[Dict[str, Any], List[int]]] = []
+        current_tokens = 0
+        
+        for partial in partials:
+            tokens = estimate_tokens(json.dumps(partial[0], ensure_ascii=False))
+            full = len(current) >= CROSS_REDUCE_FAN_IN or (len(current) >= 2 and current_tokens + tokens > budget)
+            if full:
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(partial)
+            current_tokens += tokens
+        if len(current) == 1 and batches and len(batches[-1]) < CROSS_REDUCE_FAN_IN:
+            batches[-1].append(current[0])
+        else:
+            batches.append(current)
+        
+        plan = self.run_metadata.setdefault('cross_analysis', {'reduce_levels': []})
+        plan['reduce_levels'].append([[iid for partial in batch for iid in partial[1]] for batch in batches])
+        return batches
+    
+    def _prepare_reduce(self, batch: List[Tuple[Dict[str, Any], List[int]]]) -> Optional[str]:
+        """Промпт слияния (None - сливать нечего: не больше одного непустого результата)"""
+        non_empty = [partial for partial in batch if partial[0]]
+        if len(non_empty) <= 1:
+            return None
+        return self._build_cross_reduce_prompt(non_empty)
+    
+    def _finish_reduce(self, batch: List[Tuple[Dict[str, Any], List[int]]],
+                       merged: Dict[str, Any]) -> Tuple[Dict[str, Any], List[int]]:
+        """Результат слияния; при ошибке - объединение списков частичных результатов"""
+        if not merged:
+            return self._union_cross_analyses(batch)
+        return merged, [iid for partial in batch for iid in partial[1]]
+    
+    def _union_cross_analyses(self, batch: List[Tuple[Dict[str, Any], List[int]]]) -> Tuple[Dict[str, Any], List[int]]:
+        """Механическое объединение частичных кросс-анализов (без вызова модели)"""
+        union: Dict[str, Any] = {}
+        for partial, _ in batch:
+            if not isinstance(partial, dict):
+                continue
+            for key, value in partial.items():
+                if isinstance(value, list):
+                    union.setdefault(key, []).extend(value)
+                else:
+                    union.setdefault(key, value)
+        return union, [iid for partial in batch for iid in partial[1]]
+    
+    def _build_cross_reduce_prompt(self, partials: List[Tuple[Dict[str, Any], List[int]]]) -> str:
+        """Промпт: слияние частичных кросс-анализов"""
+        context = self.brief_manager.get_brief_context()
+        total = sum(len(ids) for _, ids in partials)
+        
+        parts = "\n\n".join(
+            f"ЧАСТЬ {i} (интервью {', '.join(map(str, ids))}):\n{json.dumps(partial, ensure_ascii=False)}"
+            for i, (partial, ids) in enumerate(partials, 1)
+        )
+        
+        prompt = f"""{context}
+
+Объедини частичные кросс-анализы {len(partials)} групп интервью в единый кросс-анализ {total} интервью.
 
-        response = self._make_api_call(prompt)
-        return self._extract_json(response)
+- Объедини совпадающие паттерны, точки консенсуса и расхождения из разных частей.
+- Пересчитай частоты и уровни согласия относительно всех {total} интервью (например, "12 из {total} респондентов").
+- Сохрани самые сильные доказательства и ПОЛНЫЕ цитаты, номера интервью в holders не меняй.
+- Паттерн, найденный только в одной части, оставь, если он подкреплен данными.
+
+Верни JSON в ТОЙ ЖЕ структуре, что и частичные результаты (common_patterns, consensus_points, divergence_points).
+
+ЧАСТИЧНЫЕ РЕЗУЛЬТАТЫ:
+{parts}"""
+
+        return prompt
     
-    def _cross_analyze_interviews(self, summaries: List[InterviewSummary]) -> Dict[str, Any]:
-        """Кросс-анализ всех интервью"""
+    def _build_cross_analysis_prompt(self, summaries: List[InterviewSummary]) -> str:
+        """Промпт: кросс-анализ всех интервью"""
         context = self.brief_manager.get_brief_context()
         
-        # Подготовка данных для анализа
+        # Подготовка данных для анализа (компактный JSON: отступы только тратят токены)
         analysis_data = {
             'total_interviews': len(summaries),
-            'profiles': [s.respondent_profile for s in summaries],
-            'all_pains': [pain for s in summaries for pain in s.pain_points or []],
-            'all_needs': [need for s in summaries for need in s.needs or []]
+            'interviews': [self._cross_interview_data(s) for s in summaries]
         }
         
         prompt = f"""{context}
@@ -608,13 +1425,45 @@ class OpenRouterAnalyzer:
 }}
 
 ДАННЫЕ ДЛЯ АНАЛИЗА:
-{json.dumps(analysis_data, ensure_ascii=False, indent=2)}"""
+{json.dumps(analysis_data, ensure_ascii=False)}"""
 
-        response = self._make_api_call(prompt)
-        return self._extract_json(response)
+        return prompt
     
-    def _generate_final_findings(self, summaries: List[InterviewSummary], cross_analysis: Dict) -> ResearchFindings:
-        """Генерация финальных выводов"""
+    def _build_cross_merge_prompt(self, cross_analysis: Dict[str, Any], base_count: int,
+                                  new_summaries: List[InterviewSummary]) -> str:
+        """Промпт: обновление кросс-анализа новыми интервью"""
+        context = self.brief_manager.get_brief_context()
+        total = base_count + len(new_summaries)
+        new_ids = [s.interview_id for s in new_summaries]
+        
+        # Данные только новых интервью (в формате кросс-анализа): прежние уже учтены в агрегате
+        new_data = {
+            'new_interviews': len(new_summaries),
+            'interviews': [self._cross_interview_data(s) for s in new_summaries]
+        }
+        
+        prompt = f"""{context}
+
+Обнови кросс-анализ исследования: к {base_count} уже проанализированным интервью добавлено {len(new_summaries)} новых (номера {', '.join(map(str, new_ids))}).
+
+ТЕКУЩИЙ КРОСС-АНАЛИЗ построен по {base_count} интервью. Объедини его с данными новых интервью:
+- пересчитай частоты и уровни согласия для {total} интервью (например, "7 из {total} респондентов");
+- дополни доказательства, цитаты и позиции (holders) данными новых интервью;
+- добавь новые паттерны, точки консенсуса и расхождения, если они появились;
+- ослабь или убери выводы, которые новые интервью опровергают.
+
+Верни JSON в ТОЙ ЖЕ структуре, что и текущий кросс-анализ (common_patterns, consensus_points, divergence_points).
+
+ТЕКУЩИЙ КРОСС-АНАЛИЗ:
+{json.dumps(cross_analysis, ensure_ascii=False)}
+
+ДАННЫЕ НОВЫХ ИНТЕРВЬЮ:
+{json.dumps(new_data, ensure_ascii=False)}"""
+
+        return prompt
+    
+    def _build_findings_prompt(self, summaries: List[InterviewSummary], cross_analysis: Dict) -> str:
+        """Промпт: генерация финальных выводов"""
         context = self.brief_manager.get_brief_context()
         
         prompt = f"""{context}
@@ -674,9 +1523,10 @@ class OpenRouterAnalyzer:
 КРОСС-АНАЛИЗ:
 {json.dumps(cross_analysis, ensure_ascii=False, indent=2)}"""
 
-        response = self._make_api_call(prompt)
-        findings_data = self._extract_json(response)
-        
+        return prompt
+    
+    def _build_research_findings(self, findings_data: Dict[str, Any], cross_analysis: Dict) -> ResearchFindings:
+        """Сборка ResearchFindings из ответа модели и кросс-анализа"""
         return ResearchFindings(
             executive_summary=findings_data.get('executive_summary', ''),
             key_insights=findings_data.get('key_insights', []),
@@ -689,53 +1539,636 @@ class OpenRouterAnalyzer:
             personas=[]
         )
     
-    def _make_api_call(self, prompt: str) -> str:
-        """Выполнение API вызова с подсчетом статистики"""
-        try:
-            response = self.client.generate_content(prompt)
-            self.api_calls += 1
-            
-            # Примерная оценка стоимости
-            estimated_tokens = len(prompt.split()) * 1.3 + len(response.split()) * 1.3
-            cost_estimate = self.client.estimate_cost(
-                int(estimated_tokens * 0.7),  # Примерно 70% - ввод
-                int(estimated_tokens * 0.3)   # Примерно 30% - вывод
-            )
-            self.total_cost += cost_estimate['total_cost']
+    # ------------------------------------------------------------------
+    # Асинхронный конвейер
+    # ------------------------------------------------------------------
+    
+    async def analyze_transcripts_async(self, transcripts: List[str], max_in_flight: Optional[int] = None,
+                                        call_timeout: Optional[float] = None,
+                                        extraction_mode: Optional[str] = None) -> AnalysisResult:
+        """Асинхронный анализ транскриптов
+        
+        Все интервью, их чанки и этапы выполняются как задачи одного event loop;
+        число запросов в полете ограничено семафором max_in_flight, а каждый
+        вызов API - дедлайном call_timeout.
+        """
+        if call_timeout is None:
+            call_timeout = self.analysis_config['async_call_timeout']
+        return await self._analyze_async(
+            transcripts, engine="async", label="Асинхронный анализ", extraction_mode=extraction_mode,
+            max_in_flight=max_in_flight or self.analysis_config['async_max_in_flight'], call_timeout=call_timeout)
+    
+    async def _analyze_async(self, transcripts: List[str], engine: str, label: str,
+                             extraction_mode: Optional[str], max_in_flight: int,
+                             max_interviews: Optional[int] = None, fan_out: bool = True,
+                             call_timeout: Optional[float] = None) -> AnalysisResult:
+        """Конвейер анализа, общий для всех движков (engine - имя движка в контрольной точке)"""
+        start_time = time.time()
+        
+        print(f"🧠 Начинаю {label.lower()} {len(transcripts)} транскриптов...")
+        self._reset_run_stats()
+        transcripts, interview_ids = self._filter_duplicates(transcripts)
+        self._begin_checkpoint(transcripts, extraction_mode, engine=engine, extra={
+            'interview_ids': interview_ids,
+            'duplicates': self.run_metadata.get('duplicates')
+        })
+        
+        if not await asyncio.to_thread(self.test_api_connection):
+            raise Exception("Не удалось подключиться к API")
+        
+        # Проверка количества интервью
+        if len(transcripts) < 3:
+            print(f"⚠️  ВНИМАНИЕ: Рекомендуется минимум 3 интервью для качественного анализа!")
+        
+        print(f"⚡ Запросов в полете: до {max_in_flight}")
+        run = self._create_run(extraction_mode, max_in_flight, max_interviews, fan_out, call_timeout)
+        async with run.client:
+            interview_summaries = await self._analyze_interview_batch_async(run, transcripts, interview_ids)
             
-            return response
+            # Кросс-анализ
+            print("\n🔍 Проведение кросс-анализа...")
+            cross_analysis = await self._cross_analyze_interviews_async(run, interview_summaries)
             
+            # Генерация финальных выводов
+            print("\n📊 Генерация финальных выводов...")
+            findings = await self._generate_final_findings_async(run, interview_summaries, cross_analysis)
+            self.run_metadata['http_pool'] = run.client.get_pool_stats()
+        
+        return self._build_analysis_result(interview_summaries, findings, cross_analysis, len(transcripts), start_time,
+                                           label=label, transcripts=transcripts)
+    
+    def _create_run(self, extraction_mode: Optional[str], max_in_flight: int, max_interviews: Optional[int] = None,
+                    fan_out: bool = True, call_timeout: Optional[float] = None) -> _AsyncRun:
+        """Состояние прогона: асинхронный клиент и семафор запросов в полете
+        
+        Адаптивный лимит не растет выше max_in_flight: запросов сверх семафора
+        прогона все равно не будет.
+        """
+        if self.limiter is not None:
+            self.limiter.set_max_limit(max_in_flight)
+        client = AsyncOpenRouterClient(self.client.api_key, self.client.model, max_connections=max_in_flight,
+                                       connect_timeout=self.client.timeout[0],
+                                       read_timeout=self.client.timeout[1],
+                                       gzip_min_bytes=self.client.gzip_min_bytes,
+                                       retry_policy=self.retry_policy, base_url=self.client.base_url,
+                                       limiter=self.limiter)
+        return _AsyncRun(client=client, slots=asyncio.Semaphore(max_in_flight), call_timeout=call_timeout,
+                         extraction_mode=extraction_mode or self.analysis_config['extraction_mode'],
+                         max_interviews=max_interviews, fan_out=fan_out)
+    
+    async def _analyze_interview_batch_async(self, run: _AsyncRun, transcripts: List[str],
+                                             interview_ids: List[int]) -> List[InterviewSummary]:
+        """Анализ интервью с номерами interview_ids (до run.max_interviews одновременно)"""
+        workers = max(1, min(run.max_interviews or len(transcripts), len(transcripts) or 1))
+        if run.max_interviews is not None:
+            print(f"⚡ Интервью одновременно: {workers}")
+        interviews = asyncio.Semaphore(workers)
+        progress = tqdm(total=len(transcripts), desc="Анализ интервью")
+        
+        async def analyze(i: int, transcript: str) -> InterviewSummary:
+            async with interviews:
+                if workers == 1:
+                    print(f"\n📝 Анализ интервью {i+1}/{len(transcripts)}...")
+                summary = await self._deep_analyze_interview_safe_async(run, transcript, interview_ids[i])
+            progress.update(1)
+            return summary
+        
+        try:
+            results = await self._run_task_group({i: analyze(i, t) for i, t in enumerate(transcripts)})
+        finally:
+            progress.close()
+        return [results[i] for i in range(len(transcripts))]
+    
+    async def _deep_analyze_interview_safe_async(self, run: _AsyncRun, transcript: str,
+                                                 interview_num: int) -> InterviewSummary:
+        """Анализ интервью, ошибка которого не прерывает остальные задачи"""
+        try:
+            return await self._deep_analyze_interview_async(run, transcript, interview_num)
         except Exception as e:
-            print(f"❌ Ошибка API вызова: {e}")
-            return "{}"
+            print(f"❌ Ошибка при анализе интервью {interview_num}: {e}")
+            return self._create_empty_summary(interview_num)
+    
+    async def _deep_analyze_interview_async(self, run: _AsyncRun, transcript: str,
+                                            interview_num: int) -> InterviewSummary:
+        """Асинхронный глубокий анализ одного интервью"""
+        index = self._quote_indices[interview_num] = TranscriptIndex(transcript, interview_num)
+        restored = self._restore_summary(interview_num)
+        if restored is not None:
+            return restored
+        
+        summary = await self._analyze_interview_stages_async(run, transcript, interview_num)
+        verify_summary_quotes(summary, index)
+        if self._checkpoint is not None:
+            self._checkpoint.save_summary(summary)
+        return summary
     
-    def _extract_json(self, text: str) -> Union[Dict, List]:
-        """Извлечение JSON из ответа API"""
+    async def _analyze_interview_stages_async(self, run: _AsyncRun, transcript: str,
+                                              interview_num: int) -> InterviewSummary:
+        """Чанки и этапы анализа одного интервью"""
+        # Разбиение на чанки (чанки независимы друг от друга)
+        chunks = self._create_chunks(transcript)
+        chunk_results = await self._run_stages(run, {
+            i: self._analyze_chunk_async(run, chunk, interview_num, i+1, len(chunks))
+            for i, chunk in enumerate(chunks)
+        })
+        chunk_summaries = [chunk_results[i] for i in range(len(chunks)) if chunk_results[i]]
+        
+        # Объединение результатов
+        combined_summary = "\n\n".join(chunk_summaries)
+        contexts = self._stage_contexts(combined_summary, transcript, run.extraction_mode)
+        
+        # Объединенный режим: вся структура InterviewSummary одним вызовом
+        if run.extraction_mode == 'fused':
+            fused = await self._analyze_stage_async(
+                run, 'fused', self._build_fused_prompt(contexts['fused'], interview_num), interview_num)
+            return self._assemble_interview_summary(interview_num, self._split_fused_result(fused))
+        
+        # Детальный анализ: каждый этап получает свой контекст из саммари и транскрипта
+        stage_results = await self._run_stages(run, {
+            stage: self._analyze_stage_async(run, stage, prompt, interview_num)
+            for stage, prompt in self._build_stage_prompts(contexts, interview_num).items()
+        })
+        return self._assemble_interview_summary(interview_num, stage_results)
+    
+    async def _analyze_chunk_async(self, run: _AsyncRun, chunk: str, interview_num: int, chunk_num: int,
+                                   total: int) -> str:
+        """Анализ отдельного чанка"""
+        if total > 1 and not run.fan_out:
+            print(f"   Анализ части {chunk_num}/{total}...")
+        return await self._make_api_call_async(run, self._build_chunk_prompt(chunk, interview_num, chunk_num),
+                                               stage='chunk', interview_id=interview_num)
+    
+    async def _analyze_stage_async(self, run: _AsyncRun, stage: str, prompt: str,
+                                   interview_num: int) -> Dict[str, Any]:
+        """Один этап анализа интервью: вызов модели и разбор JSON"""
+        response = await self._make_api_call_async(run, prompt, stage=stage, interview_id=interview_num)
+        return await self._extract_json_async(run, response, stage=stage, interview_id=interview_num)
+    
+    async def _run_stages(self, run: _AsyncRun, coros: Dict[Any, Awaitable[Any]]) -> Dict[Any, Any]:
+        """Независимые этапы интервью: одновременно (run.fan_out) или по очереди
+        
+        В режиме fan-out все этапы отправляются сразу; фактическое число
+        запросов к API ограничивает семафор прогона в _make_api_call_async.
+        """
+        if run.fan_out and len(coros) > 1:
+            return await self._run_task_group(coros)
+        return {key: await coro for key, coro in coros.items()}
+    
+    async def _cross_analyze_interviews_async(self, run: _AsyncRun,
+                                              summaries: List[InterviewSummary]) -> Dict[str, Any]:
+        """Асинхронный кросс-анализ (см. _cross_analyze_interviews)"""
+        groups = self._plan_cross_groups(summaries)
+        if len(groups) == 1:
+            response = await self._make_api_call_async(run, self._build_cross_analysis_prompt(summaries),
+                                                       stage='cross_analysis')
+            return await self._extract_json_async(run, response, stage='cross_analysis')
+        
+        print(f"🌳 Иерархический кросс-анализ: {len(groups)} групп")
+        responses = await self._run_task_group({
+            i: self._make_api_call_async(run, self._build_cross_analysis_prompt(group), stage='cross_analysis')
+            for i, group in enumerate(groups)
+        })
+        parsed = await self._run_task_group({
+            i: self._extract_json_async(run, responses[i], stage='cross_analysis') for i in range(len(groups))
+        })
+        partials = [(parsed[i], [s.interview_id for s in group]) for i, group in enumerate(groups)]
+        
+        while len(partials) > 1:
+            batches = self._plan_reduce_batches(partials)
+            print(f"   Слияние {len(partials)} частичных результатов в {len(batches)}...")
+            results = await self._run_task_group({
+                i: self._reduce_cross_batch_async(run, batch) for i, batch in enumerate(batches)
+            })
+            partials = [results[i] for i in range(len(batches))]
+        return partials[0][0]
+    
+    async def _reduce_cross_batch_async(self, run: _AsyncRun, batch: List[Tuple[Dict[str, Any], List[int]]]
+                                        ) -> Tuple[Dict[str, Any], List[int]]:
+        """Асинхронное слияние группы частичных кросс-анализов"""
+        prompt = self._prepare_reduce(batch)
+        if prompt is None:
+            return self._union_cross_analyses(batch)
+        response = await self._make_api_call_async(run, prompt, stage='cross_reduce')
+        merged = await self._extract_json_async(run, response, stage='cross_reduce')
+        return self._finish_reduce(batch, merged)
+    
+    async def _merge_cross_analysis_async(self, run: _AsyncRun, cross_analysis: Dict[str, Any], base_count: int,
+                                          new_summaries: List[InterviewSummary]) -> Dict[str, Any]:
+        """Обновление кросс-анализа данными новых интервью
+        
+        Новые интервью, не помещающиеся в бюджет одного промпта, добавляются
+        к агрегату группами по очереди. Пустой результат - обновление не
+        удалось (нужен полный кросс-анализ).
+        """
+        groups = self._plan_merge_groups(cross_analysis, new_summaries)
+        if len(groups) > 1:
+            print(f"🌳 Обновление кросс-анализа по группам: {len(groups)}")
+        for group in groups:
+            response = await self._make_api_call_async(
+                run, self._build_cross_merge_prompt(cross_analysis, base_count, group), stage='cross_merge')
+            cross_analysis = await self._extract_json_async(run, response, stage='cross_merge')
+            if not cross_analysis:
+                return {}
+            base_count += len(group)
+        return cross_analysis
+    
+    async def _generate_final_findings_async(self, run: _AsyncRun, summaries: List[InterviewSummary],
+                                             cross_analysis: Dict) -> ResearchFindings:
+        """Генерация финальных выводов"""
+        response = await self._make_api_call_async(run, self._build_findings_prompt(summaries, cross_analysis),
+                                                   stage='final_findings')
+        return self._build_research_findings(
+            await self._extract_json_async(run, response, stage='final_findings'), cross_analysis)
+    
+    async def _run_task_group(self, coros: Dict[Any, Any]) -> Dict[Any, Any]:
+        """Запуск корутин группой задач: при отмене отменяются все задачи группы"""
+        if hasattr(asyncio, 'TaskGroup'):
+            async with asyncio.TaskGroup() as group:
+                tasks = {key: group.create_task(coro) for key, coro in coros.items()}
+            return {key: task.result() for key, task in tasks.items()}
+        
+        # Python < 3.11
+        results = await asyncio.gather(*coros.values())
+        return dict(zip(coros.keys(), results))
+    
+    async def _make_api_call_async(self, run: _AsyncRun, prompt: str, stage: str = "",
+                                   interview_id: Optional[int] = None,
+                                   schema: Optional[Dict[str, Any]] = None) -> str:
+        """Асинхронный API вызов под семафором и с дедлайном (см. _make_api_call)"""
+        checkpoint = self._checkpoint
+        if checkpoint is not None:
+            saved = checkpoint.load_response(prompt)
+            if saved is not None:
+                return saved
+        
         try:
-            # Попытка 1: весь ответ - JSON
-            try:
-                return json.loads(text)
-            except:
-                pass
-            
-            # Попытка 2: JSON между ```json и ```
-            json_match = re.search(r'```json\s*(.*?)\s*```', text, re.DOTALL)
-            if json_match:
-                return json.loads(json_match.group(1))
-            
-            # Попытка 3: JSON между { и }
-            json_match = re.search(r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}', text, re.DOTALL)
-            if json_match:
-                return json.loads(json_match.group(0))
-            
-            # Попытка 4: JSON массив между [ и ]
-            json_match = re.search(r'\[[^\[\]]*(?:\[[^\[\]]*\][^\[\]]*)*\]', text, re.DOTALL)
-            if json_match:
-                return json.loads(json_match.group(0))
-            
-            print(f"⚠️ Не удалось извлечь JSON из ответа. Первые 200 символов: {text[:200]}")
-            return {}
+            route = self.router.resolve(stage, estimate_tokens(prompt))
+            completion = await self._call_model_async(run, prompt, stage, interview_id, schema, route)
+            if route.escalate_to is not None and self._cascade_escalates(stage, interview_id, route, completion):
+                completion = await self._call_model_async(run, prompt, stage, interview_id, schema,
+                                                          self.router.escalate(route))
+            if checkpoint is not None:
+                checkpoint.save_response(prompt, stage, interview_id, completion.content)
+            return completion.content
             
+        except asyncio.TimeoutError:
+            print(f"❌ API вызов превысил дедлайн {run.call_timeout} сек")
+            if checkpoint is not None:
+                checkpoint.mark_failed(interview_id)
+            return "{}"
         except Exception as e:
-            print(f"❌ Ошибка при извлечении JSON: {e}")
+            print(f"❌ Ошибка API вызова: {e}")
+            if checkpoint is not None:
+                checkpoint.mark_failed(interview_id)
+            return "{}"
+    
+    async def _call_model_async(self, run: _AsyncRun, prompt: str, stage: str, interview_id: Optional[int],
+                                schema: Optional[Dict[str, Any]], route: RouteDecision) -> CompletionResult:
+        """Один вызов модели маршрута (через кэш) с учетом в журнале расхода"""
+        fresh: Dict[str, CompletionResult] = {}
+        # Каталог моделей может загружаться по сети - только при первом обращении и не в event loop
+        if not self.analysis_config['structured_output'] or route.model in self._structured_modes:
+            response_format = self._response_format(stage, route.model, schema)
+        else:
+            response_format = await asyncio.to_thread(self._response_format, stage, route.model, schema)
+        
+        async def compute() -> Dict[str, Any]:
+            async with run.slots:
+                try:
+                    completion = await self._generate_async(run, prompt, route, stage, interview_id,
+                                                            response_format)
+                except APIError as e:
+                    if not self._may_lack_structured_output(e, response_format):
+                        raise
+                    completion = await self._generate_async(run, prompt, route, stage, interview_id, None)
+                    self._disable_structured_output(route.model)
+            fresh['completion'] = self.client.price_completion(completion, route.model)
+            return asdict(completion)
+        
+        if self.cache is None:
+            await compute()
+        else:
+            # Ключ - по max_tokens конфигурации: лимит из профиля вызовов меняется по мере накопления
+            # истории, а в кэш попадают только необрезанные ответы, годные при любом из этих лимитов
+            key = make_cache_key(route.model, prompt, route.cache_max_tokens or route.max_tokens,
+                                 route.temperature, PROMPT_TEMPLATE_VERSION, response_format)
+            value = await self.cache.get_or_compute_async(key, compute, bypass=self.cache_bypass,
+                                                          store=lambda value: self._cacheable(stage, value))
+            if 'completion' not in fresh:
+                fresh['completion'] = self._completion_from_cache(value)
+        
+        completion = fresh['completion']
+        self._record_api_call(completion, stage, interview_id, route.model)
+        return completion
+    
+    def _cacheable(self, stage: str, value: Dict[str, Any]) -> bool:
+        """Ответ можно сохранить в кэш: он не обрезан по max_tokens и разбирается
+        
+        Ответы этапов, кроме саммари чанков, должны содержать JSON, а для
+        этапов со схемой - проходить ее проверку: иначе повторный прогон
+        получил бы из кэша тот же испорченный ответ вместо нового вызова.
+        """
+        content = value.get('content') or ""
+        if value.get('finish_reason') == 'length' or not content.strip():
+            return False
+        return stage == 'chunk' or parse_stage_response(stage, content).status == PARSE_OK
+    
+    def _cascade_escalates(self, stage: str, interview_id: Optional[int], route: RouteDecision,
+                           completion: CompletionResult) -> bool:
+        """Проверка ответа дешевой модели каскада: True - нужен вызов на модели эскалации"""
+        reason = cascade_verdict(stage, completion.content, completion.finish_reason)
+        with self._stats_lock:
+            counts = self._cascade_stats.setdefault(stage or 'other', {})
+            counts['attempts'] = counts.get('attempts', 0) + 1
+            if reason is not None:
+                counts['escalated'] = counts.get('escalated', 0) + 1
+                counts[f'reason:{reason}'] = counts.get(f'reason:{reason}', 0) + 1
+        if reason is not None:
+            where = f"этап {stage}" + (f", интервью {interview_id}" if interview_id is not None else "")
+            print(f"⤴️ Эскалация {route.model} → {route.escalate_to} ({where}): {reason}")
+        return reason is not None
+    
+    async def _generate_async(self, run: _AsyncRun, prompt: str, route: RouteDecision, stage: str,
+                              interview_id: Optional[int], response_format: Optional[Dict[str, Any]]
+                              ) -> CompletionResult:
+        """Асинхронный запрос к модели с продолжением обрезанного ответа (см. _generate)"""
+        if self.analysis_config['streaming']:
+            completion = await run.client.generate_completion_stream(
+                prompt, route.max_tokens, route.temperature, on_delta=self._stream_sink(stage, interview_id, route),
+                stall_timeout=self.analysis_config['stream_stall_timeout'], timeout=run.call_timeout,
+                response_format=response_format, model=route.model, read_timeout=route.timeout)
+        else:
+            completion = await run.client.generate_completion(prompt, route.max_tokens, route.temperature,
+                                                              timeout=run.call_timeout,
+                                                              response_format=response_format,
+                                                              model=route.model, read_timeout=route.timeout)
+        
+        head_tokens, spent, continuations = completion.completion_tokens, 0, 0
+        while completion.finish_reason == 'length' and continuations < self.analysis_config['max_continuations']:
+            tail = await run.client.generate_completion(prompt, route.max_tokens, route.temperature,
+                                                        timeout=run.call_timeout, prefill=completion.content.rstrip(),
+                                                        model=route.model, read_timeout=route.timeout)
+            spent += tail.total_tokens
+            completion = self._merge_completions(completion, tail)
+            continuations += 1
+        if continuations:
+            self._record_continuation(stage, interview_id, head_tokens, spent, completion.finish_reason != 'length')
+        return completion
+    
+    def _merge_completions(self, head: CompletionResult, tail: CompletionResult) -> CompletionResult:
+        """Ответ из начала и продолжения: текст склеивается, токены и стоимость суммируются"""
+        return CompletionResult(
+            content=merge_continuation(head.content, tail.content),
+            model=head.model or tail.model,
+            prompt_tokens=head.prompt_tokens + tail.prompt_tokens,
+            completion_tokens=head.completion_tokens + tail.completion_tokens,
+            cached_tokens=head.cached_tokens + tail.cached_tokens,
+            cost=head.cost + tail.cost if head.cost is not None and tail.cost is not None else None,
+            latency=head.latency + tail.latency,
+            finish_reason=tail.finish_reason,
+            usage_estimated=head.usage_estimated or tail.usage_estimated,
+            ttft=head.ttft,
+            tokens_per_sec=head.tokens_per_sec
+        )
+    
+    def _record_continuation(self, stage: str, interview_id: Optional[int], head_tokens: int, spent: int, ok: bool):
+        """Учет продолжения: сэкономлены токены уже сгенерированного начала ответа"""
+        self._count_repair(stage, continued=1, continued_ok=int(ok), repair_tokens=spent, tokens_saved=head_tokens)
+        where = f"этап {stage}" + (f", интервью {interview_id}" if interview_id is not None else "")
+        if not ok:
+            print(f"⚠️ Ответ обрезан по max_tokens и после продолжений ({where})")
+    
+    def _count_repair(self, stage: str, **counters: int):
+        """Увеличение счетчиков исправлений этапа"""
+        with self._stats_lock:
+            stats = self._repair_stats.setdefault(stage or 'other', {})
+            for name, value in counters.items():
+                stats[name] = stats.get(name, 0) + value
+    
+    def _response_format(self, stage: str, model: str,
+                         schema: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """response_format запроса этапа к модели model (None - схема только в тексте промпта)
+        
+        Режим определяется по supported_parameters модели из каталога /models:
+        json_schema для моделей со structured_outputs, режим JSON для моделей
+        только с response_format, иначе схема остается в промпте.
+        """
+        if not self.analysis_config['structured_output']:
+            return None
+        return response_format_for(stage, self._structured_mode(model), schema)
+    
+    def _structured_mode(self, model: str) -> str:
+        """Режим структурированного вывода модели (определяется один раз)"""
+        with self._stats_lock:
+            mode = self._structured_modes.get(model)
+        if mode is None:
+            info = self.client.get_model_info(model)
+            mode = structured_output_mode(info.get('supported_parameters') if "error" not in info else None)
+            with self._stats_lock:
+                mode = self._structured_modes.setdefault(model, mode)
+        return mode
+    
+    def _may_lack_structured_output(self, error: APIError, response_format: Optional[Dict[str, Any]]) -> bool:
+        """Запрос со схемой отклонен как неверный (400) - возможно, провайдер не принимает response_format"""
+        return response_format is not None and error.status_code == 400
+    
+    def _disable_structured_output(self, model: str):
+        """Запрос без response_format прошел после отказа со схемой: дальше схема только в промпте"""
+        with self._stats_lock:
+            if self._structured_modes.get(model) == MODE_PROMPT:
+                return
+            self._structured_modes[model] = MODE_PROMPT
+        print(f"⚠️ Модель {model} отклонила response_format: схема ответа передается в промпте")
+    
+    def _stream_sink(self, stage: str, interview_id: Optional[int],
+                     route: Optional[RouteDecision] = None) -> Optional[StreamItemSink]:
+        """Приемник потокового ответа этапа
+        
+        None - слушателя нет, ответ текстовый или это пробный ответ дешевой
+        модели каскада (его элементы могут не войти в результат).
+        """
+        listener = self.stream_listener
+        if listener is None or stage == 'chunk' or (route is not None and route.escalate_to is not None):
+            return None
+        return StreamItemSink(lambda key, item: listener(stage, interview_id, key, item))
+    
+    def _completion_from_cache(self, value: Dict[str, Any]) -> CompletionResult:
+        """Ответ из кэша: токены сохраняются для статистики, стоимость нулевая"""
+        completion = CompletionResult(**value)
+        completion.cost = 0.0
+        completion.latency = 0.0
+        completion.from_cache = True
+        return completion
+    
+    def _record_api_call(self, completion: CompletionResult, stage: str, interview_id: Optional[int],
+                         model: Optional[str] = None):
+        """Учет API вызова: фактические токены, стоимость и задержка (model - модель маршрута)"""
+        model = model or self.client.model
+        self.client.price_completion(completion, model)
+        entry = {
+            'stage': stage,
+            'interview_id': interview_id,
+            'model': completion.model or model,
+            'route_model': model,
+            'prompt_tokens': completion.prompt_tokens,
+            'completion_tokens': completion.completion_tokens,
+            'cached_tokens': completion.cached_tokens,
+            'cost': completion.cost,
+            'latency': round(completion.latency, 3),
+            'finish_reason': completion.finish_reason,
+            'estimated': completion.usage_estimated,
+            'cache_hit': completion.from_cache,
+            'ttft': completion.ttft,
+            'tokens_per_sec': completion.tokens_per_sec
+        }
+        if self.call_profile is not None and not completion.from_cache:
+            self.call_profile.record(stage, model, completion.completion_tokens, completion.latency)
+        with self._stats_lock:
+            if not completion.from_cache:
+                self.api_calls += 1
+            self.total_cost += completion.cost
+            self.usage_ledger.append(entry)
+    
+    def _reset_run_stats(self):
+        """Сброс статистики перед новым прогоном"""
+        with self._stats_lock:
+            self.run_metadata = {}
+            self._quote_indices = {}
+            self._parse_stats = {}
+            self._repair_stats = {}
+            self._cascade_stats = {}
+            self.api_calls = 0
+            self.total_cost = 0.0
+            self.usage_ledger = []
+        # Повторы и адаптивный лимит общие для прогонов одного анализатора - в отчет идут только счетчики прогона
+        self.retry_policy.metrics.reset()
+        if self.limiter is not None:
+            self.limiter.reset_metrics()
+    
+    def _summarize_usage(self, ledger: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """Сводка расхода токенов: итог и разбивка по этапам"""
+        if ledger is None:
+            with self._stats_lock:
+                ledger = list(self.usage_ledger)
+        
+        def totals(entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+            return {
+                'calls': len(entries),
+                'prompt_tokens': sum(e['prompt_tokens'] for e in entries),
+                'completion_tokens': sum(e['completion_tokens'] for e in entries),
+                'cached_tokens': sum(e['cached_tokens'] for e in entries),
+                'cost': round(sum(e['cost'] for e in entries), 6),
+                'latency': round(sum(e['latency'] for e in entries), 3)
+            }
+        
+        by_stage: Dict[str, List[Dict[str, Any]]] = {}
+        for entry in ledger:
+            by_stage.setdefault(entry['stage'] or 'other', []).append(entry)
+        
+        summary = totals(ledger)
+        summary['estimated_calls'] = sum(1 for e in ledger if e['estimated'])
+        summary['cache_hits'] = sum(1 for e in ledger if e['cache_hit'])
+        summary['by_stage'] = {stage: totals(entries) for stage, entries in by_stage.items()}
+        
+        by_model: Dict[str, List[Dict[str, Any]]] = {}
+        for entry in ledger:
+            by_model.setdefault(entry.get('route_model') or entry['model'], []).append(entry)
+        summary['by_model'] = {model: totals(entries) for model, entries in by_model.items()}
+        
+        streamed = [e for e in ledger if e.get('ttft') is not None]
+        if streamed:
+            speeds = [e['tokens_per_sec'] for e in streamed if e.get('tokens_per_sec')]
+            summary['streaming'] = {
+                'calls': len(streamed),
+                'ttft_avg': round(float(np.mean([e['ttft'] for e in streamed])), 3),
+                'ttft_p95': round(float(np.percentile([e['ttft'] for e in streamed], 95)), 3),
+                'tokens_per_sec_avg': round(float(np.mean(speeds)), 1) if speeds else 0.0
+            }
+        return summary
+    
+    async def _extract_json_async(self, run: _AsyncRun, text: str, stage: str = "",
+                                  interview_id: Optional[int] = None) -> Union[Dict, List]:
+        """Асинхронное извлечение JSON: вызов исправления - под семафором прогона"""
+        parsed, request = self._begin_repair(text, stage, interview_id)
+        if request is not None:
+            response = await self._make_api_call_async(run, request.prompt, stage=f"{stage}{REPAIR_SUFFIX}",
+                                                       interview_id=interview_id,
+                                                       schema=fields_schema(stage, request.fields))
+            parsed = self._finish_repair(text, stage, interview_id, parsed, request, response)
+        return self._report_parse(text, stage, interview_id, parsed)
+    
+    def _begin_repair(self, text: str, stage: str,
+                      interview_id: Optional[int]) -> Tuple[StageParse, Optional[RepairRequest]]:
+        """Разбор ответа и исправление без вызова модели
+        
+        Невалидный ответ этапа со схемой не выбрасывается:
+        - висячие запятые и лишняя обертка объекта исправляются локально;
+        - из обрезанного JSON спасаются завершенные элементы;
+        - иначе модели отправляется только сломанный фрагмент и ошибки
+          проверки (второй элемент результата - этот запрос).
+        """
+        parsed = parse_stage_response(stage, text)
+        if (parsed.status not in (PARSE_FAILED, PARSE_PARTIAL) or stage not in STAGE_SCHEMAS
+                or not self.analysis_config['repair_invalid']):
+            return parsed, None
+        self._count_repair(stage, invalid=1)
+        
+        local = repair_locally(stage, text)
+        if local is not None and is_improved(parsed, local):
+            self._count_repair(stage, fixed_local=1, tokens_saved=self._last_call_tokens(stage, interview_id))
+            return local, None
+        if is_truncated(text):
+            salvaged = salvage(stage, text)
+            if salvaged is not None and is_improved(parsed, salvaged):
+                self._count_repair(stage, salvaged=1, tokens_saved=self._last_call_tokens(stage, interview_id))
+                return salvaged, None
+        
+        # Схема полей - в промпте, если модель вызова исправления не получит ее через response_format
+        repair_model = self.router.resolve(f"{stage}{REPAIR_SUFFIX}", estimate_tokens(text)).model
+        with self._stats_lock:
+            schema_sent = (self.analysis_config['structured_output']
+                           and self._structured_modes.get(repair_model) == MODE_JSON_SCHEMA)
+        request = build_repair_request(stage, text, parsed, include_schema=not schema_sent)
+        if request is not None:
+            self._count_repair(stage, repair_calls=1)
+        return parsed, request
+    
+    def _finish_repair(self, text: str, stage: str, interview_id: Optional[int], parsed: StageParse,
+                       request: RepairRequest, response: str) -> StageParse:
+        """Ответ вызова исправления, вписанный в разобранные поля (или спасенные элементы)"""
+        request_tokens = self._last_call_tokens(f"{stage}{REPAIR_SUFFIX}", interview_id)
+        self._count_repair(stage, repair_tokens=request_tokens)
+        repaired = apply_repair(stage, parsed, request, response)
+        if is_improved(parsed, repaired):
+            saved = max(self._last_call_tokens(stage, interview_id) - request_tokens, 0)
+            self._count_repair(stage, fixed_call=1, tokens_saved=saved)
+            return repaired
+        salvaged = salvage(stage, text)
+        if salvaged is not None and is_improved(parsed, salvaged):
+            self._count_repair(stage, salvaged=1)
+            return salvaged
+        return parsed
+    
+    def _last_call_tokens(self, stage: str, interview_id: Optional[int]) -> int:
+        """Токены последнего вызова этапа (по журналу расхода)"""
+        with self._stats_lock:
+            for entry in reversed(self.usage_ledger):
+                if entry['stage'] == stage and entry['interview_id'] == interview_id:
+                    return entry['prompt_tokens'] + entry['completion_tokens']
+        return 0
+    
+    def _report_parse(self, text: str, stage: str, interview_id: Optional[int], parsed: StageParse
+                      ) -> Union[Dict, List]:
+        """Учет итогового статуса разбора; неразобранный ответ - пустой результат этапа"""
+        with self._stats_lock:
+            counts = self._parse_stats.setdefault(stage or 'other', {})
+            counts[parsed.status] = counts.get(parsed.status, 0) + 1
+        
+        where = f"этап {stage or '?'}" + (f", интервью {interview_id}" if interview_id is not None else "")
+        if parsed.status == PARSE_FAILED:
+            print(f"⚠️ Не удалось разобрать JSON ({where}): {'; '.join(parsed.errors)}. "
+                  f"Первые 200 символов: {(text or '')[:200]}")
             return {}
+        if parsed.status == PARSE_PARTIAL:
+            print(f"⚠️ Ответ не соответствует схеме ({where}), поля отброшены: {'; '.join(parsed.errors)}")
+        return parsed.data
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Асинхронный клиент для работы с OpenRouter API
+"""
+
+import json
+import gzip
+import time
+import asyncio
+from typing import Dict, Any, Optional, Callable, Awaitable
+
+from .openrouter_client import (OpenRouterClient, CompletionResult, build_chat_payload,
+                                parse_completion, parse_stream_completion, error_for_status)
+from .retry import RetryPolicy, APIError
+from .concurrency import AdaptiveLimiter
+from .streaming import StreamAccumulator, parse_sse_line
+
+try:
+    import httpx
+except ImportError:  # httpx - опциональная зависимость
+    httpx = None
+
+def _http2_available() -> bool:
+    """Проверка наличия пакета h2 для HTTP/2"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+class AsyncOpenRouterClient:
+    """Асинхронный клиент OpenRouter API
+
+    Работает поверх httpx.AsyncClient (HTTP/2, если установлен h2), поэтому
+    сотни одновременных запросов обслуживаются одним event loop без потока
+    на запрос. Без httpx запросы выполняются синхронным клиентом в пуле потоков.
+    """
+
+    def __init__(self, api_key: str, model: str = "anthropic/claude-3.5-sonnet",
+                 max_connections: int = 100, connect_timeout: float = 10.0,
+                 read_timeout: float = 120.0, http2: bool = True,
+                 gzip_min_bytes: Optional[int] = None, retry_policy: Optional[RetryPolicy] = None,
+                 base_url: str = "https://openrouter.ai/api/v1", limiter: Optional[AdaptiveLimiter] = None):
+        self.api_key = api_key
+        self.model = model
+        self.base_url = base_url.rstrip("/")
+        self.headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+            "HTTP-Referer": "https://ux-analyzer.local",
+            "X-Title": "UX Analyzer"
+        }
+        self.max_connections = max_connections
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.http2 = http2 and httpx is not None and _http2_available()
+        # Сжатие тел запросов больше gzip_min_bytes байт (None - не сжимать)
+        self.gzip_min_bytes = gzip_min_bytes
+        self.retry_policy = retry_policy or RetryPolicy()
+        # Адаптивный лимит запросов в полете, общий с синхронным клиентом (None - без лимита)
+        self.limiter = limiter
+
+        self._client = None
+        self._fallback_client: Optional[OpenRouterClient] = None
+        
+        # Статистика пула (события трассировки httpcore; все запросы - в одном event loop)
+        self._requests_sent = 0
+        self._pool_requests = 0
+        self._http2_requests = 0
+        self._connections_opened = 0
+        self._gzipped_requests = 0
+        if httpx is None:
+            print("⚠️ httpx не установлен: асинхронные запросы выполняются в пуле потоков")
+            self._fallback_client = OpenRouterClient(api_key, model, pool_size=max_connections,
+                                                     connect_timeout=connect_timeout,
+                                                     read_timeout=read_timeout,
+                                                     gzip_min_bytes=gzip_min_bytes,
+                                                     retry_policy=self.retry_policy,
+                                                     base_url=self.base_url, models_cache_path=None,
+                                                     limiter=limiter)
+
+    def _get_client(self):
+        """Ленивое создание httpx.AsyncClient внутри работающего event loop"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                headers=self.headers,
+                http2=self.http2,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout)
+            )
+        return self._client
+
+    def _request_body(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Аргументы POST запроса для httpx: тело (с gzip для больших тел, см. OpenRouterClient._post_json)
+        и трассировка соединений для get_pool_stats"""
+        self._requests_sent += 1
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        request = {"extensions": {"trace": self._trace}}
+        if self.gzip_min_bytes is None or len(body) < self.gzip_min_bytes:
+            return {"content": body, **request}
+        self._gzipped_requests += 1
+        return {"content": gzip.compress(body, compresslevel=5), "headers": {"Content-Encoding": "gzip"}, **request}
+    
+    async def _trace(self, event: str, info: Dict[str, Any]):
+        """События httpcore: новые TCP соединения и запросы, отправленные через пул"""
+        if event == "connection.connect_tcp.complete":
+            self._connections_opened += 1
+        elif event.endswith(".send_request_headers.started"):
+            self._pool_requests += 1
+            if event.startswith("http2."):
+                self._http2_requests += 1
+    
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """Статистика пула соединений (см. OpenRouterClient.get_pool_stats)
+        
+        Соединения считаются по событиям трассировки httpcore: при HTTP/2
+        одно соединение обслуживает много запросов одновременно.
+        """
+        if self._fallback_client is not None:
+            return self._fallback_client.get_pool_stats()
+        served = self._pool_requests
+        opened = self._connections_opened
+        # Открытые соединения - из пула httpcore (внутренний атрибут, может отсутствовать)
+        pool = getattr(getattr(self._client, "_transport", None), "_pool", None)
+        connections = list(getattr(pool, "connections", None) or [])
+        return {
+            "pool_size": self.max_connections,
+            "requests_sent": self._requests_sent,
+            "pool_requests": served,
+            "connections_opened": opened,
+            "connections_reused": max(0, served - opened),
+            "reuse_ratio": round(max(0, served - opened) / served, 3) if served else 0.0,
+            "idle_connections": sum(1 for connection in connections if connection.is_idle()),
+            "gzipped_requests": self._gzipped_requests,
+            "http2_requests": self._http2_requests
+        }
+
+    async def generate_content(self, prompt: str, max_tokens: int = 8192, temperature: float = 0.1,
+                               timeout: Optional[float] = None) -> str:
+        """Генерация контента через OpenRouter API"""
+        completion = await self.generate_completion(prompt, max_tokens, temperature, timeout)
+        return completion.content
+
+    async def generate_completion(self, prompt: str, max_tokens: int = 8192, temperature: float = 0.1,
+                                  timeout: Optional[float] = None,
+                                  response_format: Optional[Dict[str, Any]] = None,
+                                  prefill: Optional[str] = None,
+                                  model: Optional[str] = None,
+                                  read_timeout: Optional[float] = None) -> CompletionResult:
+        """Генерация контента с фактическим расходом токенов
+
+        timeout - общий дедлайн вызова в секундах (со всеми повторами); по
+        истечении запрос отменяется и выбрасывается asyncio.TimeoutError.
+        read_timeout - таймаут ожидания ответа одной попытки вместо read_timeout
+        клиента. Стоимость заполняется, только если ее сообщил API (иначе см.
+        OpenRouterClient.price_completion). prefill - начало ответа для
+        продолжения, model - модель вызова вместо self.model
+        (см. OpenRouterClient.generate_completion).
+        """
+        call = self._generate(prompt, max_tokens, temperature, response_format, prefill, model, read_timeout)
+        if timeout is not None:
+            return await asyncio.wait_for(call, timeout)
+        return await call
+
+    async def _generate(self, prompt: str, max_tokens: int, temperature: float,
+                        response_format: Optional[Dict[str, Any]] = None,
+                        prefill: Optional[str] = None, model: Optional[str] = None,
+                        read_timeout: Optional[float] = None) -> CompletionResult:
+        """Запрос /chat/completions с повторами"""
+        if self._fallback_client is not None:
+            return await asyncio.to_thread(self._fallback_client.generate_completion,
+                                           prompt, max_tokens, temperature, response_format, prefill, model,
+                                           read_timeout)
+
+        return await self.retry_policy.call_async(self._attempt, self._generate_once, prompt, max_tokens,
+                                                  temperature, response_format, prefill, model, read_timeout)
+
+    async def _attempt(self, func: Callable[..., Awaitable[CompletionResult]], *args) -> CompletionResult:
+        """Одна попытка запроса под адаптивным лимитом (см. OpenRouterClient._attempt)"""
+        if self.limiter is None:
+            return await func(*args)
+        return await self.limiter.call_async(func, *args)
+
+    async def _generate_once(self, prompt: str, max_tokens: int, temperature: float,
+                             response_format: Optional[Dict[str, Any]] = None,
+                             prefill: Optional[str] = None, model: Optional[str] = None,
+                             read_timeout: Optional[float] = None) -> CompletionResult:
+        """Одна попытка запроса /chat/completions"""
+        payload = build_chat_payload(model or self.model, prompt, max_tokens, temperature,
+                                     response_format=response_format, prefill=prefill)
+        started = time.monotonic()
+        try:
+            if read_timeout:
+                response = await self._get_client().post(
+                    f"{self.base_url}/chat/completions", **self._request_body(payload),
+                    timeout=httpx.Timeout(read_timeout, connect=self.connect_timeout))
+            else:
+                response = await self._get_client().post(f"{self.base_url}/chat/completions",
+                                                         **self._request_body(payload))
+        except httpx.TransportError as e:
+            raise APIError(f"Сетевая ошибка: {e!r}", retryable=True) from e
+
+        error = error_for_status(response.status_code, response.headers, response.reason_phrase or "")
+        if error:
+            raise error
+
+        try:
+            result = response.json()
+        except ValueError as e:
+            raise APIError("Ответ API не является JSON", response.status_code, retryable=True) from e
+        return parse_completion(result, prompt, time.monotonic() - started)
+
+    async def generate_completion_stream(self, prompt: str, max_tokens: int = 8192, temperature: float = 0.1,
+                                         on_delta: Optional[Callable[[str, int], None]] = None,
+                                         stall_timeout: float = 30.0,
+                                         timeout: Optional[float] = None,
+                                         response_format: Optional[Dict[str, Any]] = None,
+                                         model: Optional[str] = None,
+                                         read_timeout: Optional[float] = None) -> CompletionResult:
+        """Потоковая генерация (SSE)
+        
+        on_delta(delta, offset) получает фрагменты текста по мере генерации
+        (см. OpenRouterClient.generate_completion_stream); stall_timeout -
+        максимальная пауза между данными потока, timeout - общий дедлайн вызова,
+        read_timeout - время на весь ответ одной попытки (по истечении - повтор).
+        """
+        if self._fallback_client is not None:
+            call = asyncio.to_thread(self._fallback_client.generate_completion_stream, prompt, max_tokens,
+                                     temperature, on_delta, stall_timeout, response_format, model, read_timeout)
+        else:
+            call = self.retry_policy.call_async(self._attempt, self._generate_stream_once, prompt, max_tokens,
+                                                temperature, on_delta, stall_timeout, response_format, model,
+                                                read_timeout)
+        if timeout is not None:
+            return await asyncio.wait_for(call, timeout)
+        return await call
+    
+    async def _generate_stream_once(self, prompt: str, max_tokens: int, temperature: float,
+                                    on_delta: Optional[Callable[[str, int], None]],
+                                    stall_timeout: float,
+                                    response_format: Optional[Dict[str, Any]] = None,
+                                    model: Optional[str] = None,
+                                    read_timeout: Optional[float] = None) -> CompletionResult:
+        """Одна попытка потокового запроса /chat/completions (не дольше read_timeout)"""
+        call = self._stream_once(prompt, max_tokens, temperature, on_delta, stall_timeout, response_format, model)
+        if not read_timeout:
+            return await call
+        try:
+            return await asyncio.wait_for(call, read_timeout)
+        except asyncio.TimeoutError as e:
+            raise APIError(f"Потоковый ответ не получен за {read_timeout} сек", retryable=True) from e
+    
+    async def _stream_once(self, prompt: str, max_tokens: int, temperature: float,
+                           on_delta: Optional[Callable[[str, int], None]], stall_timeout: float,
+                           response_format: Optional[Dict[str, Any]] = None,
+                           model: Optional[str] = None) -> CompletionResult:
+        """Чтение одного потокового ответа /chat/completions"""
+        payload = build_chat_payload(model or self.model, prompt, max_tokens, temperature, stream=True,
+                                     response_format=response_format)
+        accumulator = StreamAccumulator()
+        # Таймаут чтения httpx действует на каждое чтение - это и есть детектор зависания
+        stream_timeout = httpx.Timeout(stall_timeout, connect=self.connect_timeout)
+        
+        try:
+            async with self._get_client().stream("POST", f"{self.base_url}/chat/completions",
+                                                 **self._request_body(payload),
+                                                 timeout=stream_timeout) as response:
+                error = error_for_status(response.status_code, response.headers, response.reason_phrase or "")
+                if error:
+                    raise error
+                
+                async for line in response.aiter_lines():
+                    event = parse_sse_line(line)
+                    if event is None:
+                        continue
+                    delta = accumulator.add_event(event)
+                    if delta and on_delta is not None:
+                        on_delta(delta, accumulator.length - len(delta))
+        except httpx.TimeoutException as e:
+            raise APIError(f"Поток ответа завис более {stall_timeout} сек: {e!r}", retryable=True) from e
+        except httpx.TransportError as e:
+            raise APIError(f"Сетевая ошибка: {e!r}", retryable=True) from e
+        
+        if not accumulator.finish_reason and not accumulator.content:
+            raise APIError("Пустой потоковый ответ", retryable=True)
+        return parse_stream_completion(accumulator, prompt)
+    
+    def get_concurrency_stats(self) -> Dict[str, Any]:
+        """Адаптивный лимит: текущий лимит, очередь и события снижения ({} - лимит выключен)"""
+        return self.limiter.snapshot() if self.limiter else {}
+
+    async def aclose(self):
+        """Закрытие соединений"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        if self._fallback_client is not None:
+            self._fallback_client.close()
+
+    async def __aenter__(self) -> "AsyncOpenRouterClient":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
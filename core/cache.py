@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Постоянный кэш ответов LLM (SQLite, адресация по содержимому)
+"""
+
+import json
+import time
+import zlib
+import sqlite3
+import asyncio
+import hashlib
+import threading
+import concurrent.futures
+from pathlib import Path
+from typing import Dict, Any, Optional, Callable, Awaitable
+
+try:
+    import zstandard
+except ImportError:  # zstandard - опциональная зависимость
+    zstandard = None
+
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+
+def make_cache_key(model: str, prompt: str, max_tokens: int, temperature: float,
+                   prompt_version: str, response_format: Optional[Dict[str, Any]] = None) -> str:
+    """Ключ кэша: хэш всех параметров, влияющих на ответ"""
+    params = [model, prompt, max_tokens, round(float(temperature), 4), prompt_version]
+    if response_format is not None:
+        # Без response_format ключи совпадают с прежними - кэш остается действительным
+        params.append(response_format)
+    material = json.dumps(params, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """Кэш ответов в одном файле SQLite
+
+    - вытеснение по LRU при превышении max_bytes;
+    - срок жизни записей ttl (сек, None - бессрочно);
+    - сжатие zstd (если установлен zstandard) или zlib;
+    - одинаковые запросы в полете объединяются: API вызывается один раз,
+      остальные ждут его результат.
+    """
+
+    def __init__(self, path: str = "cache/llm_cache.sqlite", max_bytes: int = 512 * 1024 * 1024,
+                 ttl: Optional[float] = 30 * 24 * 3600, compression: str = "zstd"):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.codec = self._select_codec(compression)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, value BLOB NOT NULL, codec INTEGER NOT NULL,"
+            " size INTEGER NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed)")
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+        # Запросы в полете: ключ -> Future
+        self._inflight: Dict[str, concurrent.futures.Future] = {}
+        self._inflight_async: Dict[str, asyncio.Future] = {}
+
+        self.metrics = {"hits": 0, "misses": 0, "coalesced": 0, "stores": 0,
+                        "evictions": 0, "expired": 0, "bypassed": 0, "rejected": 0}
+
+    def _select_codec(self, compression: str) -> int:
+        """Выбор алгоритма сжатия"""
+        if compression == "zstd":
+            if zstandard is not None:
+                return CODEC_ZSTD
+            return CODEC_ZLIB
+        if compression == "zlib":
+            return CODEC_ZLIB
+        return CODEC_NONE
+
+    def _encode(self, value: Dict[str, Any]) -> bytes:
+        raw = json.dumps(value, ensure_ascii=False).encode("utf-8")
+        if self.codec == CODEC_ZSTD:
+            return zstandard.ZstdCompressor(level=6).compress(raw)
+        if self.codec == CODEC_ZLIB:
+            return zlib.compress(raw, 6)
+        return raw
+
+    @staticmethod
+    def _decode(blob: bytes, codec: int) -> Dict[str, Any]:
+        if codec == CODEC_ZSTD:
+            if zstandard is None:
+                raise ValueError("Для чтения записи требуется zstandard")
+            blob = zstandard.ZstdDecompressor().decompress(blob)
+        elif codec == CODEC_ZLIB:
+            blob = zlib.decompress(blob)
+        return json.loads(blob.decode("utf-8"))
+
+    def _count(self, name: str, value: int = 1):
+        with self._lock:
+            self.metrics[name] += value
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Чтение записи (None - нет, истекла или не читается)"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, codec, size, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.metrics["misses"] += 1
+                return None
+
+            value, codec, size, created = row
+            if self.ttl is not None and now - created > self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._total_bytes -= size
+                self.metrics["expired"] += 1
+                self.metrics["misses"] += 1
+                return None
+
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+
+        try:
+            decoded = self._decode(value, codec)
+        except Exception:
+            self._count("misses")
+            return None
+        self._count("hits")
+        return decoded
+
+    def set(self, key: str, value: Dict[str, Any]):
+        """Запись с последующим вытеснением по LRU"""
+        blob = self._encode(value)
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, codec, size, created, accessed)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, blob, self.codec, len(blob), now, now)
+            )
+            self._total_bytes += len(blob) - (old[0] if old else 0)
+            self.metrics["stores"] += 1
+            self._evict_locked()
+
+    def _evict_locked(self):
+        """Удаление давно неиспользуемых записей до укладывания в max_bytes"""
+        while self._total_bytes > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM responses ORDER BY accessed ASC LIMIT 64"
+            ).fetchall()
+            if not rows:
+                self._total_bytes = 0
+                return
+            for key, size in rows:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._total_bytes -= size
+                self.metrics["evictions"] += 1
+                if self._total_bytes <= self.max_bytes:
+                    return
+
+    def _store(self, key: str, value: Dict[str, Any], store: Optional[Callable[[Dict[str, Any]], bool]]):
+        """Запись свежего результата, если он прошел проверку store"""
+        if store is not None and not store(value):
+            self._count("rejected")
+            return
+        self.set(key, value)
+
+    def get_or_compute(self, key: str, compute: Callable[[], Dict[str, Any]],
+                       bypass: bool = False,
+                       store: Optional[Callable[[Dict[str, Any]], bool]] = None) -> Dict[str, Any]:
+        """Значение из кэша или результат compute() (одновременные дубликаты объединяются)
+
+        bypass - не читать кэш, но сохранить свежий результат.
+        store(value) - проверка свежего результата перед записью: False -
+        результат возвращается, но не кэшируется (обрезанный или неразобранный ответ).
+        """
+        if bypass:
+            self._count("bypassed")
+        else:
+            cached = self.get(key)
+            if cached is not None:
+                return cached
+
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = concurrent.futures.Future()
+                self._inflight[key] = future
+            else:
+                self.metrics["coalesced"] += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            value = compute()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            self._store(key, value, store)
+            future.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    async def get_or_compute_async(self, key: str, compute: Callable[[], Awaitable[Dict[str, Any]]],
+                                   bypass: bool = False,
+                                   store: Optional[Callable[[Dict[str, Any]], bool]] = None) -> Dict[str, Any]:
+        """Асинхронный вариант get_or_compute"""
+        if bypass:
+            self._count("bypassed")
+        else:
+            cached = self.get(key)
+            if cached is not None:
+                return cached
+
+        future = self._inflight_async.get(key)
+        if future is not None:
+            self._count("coalesced")
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight_async[key] = future
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # Помечаем исключение как полученное
+            raise
+        else:
+            self._store(key, value, store)
+            future.set_result(value)
+            return value
+        finally:
+            self._inflight_async.pop(key, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Метрики кэша"""
+        with self._lock:
+            stats = dict(self.metrics)
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            stats["entries"] = entries
+            stats["bytes"] = self._total_bytes
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        return stats
+
+    def clear(self):
+        """Очистка кэша"""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._total_bytes = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
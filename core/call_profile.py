@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Профиль вызовов по этапам и моделям: max_tokens и таймауты по истории прогонов
+"""
+
+import json
+import math
+import time
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Deque, Tuple
+
+import numpy as np
+
+# Последних вызовов этапа и модели в профиле
+WINDOW = 200
+
+# Вызовов, после которых лимиты берутся из истории
+MIN_SAMPLES = 10
+
+# Перцентиль наблюдений и запас сверху
+PERCENTILE = 99
+TOKENS_HEADROOM = 1.25
+LATENCY_HEADROOM = 2.0
+LATENCY_BASE = 5.0  # сек: запас на очередь провайдера и сетевые задержки
+
+# max_tokens округляется вверх до степени двойки, чтобы лимит не менялся от прогона к прогону
+# (в ключ кэша ответов он не входит - там max_tokens конфигурации, см. ModelRouter)
+MIN_MAX_TOKENS = 512
+MIN_TIMEOUT = 20.0
+
+PROFILE_VERSION = 1
+
+def _round_tokens(value: float) -> int:
+    """Ближайшая сверху степень двойки, не меньше MIN_MAX_TOKENS"""
+    return max(MIN_MAX_TOKENS, 1 << max(0, math.ceil(math.log2(max(value, 1)))))
+
+class CallProfile:
+    """История токенов ответа и задержек вызовов по (этап, модель)
+
+    Из истории выводятся лимиты вызова: max_tokens - высокий перцентиль
+    фактических токенов ответа с запасом (округленный до степени двойки),
+    таймаут - перцентиль задержки с запасом. Пока вызовов меньше
+    MIN_SAMPLES, лимиты не предлагаются. Профиль сохраняется в JSON между
+    прогонами (path=None - только в памяти).
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path) if path else None
+        self._samples: Dict[str, Deque[Tuple[int, float]]] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._load()
+
+    @staticmethod
+    def key(stage: str, model: str) -> str:
+        return f"{stage or 'other'}|{model}"
+
+    def record(self, stage: str, model: str, completion_tokens: int, latency: float):
+        """Учет завершенного вызова (ответы из кэша не учитываются)"""
+        with self._lock:
+            samples = self._samples.setdefault(self.key(stage, model), deque(maxlen=WINDOW))
+            samples.append((int(completion_tokens), round(float(latency), 3)))
+            self._dirty = True
+
+    def limits(self, stage: str, model: str) -> Tuple[Optional[int], Optional[float]]:
+        """max_tokens и таймаут вызова по истории (None - истории недостаточно)"""
+        with self._lock:
+            samples = list(self._samples.get(self.key(stage, model), ()))
+        if len(samples) < MIN_SAMPLES:
+            return None, None
+        tokens = np.percentile([t for t, _ in samples], PERCENTILE)
+        latency = np.percentile([lat for _, lat in samples], PERCENTILE)
+        return (_round_tokens(tokens * TOKENS_HEADROOM),
+                round(max(MIN_TIMEOUT, latency * LATENCY_HEADROOM + LATENCY_BASE), 1))
+
+    def summary(self) -> Dict[str, Any]:
+        """Лимиты и число наблюдений по (этап, модель)"""
+        with self._lock:
+            keys = {key: len(samples) for key, samples in self._samples.items()}
+        result = {}
+        for key, count in sorted(keys.items()):
+            stage, model = key.split("|", 1)
+            max_tokens, timeout = self.limits(stage, model)
+            result[key] = {'samples': count, 'max_tokens': max_tokens, 'timeout': timeout}
+        return result
+
+    def _load(self):
+        """Загрузка профиля из файла (поврежденный или чужой версии - игнорируется)"""
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if not isinstance(data, dict) or data.get("version") != PROFILE_VERSION:
+            return
+        for key, samples in (data.get("calls") or {}).items():
+            self._samples[key] = deque(((int(t), float(lat)) for t, lat in samples), maxlen=WINDOW)
+
+    def save(self):
+        """Сохранение профиля на диск (если были новые вызовы)"""
+        with self._lock:
+            if self.path is None or not self._dirty:
+                return
+            calls: Dict[str, List[Tuple[int, float]]] = {key: list(samples) for key, samples in self._samples.items()}
+            self._dirty = False
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"version": PROFILE_VERSION, "updated_at": time.time(), "calls": calls}, f)
+            tmp_path.replace(self.path)
+        except OSError as e:
+            print(f"⚠️ Не удалось сохранить профиль вызовов: {e}")
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Контрольные точки прогона анализа (продолжение прерванного анализа)
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from pathlib import Path
+from dataclasses import asdict
+from typing import Dict, Any, List, Optional, Set
+
+from .data_models import InterviewSummary
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def _write_json_atomic(path: Path, data: Any):
+    """Запись JSON через временный файл: при обрыве старая версия остается целой"""
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+def _read_jsonl(path: Path) -> List[Dict[str, Any]]:
+    """Чтение журнала; оборванная последняя строка пропускается"""
+    if not path.exists():
+        return []
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return records
+
+class RunCheckpoint:
+    """Контрольные точки одного прогона в каталоге runs/<run_id>
+
+    - manifest.json - параметры прогона и статус;
+    - transcripts.json - исходные транскрипты (для продолжения);
+    - steps.jsonl - ответы API каждого шага (чанк, этап, кросс-анализ, выводы),
+      ключ - хэш промпта, поэтому после правки брифа или промптов шаг выполняется заново;
+    - summaries.jsonl - готовые InterviewSummary;
+    - <name>.json - итоговые агрегаты (кросс-анализ, выводы) для добавления интервью.
+
+    Ответ записывается сразу после получения, поэтому при обрыве теряются
+    только вызовы, которые были в полете.
+    """
+
+    def __init__(self, run_dir: str):
+        self.run_dir = Path(run_dir)
+        self.manifest_path = self.run_dir / "manifest.json"
+        self.steps_path = self.run_dir / "steps.jsonl"
+        self.summaries_path = self.run_dir / "summaries.jsonl"
+        self.transcripts_path = self.run_dir / "transcripts.json"
+
+        self._lock = threading.Lock()
+        self.manifest: Dict[str, Any] = {}
+        if self.manifest_path.exists():
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                self.manifest = json.load(f)
+
+        self._steps: Dict[str, str] = {
+            record["key"]: record["content"] for record in _read_jsonl(self.steps_path)
+        }
+        self._summaries: Dict[int, Dict[str, Any]] = {
+            record["interview_id"]: record for record in _read_jsonl(self.summaries_path)
+        }
+        self._failed: Set[int] = set()
+        self.restored_steps = 0
+        self.restored_summaries = 0
+
+    @classmethod
+    def create(cls, root: str, transcripts: List[str], settings: Dict[str, Any]) -> "RunCheckpoint":
+        """Новый прогон: каталог, манифест и копия транскриптов"""
+        digest = _sha256("\n\x00".join(transcripts))[:8]
+        run_id = f"{time.strftime('%Y%m%d_%H%M%S')}_{digest}"
+        run_dir = Path(root) / run_id
+        run_dir.mkdir(parents=True, exist_ok=True)
+
+        _write_json_atomic(run_dir / "transcripts.json", transcripts)
+        _write_json_atomic(run_dir / "manifest.json", {
+            "run_id": run_id,
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "status": "running",
+            "total_interviews": len(transcripts),
+            "transcript_hashes": [_sha256(t) for t in transcripts],
+            **settings
+        })
+        return cls(str(run_dir))
+
+    @property
+    def run_id(self) -> str:
+        return self.manifest.get("run_id", self.run_dir.name)
+
+    def load_transcripts(self) -> List[str]:
+        """Транскрипты прогона"""
+        with open(self.transcripts_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def update_manifest(self, **fields):
+        """Обновление полей манифеста (статус, число вызовов и т.п.)"""
+        with self._lock:
+            self.manifest.update(fields)
+            self._write_manifest()
+
+    def _progress(self) -> Dict[str, int]:
+        """Счетчики прогресса (под блокировкой)"""
+        return {
+            "completed_interviews": sum(1 for record in self._summaries.values() if record.get("complete")),
+            "saved_steps": len(self._steps)
+        }
+
+    def _write_manifest(self):
+        """Запись манифеста с текущим прогрессом (под блокировкой)"""
+        self.manifest.update(self._progress())
+        _write_json_atomic(self.manifest_path, self.manifest)
+
+    # ------------------------------------------------------------------
+    # Шаги (ответы API)
+    # ------------------------------------------------------------------
+
+    def load_response(self, prompt: str) -> Optional[str]:
+        """Сохраненный ответ на промпт (None - шаг еще не выполнен)"""
+        with self._lock:
+            content = self._steps.get(_sha256(prompt))
+            if content is not None:
+                self.restored_steps += 1
+            return content
+
+    def save_response(self, prompt: str, stage: str, interview_id: Optional[int], content: str):
+        """Запись ответа сразу после получения"""
+        record = {"key": _sha256(prompt), "stage": stage, "interview_id": interview_id,
+                  "content": content, "saved_at": time.time()}
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._steps[record["key"]] = content
+            with open(self.steps_path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+    def mark_failed(self, interview_id: Optional[int]):
+        """Шаг интервью завершился ошибкой: его саммари не считается готовым"""
+        if interview_id is None:
+            return
+        with self._lock:
+            self._failed.add(interview_id)
+
+    # ------------------------------------------------------------------
+    # Саммари интервью
+    # ------------------------------------------------------------------
+
+    def load_summary(self, interview_id: int) -> Optional[InterviewSummary]:
+        """Готовое саммари интервью (None - интервью нужно (до)анализировать)"""
+        with self._lock:
+            record = self._summaries.get(interview_id)
+            if record is None or not record.get("complete"):
+                return None
+            self.restored_summaries += 1
+        data = {key: value for key, value in record.items() if key != "complete"}
+        return InterviewSummary(**data)
+
+    def save_summary(self, summary: InterviewSummary):
+        """Запись саммари; complete=False, если у интервью были ошибки API"""
+        with self._lock:
+            record = {**asdict(summary), "complete": summary.interview_id not in self._failed}
+            self._summaries[summary.interview_id] = record
+            with open(self.summaries_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            # Прогресс в манифесте - list_runs не читает журналы прогонов
+            self._write_manifest()
+
+    def load_all_summaries(self) -> List[InterviewSummary]:
+        """Все сохраненные саммари по номеру интервью (последняя запись для каждого)"""
+        with self._lock:
+            records = [self._summaries[key] for key in sorted(self._summaries)]
+        return [InterviewSummary(**{key: value for key, value in record.items() if key != "complete"})
+                for record in records]
+
+    # ------------------------------------------------------------------
+    # Агрегаты
+    # ------------------------------------------------------------------
+
+    def save_artifact(self, name: str, data: Any):
+        """Сохранение агрегата прогона (name.json)"""
+        with self._lock:
+            _write_json_atomic(self.run_dir / f"{name}.json", data)
+
+    def load_artifact(self, name: str) -> Optional[Any]:
+        """Агрегат прогона (None - не сохранен)"""
+        path = self.run_dir / f"{name}.json"
+        if not path.exists():
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def get_status(self) -> Dict[str, Any]:
+        """Прогресс прогона"""
+        with self._lock:
+            return _status(self.run_dir, {**self.manifest, **self._progress()})
+
+def _status(run_dir: Path, manifest: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "run_id": manifest.get("run_id", run_dir.name),
+        "status": manifest.get("status", "unknown"),
+        "total_interviews": manifest.get("total_interviews", 0),
+        "completed_interviews": manifest.get("completed_interviews", 0),
+        "saved_steps": manifest.get("saved_steps", 0)
+    }
+
+def list_runs(root: str) -> List[Dict[str, Any]]:
+    """Прогоны в каталоге контрольных точек (новые первыми)
+
+    Читаются только манифесты: прогресс в них обновляется с каждым саммари
+    и сменой статуса, поэтому число шагов - на момент последнего обновления.
+    """
+    root_path = Path(root)
+    if not root_path.exists():
+        return []
+    runs = []
+    for run_dir in sorted(root_path.iterdir(), reverse=True):
+        manifest_path = run_dir / "manifest.json"
+        if not manifest_path.exists():
+            continue
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            continue
+        runs.append({"run_dir": str(run_dir), **_status(run_dir, manifest)})
+    return runs
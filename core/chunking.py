@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Разбиение транскриптов на чанки по репликам спикеров с учетом токенов
+"""
+
+import re
+from dataclasses import dataclass
+from typing import List, Tuple
+
+from .tokens import estimate_span_tokens
+
+# Начало реплики: "Интервьюер:", "Speaker 1:", "Анна К.:", "[Респондент]", "- Иван:".
+# Регистр не важен только для названий ролей: имя должно начинаться с заглавной,
+# иначе строка вида "пример: ещё строка" приняла бы слово "пример" за спикера.
+_SPEAKER_LINE = re.compile(
+    r'^[ \t]*(?:-\s*)?'
+    r'(?P<speaker>(?i:Speaker\s*\d+|Спикер\s*\d+|Interviewer|Интервьюер|Respondent|Респондент)'
+    r'|[А-ЯЁA-Z][а-яёa-z]+(?:[ \t]+[А-ЯЁA-Z]\.?)?'
+    r'|\[[^\]\n]+\])[ \t]*[:：]',
+    re.MULTILINE
+)
+_BRACKET_SPEAKER_LINE = re.compile(r'^[ \t]*\[(?P<speaker>[^\]\n]+)\]', re.MULTILINE)
+
+# Границы внутри длинной реплики: абзац, конец предложения, пробел
+_PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+_SENTENCE_END = re.compile(r'[.!?…]["»)]?\s+')
+_WHITESPACE = re.compile(r'\s+')
+
+# Доля строк с репликами, начиная с которой текст считается диаризованным
+SPEAKER_LINE_SHARE = 0.3
+
+@dataclass
+class Turn:
+    """Реплика (или часть длинной реплики) как диапазон исходного текста"""
+    speaker: str
+    start: int
+    end: int
+    tokens: int
+    continued: bool = False  # Продолжение реплики, разрезанной по размеру
+
+def detect_speaker_format(text: str, sample_lines: int = 50) -> bool:
+    """Определение наличия диаризации по первым строкам текста"""
+    lines = [line for line in text[:20000].split('\n') if line.strip()][:sample_lines]
+    if not lines:
+        return False
+    speaker_lines = sum(1 for line in lines
+                        if _SPEAKER_LINE.match(line) or _BRACKET_SPEAKER_LINE.match(line))
+    return speaker_lines > len(lines) * SPEAKER_LINE_SHARE
+
+def split_turns(text: str) -> List[Tuple[str, int, int]]:
+    """Реплики как (спикер, начало, конец) - без копирования текста
+
+    Без диаризации единицами служат абзацы.
+    """
+    if detect_speaker_format(text):
+        starts = sorted(
+            [(m.start(), m.group('speaker').strip()) for m in _SPEAKER_LINE.finditer(text)] +
+            [(m.start(), m.group('speaker').strip()) for m in _BRACKET_SPEAKER_LINE.finditer(text)]
+        )
+        bounds: List[Tuple[str, int]] = []
+        for position, speaker in starts:
+            if bounds and bounds[-1][1] == position:
+                continue
+            bounds.append((speaker, position))
+        if bounds and bounds[0][1] > 0 and text[:bounds[0][1]].strip():
+            bounds.insert(0, ("", 0))
+    else:
+        bounds = [("", 0)] + [("", m.end()) for m in _PARAGRAPH_BREAK.finditer(text)]
+
+    turns = []
+    for i, (speaker, start) in enumerate(bounds):
+        end = bounds[i + 1][1] if i + 1 < len(bounds) else len(text)
+        if end > start:
+            turns.append((speaker, start, end))
+    return turns
+
+class TurnChunker:
+    """Упаковка реплик в чанки по бюджету токенов
+
+    - размер считается в оценочных токенах (кириллица плотнее латиницы);
+    - реплики не разрезаются, пока помещаются в чанк; длинная реплика делится
+      по абзацам, предложениям или пробелам, но не посреди слова;
+    - перекрытие соседних чанков - целыми репликами до overlap_tokens;
+    - один проход по тексту, чанк - единственный срез исходной строки.
+    """
+
+    def __init__(self, target_tokens: int, overlap_tokens: int = 0):
+        self.target_tokens = max(1, target_tokens)
+        self.overlap_tokens = max(0, min(overlap_tokens, self.target_tokens // 2))
+
+    def units(self, text: str) -> List[Turn]:
+        """Реплики с оценкой токенов; длинные разрезаны до target_tokens"""
+        units: List[Turn] = []
+        for speaker, start, end in split_turns(text):
+            tokens = estimate_span_tokens(text, start, end)
+            if tokens <= self.target_tokens:
+                units.append(Turn(speaker, start, end, tokens))
+            else:
+                units.extend(self._split_long(text, speaker, start, end, tokens))
+        return units
+
+    def _split_long(self, text: str, speaker: str, start: int, end: int, tokens: int) -> List[Turn]:
+        """Деление длинной реплики на части не больше target_tokens"""
+        parts: List[Turn] = []
+        chars_per_token = (end - start) / tokens
+        position = start
+        while position < end:
+            limit = min(end, position + max(1, int(self.target_tokens * chars_per_token * 0.95)))
+            cut = end if limit >= end else self._find_cut(text, position, limit)
+            parts.append(Turn(speaker, position, cut, estimate_span_tokens(text, position, cut),
+                              continued=bool(parts)))
+            position = cut
+        return parts
+
+    @staticmethod
+    def _find_cut(text: str, start: int, limit: int) -> int:
+        """Последняя естественная граница в [start, limit): абзац, предложение, пробел"""
+        floor = start + (limit - start) // 2
+        for pattern in (_PARAGRAPH_BREAK, _SENTENCE_END, _WHITESPACE):
+            cut = -1
+            for match in pattern.finditer(text, floor, limit):
+                cut = match.end()
+            if cut > start:
+                return cut
+        return limit
+
+    def _pack(self, units: List[Turn]) -> List[Tuple[int, int, int]]:
+        """Упаковка реплик: (первая реплика, конец-исключительно, токены)"""
+        spans: List[Tuple[int, int, int]] = []
+        first = 0
+        tokens = 0
+        i = 0
+        while i < len(units):
+            if tokens + units[i].tokens > self.target_tokens and i > first:
+                spans.append((first, i, tokens))
+                # Перекрытие: последние целые реплики закрытого чанка
+                overlap_start = i
+                overlap = 0
+                while (overlap_start - 1 > first and
+                       overlap + units[overlap_start - 1].tokens <= self.overlap_tokens):
+                    overlap_start -= 1
+                    overlap += units[overlap_start].tokens
+                first, tokens = overlap_start, overlap
+            tokens += units[i].tokens
+            i += 1
+        if i > first:
+            spans.append((first, i, tokens))
+        return spans
+
+    def chunk_spans(self, text: str) -> List[Tuple[int, int, int]]:
+        """Границы чанков в тексте: (начало, конец, токены)"""
+        units = self.units(text)
+        return [(units[first].start, units[last - 1].end, tokens)
+                for first, last, tokens in self._pack(units)]
+
+    def chunk(self, text: str) -> List[str]:
+        """Чанки текста"""
+        if not text.strip():
+            return [text] if text else []
+        units = self.units(text)
+        chunks = []
+        for first, last, _ in self._pack(units):
+            head = units[first]
+            body = text[head.start:units[last - 1].end]
+            # Чанк с середины реплики начинается с имени спикера
+            chunks.append(f"{head.speaker}: {body}" if head.continued and head.speaker else body)
+        return chunks
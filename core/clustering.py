@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Локальная дедупликация болей, потребностей, цитат и рекомендаций без вызовов API
+"""
+
+import re
+import zlib
+from typing import Dict, Any, List, Optional, Sequence
+
+import numpy as np
+
+# Размерность хэшированного пространства символьных n-грамм
+VECTOR_DIM = 1024
+
+# Длина символьных n-грамм (внутри слов, с границами слова) и основы слова
+NGRAM_SIZE = 3
+STEM_LENGTH = 5
+
+# Косинусное сходство, начиная с которого формулировки считаются одной сущностью
+DEFAULT_THRESHOLD = 0.6
+
+# Для цитат - только почти дословные совпадения (одна цитата из разных этапов)
+QUOTE_THRESHOLD = 0.85
+
+# Строк матрицы сходства за один шаг
+BLOCK_SIZE = 512
+
+SEVERITY_ORDER = {'critical': 4, 'high': 3, 'medium': 2, 'low': 1}
+
+_WORD = re.compile(r'\w+')
+
+def _item_text(item: Any, keys: Sequence[str]) -> str:
+    """Текст сущности: первое непустое поле из keys (строка - сама сущность)"""
+    if isinstance(item, str):
+        return item
+    if isinstance(item, dict):
+        for key in keys:
+            value = item.get(key)
+            if isinstance(value, str) and value.strip():
+                return value
+    return ""
+
+def vectorize_texts(texts: List[str], dim: int = VECTOR_DIM) -> np.ndarray:
+    """TF-IDF векторы символьных n-грамм, хэшированные в dim измерений (строки L2-нормированы)
+
+    Каждой n-грамме соответствуют столбец и знак (feature hashing), поэтому
+    скалярные произведения векторов в среднем сохраняются, а память -
+    len(texts) x dim float32 независимо от размера словаря.
+    """
+    vocabulary: Dict[str, int] = {}
+    rows: List[int] = []
+    ids: List[int] = []
+    for row, text in enumerate(texts):
+        for word in _WORD.findall(text.lower().replace("ё", "е")):
+            if len(word) < 3:
+                continue
+            # Основа слова (окончания русских слов сильно меняются) и ее n-граммы
+            stem = word[:STEM_LENGTH]
+            rows.append(row)
+            ids.append(vocabulary.setdefault(f"#{stem}", len(vocabulary)))
+            padded = f" {stem} "
+            for i in range(len(padded) - NGRAM_SIZE + 1):
+                rows.append(row)
+                ids.append(vocabulary.setdefault(padded[i:i + NGRAM_SIZE], len(vocabulary)))
+
+    matrix = np.zeros((len(texts), dim), dtype=np.float32)
+    if not ids:
+        return matrix
+
+    rows_arr = np.asarray(rows, dtype=np.int64)
+    ids_arr = np.asarray(ids, dtype=np.int64)
+
+    # IDF по числу текстов с n-граммой
+    pairs = np.unique(ids_arr * len(texts) + rows_arr)
+    df = np.bincount(pairs // len(texts), minlength=len(vocabulary))
+    idf = np.log((1 + len(texts)) / (1 + df)) + 1.0
+
+    # Столбец и знак каждой n-граммы - из устойчивого хэша (одинаково между запусками)
+    hashes = np.fromiter((zlib.crc32(ngram.encode("utf-8")) for ngram in vocabulary),
+                         dtype=np.int64, count=len(vocabulary))
+    columns = hashes % dim
+    signs = np.where((hashes >> 16) & 1, 1.0, -1.0)
+
+    np.add.at(matrix, (rows_arr, columns[ids_arr]), (signs[ids_arr] * idf[ids_arr]).astype(np.float32))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+def cluster_texts(texts: List[str], threshold: float = DEFAULT_THRESHOLD,
+                  block_size: int = BLOCK_SIZE) -> List[List[int]]:
+    """Кластеры близких формулировок (индексы texts)
+
+    Жадная кластеризация по лидерам: текст присоединяется к первому кластеру,
+    лидер которого похож на него не меньше threshold, иначе открывает новый.
+    Сходство с лидерами считается блоками матричным умножением, поэтому
+    цепочки "A похоже на B, B на C" не склеивают разные проблемы.
+    """
+    return cluster_vectors(vectorize_texts(texts), threshold, block_size)
+
+def cluster_vectors(vectors: np.ndarray, threshold: float = DEFAULT_THRESHOLD,
+                    block_size: int = BLOCK_SIZE) -> List[List[int]]:
+    """Кластеризация по лидерам для готовых нормированных векторов (см. cluster_texts)"""
+    if not len(vectors):
+        return []
+    leaders = np.zeros((0, vectors.shape[1]), dtype=np.float32)
+    clusters: List[List[int]] = []
+
+    for start in range(0, len(vectors), block_size):
+        block = vectors[start:start + block_size]
+        if len(leaders):
+            similarity = block @ leaders.T
+            best = similarity.argmax(axis=1)
+            best_score = similarity[np.arange(len(block)), best]
+        else:
+            best = np.zeros(len(block), dtype=np.int64)
+            best_score = np.full(len(block), -1.0)
+
+        new_leaders: List[int] = []
+        for offset in range(len(block)):
+            index = start + offset
+            if best_score[offset] >= threshold:
+                clusters[best[offset]].append(index)
+                continue
+            # Лидеры, открытые в этом же блоке, еще не вошли в матрицу leaders
+            if new_leaders:
+                local = vectors[new_leaders] @ block[offset]
+                match = int(local.argmax())
+                if local[match] >= threshold:
+                    clusters[len(leaders) + match].append(index)
+                    continue
+            new_leaders.append(index)
+            clusters.append([index])
+        if new_leaders:
+            leaders = np.vstack([leaders, vectors[new_leaders]])
+    return clusters
+
+def _unique(values: List[Any]) -> List[Any]:
+    """Значения без повторов и пустых (порядок сохраняется)"""
+    seen = set()
+    result = []
+    for value in values:
+        if not value and value != 0:
+            continue
+        key = value if isinstance(value, (str, int, float)) else repr(value)
+        if key not in seen:
+            seen.add(key)
+            result.append(value)
+    return result
+
+def merge_entities(items: List[Dict[str, Any]], keys: Sequence[str],
+                   threshold: float = DEFAULT_THRESHOLD) -> List[Dict[str, Any]]:
+    """Объединение одинаковых по смыслу сущностей из разных интервью
+
+    items - словари сущностей (боль, потребность, цитата, рекомендация) с
+    необязательным полем interview_id. Каноническая формулировка - элемент,
+    ближайший к центру кластера; в нее сливаются цитаты, номера интервью и
+    максимальная серьезность. Добавляются поля:
+    - interview_ids - номера интервью с этой сущностью;
+    - frequency_count - число интервью (или упоминаний, если номеров нет);
+    - mentions - число исходных формулировок;
+    - variations - другие формулировки.
+    Результат отсортирован по frequency_count и серьезности.
+    """
+    texts = [_item_text(item, keys) for item in items]
+    indexed = [i for i, text in enumerate(texts) if text.strip()]
+    if not indexed:
+        return []
+
+    vectors = vectorize_texts([texts[i] for i in indexed])
+    merged = []
+    for cluster in cluster_vectors(vectors, threshold):
+        members = [indexed[i] for i in cluster]
+        if len(cluster) > 1:
+            centroid = vectors[cluster].mean(axis=0)
+            canonical = members[int((vectors[cluster] @ centroid).argmax())]
+        else:
+            canonical = members[0]
+
+        entity = dict(items[canonical]) if isinstance(items[canonical], dict) else {keys[0]: texts[canonical]}
+        interview_ids: List[int] = []
+        quotes: List[Any] = []
+        variations: List[str] = []
+        severity: Optional[str] = None
+        for index in members:
+            item = items[index] if isinstance(items[index], dict) else {}
+            if item.get('interview_id') is not None:
+                interview_ids.append(item['interview_id'])
+            interview_ids.extend(item.get('interview_ids') or [])
+            item_quotes = item.get('quotes') or []
+            quotes.extend(item_quotes if isinstance(item_quotes, list) else [item_quotes])
+            if index != canonical and texts[index] != texts[canonical]:
+                variations.append(texts[index])
+            item_severity = item.get('severity')
+            if isinstance(item_severity, str) and (
+                    severity is None or SEVERITY_ORDER.get(item_severity, 0) > SEVERITY_ORDER.get(severity, 0)):
+                severity = item_severity
+
+        entity.pop('interview_id', None)
+        interview_ids = sorted(_unique(interview_ids))
+        entity['interview_ids'] = interview_ids
+        entity['frequency_count'] = len(interview_ids) or len(members)
+        entity['mentions'] = len(members)
+        entity['variations'] = _unique(variations)
+        if quotes:
+            entity['quotes'] = _unique(quotes)
+        if severity is not None:
+            entity['severity'] = severity
+        merged.append(entity)
+
+    merged.sort(key=lambda e: (-e['frequency_count'], -SEVERITY_ORDER.get(e.get('severity'), 0)))
+    return merged
+
+def collect_entities(summaries: List[Any], field_name: str) -> List[Dict[str, Any]]:
+    """Сущности поля InterviewSummary всех интервью с номером интервью"""
+    items = []
+    for summary in summaries:
+        for item in getattr(summary, field_name, None) or []:
+            if isinstance(item, dict):
+                items.append({**item, 'interview_id': summary.interview_id})
+            elif isinstance(item, str):
+                items.append({'text': item, 'interview_id': summary.interview_id})
+    return items
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Адаптивный лимит одновременных запросов к API (AIMD)
+"""
+
+import time
+import asyncio
+import threading
+from collections import deque
+from typing import Dict, Any, Optional, Callable, Awaitable, Deque, Union, Tuple
+
+from .retry import APIError
+
+# Уменьшение лимита при перегрузке (429/5xx или всплеск задержки)
+BACKOFF = 0.5
+
+# Всплеск задержки: нормированная задержка выше базовой во столько раз
+LATENCY_SPIKE_FACTOR = 3.0
+
+# Базовая задержка - перцентиль последних LATENCY_WINDOW наблюдений (а не среднее): обычный
+# разброс времени генерации в нее укладывается. Проверка всплесков - после LATENCY_WARMUP наблюдений.
+LATENCY_WINDOW = 100
+LATENCY_BASELINE_PERCENTILE = 0.9
+LATENCY_WARMUP = 20
+
+# Снижение лимита только после стольких всплесков подряд: одиночный медленный ответ - не перегрузка
+LATENCY_SPIKE_STREAK = 3
+
+# Задержка нормируется на длину ответа: ответ на 4000 токенов дольше ответа на 100,
+# и это не перегрузка. Короткие ответы считаются как MIN_NORMALIZED_TOKENS токенов.
+MIN_NORMALIZED_TOKENS = 100
+
+_Waiter = Union[threading.Event, Tuple[asyncio.AbstractEventLoop, "asyncio.Future[None]"]]
+
+def is_overload(error: BaseException) -> bool:
+    """Ошибка перегрузки: 429 или 5xx"""
+    status = getattr(error, "status_code", None) if isinstance(error, APIError) else None
+    return status is not None and (status == 429 or status >= 500)
+
+def normalized_latency(completion: Any) -> Optional[float]:
+    """Задержка ответа на 1000 токенов (None - у результата нет задержки)"""
+    latency = getattr(completion, "latency", None)
+    if not latency:
+        return None
+    tokens = max(getattr(completion, "completion_tokens", 0) or 0, MIN_NORMALIZED_TOKENS)
+    return latency * 1000 / tokens
+
+class AdaptiveLimiter:
+    """Лимит запросов в полете по схеме AIMD, общий для всех клиентов API
+
+    - медленный старт: до первой перегрузки лимит растет на 1 с каждым
+      успешным ответом (удваивается за "круг" запросов);
+    - аддитивный рост: после перегрузки - на 1 за круг (1/limit на ответ),
+      пока задержка и ошибки в норме;
+    - рост только при насыщении: лимит растет, лишь когда запросов в полете
+      почти столько же, сколько разрешено (иначе лимит не был ограничением и
+      успешный ответ ничего не говорит о запасе емкости);
+    - мультипликативное снижение: 429/5xx или устойчивый всплеск нормированной
+      задержки (несколько ответов подряд намного медленнее p90 недавних)
+      уменьшают лимит в BACKOFF раз. Снижение - не чаще раза за круг: ответы
+      на запросы, начатые до последнего снижения, его не повторяют.
+
+    Синхронные и асинхронные вызовы ждут слот в одной очереди (FIFO), поэтому
+    лимит общий для пула потоков и event loop.
+    """
+
+    def __init__(self, initial: int = 4, min_limit: int = 1, max_limit: int = 64, backoff: float = BACKOFF,
+                 latency_spike_factor: float = LATENCY_SPIKE_FACTOR):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.backoff = backoff
+        self.latency_spike_factor = latency_spike_factor
+        self._limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._waiters: Deque[_Waiter] = deque()
+        self._slow_start = True
+        self._last_decrease = 0.0
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._latency_samples = 0
+        self._spike_streak = 0
+
+        # Метрики
+        self._peak_in_flight = 0
+        self._peak_queue = 0
+        self._throttle_events = 0
+        self._rate_limited = 0
+        self._server_errors = 0
+        self._latency_spikes = 0
+        self._lowest_limit = self._limit
+        self._highest_limit = self._limit
+
+    @property
+    def limit(self) -> int:
+        """Текущий лимит запросов в полете"""
+        with self._lock:
+            return int(self._limit)
+
+    def set_max_limit(self, max_limit: int):
+        """Верхняя граница лимита (фактический предел прогона, например размер его пула)"""
+        with self._lock:
+            self.max_limit = max(self.min_limit, max_limit)
+            self._limit = min(self._limit, float(self.max_limit))
+            self._wake()
+
+    def _has_capacity(self) -> bool:
+        return self._in_flight < int(self._limit)
+
+    def _take(self):
+        self._in_flight += 1
+        self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+
+    def _enqueue(self, waiter: _Waiter):
+        self._waiters.append(waiter)
+        self._peak_queue = max(self._peak_queue, len(self._waiters))
+
+    def _wake(self):
+        """Передача освободившихся слотов ожидающим (под блокировкой)"""
+        while self._waiters and self._has_capacity():
+            waiter = self._waiters.popleft()
+            self._take()
+            if isinstance(waiter, threading.Event):
+                waiter.set()
+            else:
+                loop, future = waiter
+                loop.call_soon_threadsafe(_grant, future)
+
+    def acquire(self) -> float:
+        """Ожидание слота (синхронно); результат - время начала запроса"""
+        with self._lock:
+            if not self._waiters and self._has_capacity():
+                self._take()
+                return time.monotonic()
+            event = threading.Event()
+            self._enqueue(event)
+        event.wait()
+        return time.monotonic()
+
+    async def acquire_async(self) -> float:
+        """Ожидание слота в event loop; результат - время начала запроса"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if not self._waiters and self._has_capacity():
+                self._take()
+                return time.monotonic()
+            future = loop.create_future()
+            waiter = (loop, future)
+            self._enqueue(waiter)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                try:
+                    self._waiters.remove(waiter)
+                    granted = False
+                except ValueError:
+                    granted = True
+            if granted:
+                # Слот уже передан отмененной задаче - возвращается следующему в очереди
+                self.release(0.0)
+            raise
+        return time.monotonic()
+
+    def release(self, started: float, overloaded: bool = False, latency: Optional[float] = None,
+                status_code: Optional[int] = None):
+        """Освобождение слота и подстройка лимита по результату запроса
+
+        overloaded - 429/5xx; latency - нормированная задержка успешного
+        ответа (см. normalized_latency); без обоих - ошибка, не влияющая на лимит.
+        """
+        with self._lock:
+            saturated = self._in_flight >= int(self._limit) - 1
+            self._in_flight -= 1
+            if overloaded:
+                if status_code == 429:
+                    self._rate_limited += 1
+                else:
+                    self._server_errors += 1
+                self._decrease(started)
+            elif latency is not None:
+                if not self._is_slow(latency):
+                    if saturated:
+                        self._increase()
+                elif self._spike_streak >= LATENCY_SPIKE_STREAK:
+                    # Устойчивый всплеск; одиночные медленные ответы лимит не меняют
+                    self._spike_streak = 0
+                    self._latency_spikes += 1
+                    self._decrease(started)
+            self._wake()
+
+    def _baseline(self) -> Optional[float]:
+        """Базовая задержка: LATENCY_BASELINE_PERCENTILE окна наблюдений (None - окно пусто)"""
+        if not self._latencies:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[int(LATENCY_BASELINE_PERCENTILE * (len(ordered) - 1))]
+
+    def _is_slow(self, latency: float) -> bool:
+        """Ответ медленнее базовой задержки в latency_spike_factor раз (ведет счет таких ответов подряд)
+
+        Наблюдение добавляется в окно базовой задержки в любом случае, поэтому
+        долгое замедление со временем становится новой нормой.
+        """
+        baseline = self._baseline()
+        self._latency_samples += 1
+        self._latencies.append(latency)
+        slow = (baseline is not None and self._latency_samples > LATENCY_WARMUP
+                and latency > baseline * self.latency_spike_factor)
+        self._spike_streak = self._spike_streak + 1 if slow else 0
+        return slow
+
+    def _increase(self):
+        step = 1.0 if self._slow_start else 1.0 / max(self._limit, 1.0)
+        self._limit = min(float(self.max_limit), self._limit + step)
+        self._highest_limit = max(self._highest_limit, self._limit)
+
+    def _decrease(self, started: float):
+        """Мультипликативное снижение (не чаще раза за круг запросов)"""
+        if started < self._last_decrease:
+            return
+        self._slow_start = False
+        self._limit = max(float(self.min_limit), self._limit * self.backoff)
+        self._last_decrease = time.monotonic()
+        self._throttle_events += 1
+        self._lowest_limit = min(self._lowest_limit, self._limit)
+
+    def call(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Одна попытка запроса под лимитом (синхронно)"""
+        started = self.acquire()
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            self.release(started, overloaded=is_overload(e), status_code=getattr(e, "status_code", None))
+            raise
+        self.release(started, latency=normalized_latency(result))
+        return result
+
+    async def call_async(self, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """Одна попытка запроса под лимитом (в event loop)"""
+        started = await self.acquire_async()
+        try:
+            result = await func(*args, **kwargs)
+        except BaseException as e:
+            self.release(started, overloaded=is_overload(e), status_code=getattr(e, "status_code", None))
+            raise
+        self.release(started, latency=normalized_latency(result))
+        return result
+
+    def reset_metrics(self):
+        """Обнуление счетчиков и пиков (перед новым прогоном); лимит и базовая задержка сохраняются"""
+        with self._lock:
+            self._peak_in_flight = self._in_flight
+            self._peak_queue = len(self._waiters)
+            self._throttle_events = 0
+            self._rate_limited = 0
+            self._server_errors = 0
+            self._latency_spikes = 0
+            self._lowest_limit = self._limit
+            self._highest_limit = self._limit
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Метрики: лимит, запросы в полете, очередь и события снижения"""
+        with self._lock:
+            return {
+                "limit": int(self._limit),
+                "min_limit": self.min_limit,
+                "max_limit": self.max_limit,
+                "in_flight": self._in_flight,
+                "queue_depth": len(self._waiters),
+                "peak_in_flight": self._peak_in_flight,
+                "peak_queue_depth": self._peak_queue,
+                "throttle_events": self._throttle_events,
+                "rate_limited": self._rate_limited,
+                "server_errors": self._server_errors,
+                "latency_spikes": self._latency_spikes,
+                "lowest_limit": int(self._lowest_limit),
+                "highest_limit": int(self._highest_limit),
+                "slow_start": self._slow_start
+            }
+
+def _grant(future: "asyncio.Future[None]"):
+    """Пробуждение асинхронного ожидающего в его event loop"""
+    if not future.done():
+        future.set_result(None)
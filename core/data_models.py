@@ -125,13 +125,13 @@ class InterviewSummary:
     key_themes: List[Dict[str, Any]] = field(default_factory=list)
     pain_points: List[Dict[str, Any]] = field(default_factory=list)
     needs: List[Dict[str, Any]] = field(default_factory=list)
-    insights: List[str] = field(default_factory=list)
+    insights: List[Dict[str, Any]] = field(default_factory=list)
     emotional_journey: List[Dict[str, Any]] = field(default_factory=list)
-    contradictions: List[str] = field(default_factory=list)
+    contradictions: List[Dict[str, Any]] = field(default_factory=list)
     quotes: List[Dict[str, Any]] = field(default_factory=list)
     business_pains: List[Dict[str, Any]] = field(default_factory=list)
     user_problems: List[Dict[str, Any]] = field(default_factory=list)
-    opportunities: List[str] = field(default_factory=list)
+    opportunities: List[Dict[str, Any]] = field(default_factory=list)
     sentiment_score: float = 0.0
     brief_related_findings: Dict[str, Any] = field(default_factory=dict)
 
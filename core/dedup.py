@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Поиск почти одинаковых транскриптов (MinHash + LSH) перед анализом
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Tuple
+
+import numpy as np
+
+from .tokens import estimate_tokens
+
+# Порог сходства (оценка коэффициента Жаккара по шинглам), выше которого транскрипт - дубликат
+DEFAULT_THRESHOLD = 0.85
+
+# Размер шингла в словах и длина подписи MinHash
+SHINGLE_SIZE = 5
+NUM_PERM = 128
+
+# LSH: 16 полос по 8 значений - кандидаты с вероятностью 50% при сходстве ~0.7
+LSH_BANDS = 16
+
+_WORD = re.compile(r'\w+')
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+_SHINGLE_BASE = np.uint64(1000003)
+_BLOCK = 4096
+
+_rng = np.random.default_rng(20240601)
+# Перестановки multiply-shift: старшие 32 бита (a * h + b) mod 2^64, a - нечетное
+_PERM_A = _rng.integers(1, 1 << 63, size=NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_PERM_B = _rng.integers(0, 1 << 63, size=NUM_PERM, dtype=np.uint64)
+_SHIFT = np.uint64(32)
+
+@dataclass
+class DuplicateReport:
+    """Результат поиска дубликатов"""
+    total: int = 0
+    kept: List[int] = field(default_factory=list)  # индексы оставленных транскриптов
+    # индекс дубликата -> (индекс оригинала, оценка сходства)
+    duplicates: Dict[int, Tuple[int, float]] = field(default_factory=dict)
+    saved_tokens: int = 0  # оценка токенов транскриптов-дубликатов
+
+    @property
+    def has_duplicates(self) -> bool:
+        return bool(self.duplicates)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'total': self.total,
+            'kept': len(self.kept),
+            'duplicates': [{'index': index, 'original': original, 'similarity': round(similarity, 3)}
+                           for index, (original, similarity) in sorted(self.duplicates.items())],
+            'saved_tokens': self.saved_tokens
+        }
+
+def _shingle_hashes(text: str, shingle_size: int = SHINGLE_SIZE) -> np.ndarray:
+    """Хэши словесных шинглов (регистр и пунктуация не учитываются)
+
+    Слова хэшируются один раз, шинглы считаются векторно как полиномиальный
+    хэш окна слов - линейно по длине текста.
+    """
+    words = _WORD.findall(text.lower().replace("ё", "е"))
+    if not words:
+        return np.zeros(1, dtype=np.uint64)
+    # hash() строки зависит от запуска интерпретатора, но подписи сравниваются только в одном процессе
+    word_hashes = np.fromiter(map(hash, words), dtype=np.int64, count=len(words)).view(np.uint64)
+    size = min(shingle_size, len(words))
+    count = len(words) - size + 1
+    hashes = np.zeros(count, dtype=np.uint64)
+    for offset in range(size):
+        hashes = hashes * _SHINGLE_BASE + word_hashes[offset:offset + count]
+    return np.unique(hashes & _MAX_HASH)
+
+def minhash_signature(text: str, shingle_size: int = SHINGLE_SIZE) -> np.ndarray:
+    """Подпись MinHash из NUM_PERM значений"""
+    hashes = _shingle_hashes(text, shingle_size)
+    signature = np.full(NUM_PERM, _MAX_HASH, dtype=np.uint64)
+    for start in range(0, len(hashes), _BLOCK):
+        block = hashes[start:start + _BLOCK, None]
+        permuted = (block * _PERM_A + _PERM_B) >> _SHIFT
+        np.minimum(signature, permuted.min(axis=0), out=signature)
+    return signature
+
+def find_near_duplicates(texts: List[str], threshold: float = DEFAULT_THRESHOLD) -> DuplicateReport:
+    """Поиск почти одинаковых текстов
+
+    Кандидаты находятся через LSH (совпадение одной из полос подписи), затем
+    сходство проверяется по полной подписи. Внутри корзины LSH каждый текст
+    сравнивается только с первым текстом корзины, поэтому время почти линейно
+    по числу текстов. Из группы дубликатов остается самый ранний текст.
+    """
+    report = DuplicateReport(total=len(texts))
+    if not texts:
+        return report
+
+    signatures = np.vstack([minhash_signature(text) for text in texts])
+    rows = NUM_PERM // LSH_BANDS
+
+    # Оригинал для каждого текста (наименьший индекс группы)
+    parent = list(range(len(texts)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    similarities: Dict[int, float] = {}
+    for band in range(LSH_BANDS):
+        buckets: Dict[bytes, int] = {}
+        band_values = signatures[:, band * rows:(band + 1) * rows]
+        for i in range(len(texts)):
+            key = band_values[i].tobytes()
+            first = buckets.setdefault(key, i)
+            if first == i:
+                continue
+            root_first, root_i = find(first), find(i)
+            if root_first == root_i:
+                continue
+            similarity = float(np.mean(signatures[root_first] == signatures[i]))
+            if similarity >= threshold:
+                root, child = min(root_first, root_i), max(root_first, root_i)
+                parent[child] = root
+                similarities[child] = similarity
+
+    for i in range(len(texts)):
+        root = find(i)
+        if root == i:
+            report.kept.append(i)
+        else:
+            similarity = similarities.get(i) or float(np.mean(signatures[root] == signatures[i]))
+            report.duplicates[i] = (root, similarity)
+            report.saved_tokens += estimate_tokens(texts[i])
+    return report
+
+def drop_near_duplicates(texts: List[str], threshold: float = DEFAULT_THRESHOLD) -> Tuple[List[str], DuplicateReport]:
+    """Тексты без дубликатов и отчет"""
+    report = find_near_duplicates(texts, threshold)
+    return [texts[i] for i in report.kept], report
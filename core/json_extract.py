@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Извлечение JSON из ответов модели и проверка структуры ответа этапа
+"""
+
+import re
+import json
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Tuple, Iterator, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Статусы разбора ответа этапа
+PARSE_OK = "ok"  # JSON найден, структура соответствует схеме
+PARSE_PARTIAL = "partial"  # часть полей отброшена (неверный тип)
+PARSE_EMPTY = "empty"  # пустой объект (ответ на ошибку API или пустой результат)
+PARSE_FAILED = "failed"  # JSON не найден или в нем нет ни одного поля этапа
+
+PARSE_STATUSES = (PARSE_OK, PARSE_PARTIAL, PARSE_EMPTY, PARSE_FAILED)
+
+_CROSS_ANALYSIS_SCHEMA = {
+    'common_patterns': list,
+    'consensus_points': list,
+    'divergence_points': list,
+}
+
+_STAGE_FIELDS = {
+    'profile': {'respondent_profile': dict, 'key_themes': list},
+    'pains': {'pain_points': list, 'needs': list},
+    'emotions': {'emotional_journey': list, 'insights': list, 'sentiment_score': float},
+    'quotes': {'quotes': list, 'contradictions': list},
+    'business': {'business_pains': list, 'user_problems': list, 'opportunities': list},
+    'brief': {'goal_related_findings': list, 'question_related_findings': list},
+}
+
+# Поля верхнего уровня ответа каждого этапа и их типы
+STAGE_SCHEMAS: Dict[str, Dict[str, type]] = {
+    **_STAGE_FIELDS,
+    'fused': {
+        **{key: kind for stage, fields in _STAGE_FIELDS.items() if stage != 'brief'
+           for key, kind in fields.items()},
+        'brief_related_findings': dict
+    },
+    'cross_analysis': _CROSS_ANALYSIS_SCHEMA,
+    'cross_reduce': _CROSS_ANALYSIS_SCHEMA,
+    'cross_merge': _CROSS_ANALYSIS_SCHEMA,
+    'final_findings': {'executive_summary': str, 'key_insights': list, 'strategic_recommendations': list},
+}
+
+# Символы, важные для сканера: скобки, кавычки и экранирование
+_STRUCTURAL = re.compile(r'[{}\[\]"\\]')
+_CLOSING = {'}': '{', ']': '['}
+
+def loads(text: Union[str, bytes]) -> Any:
+    """json.loads через orjson, если он установлен"""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+def iter_json_spans(text: str) -> Iterator[Tuple[int, int]]:
+    """Границы сбалансированных объектов и массивов верхнего уровня
+
+    Один проход по тексту: регулярное выражение перескакивает к следующей
+    скобке или кавычке, скобки внутри строк и экранированные кавычки
+    пропускаются. Текст вокруг JSON (```json, пояснения до и после)
+    не мешает. При несогласованной скобке поиск начинается заново.
+    """
+    stack: List[str] = []
+    start = 0
+    in_string = False
+    escaped_at = -1
+    for match in _STRUCTURAL.finditer(text):
+        position = match.start()
+        if position == escaped_at:
+            continue
+        char = match.group()
+        if in_string:
+            if char == '\\':
+                escaped_at = position + 1
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            # Кавычки вне JSON (в пояснениях модели) не открывают строку
+            in_string = bool(stack)
+        elif char in '{[':
+            if not stack:
+                start = position
+            stack.append(char)
+        elif char in _CLOSING and stack:
+            if stack[-1] != _CLOSING[char]:
+                stack = []
+                continue
+            stack.pop()
+            if not stack:
+                yield start, position + 1
+
+def extract_json(text: str) -> Optional[Union[Dict, List]]:
+    """JSON из ответа модели (None - не найден)
+
+    Сначала весь ответ разбирается как JSON, затем - сбалансированные
+    фрагменты в порядке убывания длины (в ответе бывают короткие примеры
+    вроде "[1, 3]" в пояснениях). Время линейно по длине ответа.
+    """
+    if not text:
+        return None
+    stripped = text.lstrip('\ufeff').strip()
+    try:
+        data = loads(stripped)
+        if isinstance(data, (dict, list)):
+            return data
+    except ValueError:
+        pass
+
+    for start, end in sorted(iter_json_spans(stripped), key=lambda span: span[0] - span[1]):
+        try:
+            return loads(stripped[start:end])
+        except ValueError:
+            continue
+    return None
+
+def _coerce(value: Any, kind: type) -> Tuple[Any, bool]:
+    """Значение поля в нужном типе; второй элемент - удалось ли привести"""
+    if kind is float:
+        if isinstance(value, bool):
+            return value, False
+        if isinstance(value, (int, float)):
+            return float(value), True
+        if isinstance(value, str):
+            try:
+                return float(value.strip().replace(',', '.')), True
+            except ValueError:
+                return value, False
+        return value, False
+    return value, isinstance(value, kind)
+
+@dataclass
+class StageParse:
+    """Результат разбора ответа этапа"""
+    status: str
+    data: Dict[str, Any] = field(default_factory=dict)
+    errors: List[str] = field(default_factory=list)
+    rejected: Dict[str, Any] = field(default_factory=dict)  # отброшенные поля с исходными значениями
+
+def validate_stage(stage: str, data: Any) -> StageParse:
+    """Проверка ответа этапа по схеме STAGE_SCHEMAS
+
+    Поля с неверным типом отбрасываются (статус partial), чтобы сборка
+    саммари не падала на строке вместо списка. Ответ без единого поля
+    этапа считается неразобранным. Для этапов без схемы проверяется
+    только то, что JSON найден.
+    """
+    if data is None:
+        return StageParse(PARSE_FAILED, errors=["JSON не найден"])
+    schema = STAGE_SCHEMAS.get(stage)
+    if schema is None:
+        return StageParse(PARSE_OK, data)
+    if not isinstance(data, dict):
+        return StageParse(PARSE_FAILED, errors=[f"ожидался объект, получен {type(data).__name__}"])
+    if not data:
+        return StageParse(PARSE_EMPTY)
+
+    cleaned: Dict[str, Any] = {}
+    errors: List[str] = []
+    rejected: Dict[str, Any] = {}
+    for key, value in data.items():
+        kind = schema.get(key)
+        if kind is None:
+            cleaned[key] = value
+            continue
+        coerced, valid = _coerce(value, kind)
+        if valid:
+            cleaned[key] = coerced
+        else:
+            rejected[key] = value
+            errors.append(f"{key}: ожидался {kind.__name__}, получен {type(value).__name__}")
+
+    if not any(key in cleaned for key in schema):
+        errors.append(f"нет полей этапа ({', '.join(schema)})")
+        return StageParse(PARSE_FAILED, cleaned, errors, rejected)
+    return StageParse(PARSE_PARTIAL if errors else PARSE_OK, cleaned, errors, rejected)
+
+def parse_stage_response(stage: str, text: str) -> StageParse:
+    """Извлечение и проверка JSON ответа этапа"""
+    return validate_stage(stage, extract_json(text))
+
+def summarize_parse_stats(stats: Dict[str, Dict[str, int]]) -> Dict[str, Any]:
+    """Сводка разбора ответов: доля неразобранных в целом и по этапам
+
+    Пустые ответы (ошибки API) в долю не входят - они учтены в статистике
+    вызовов и повторов.
+    """
+    def totals(counts: Dict[str, int]) -> Dict[str, Any]:
+        parsed = sum(counts.get(status, 0) for status in (PARSE_OK, PARSE_PARTIAL, PARSE_FAILED))
+        result = {status: counts.get(status, 0) for status in PARSE_STATUSES}
+        result['failure_rate'] = round(result[PARSE_FAILED] / parsed, 4) if parsed else 0.0
+        return result
+
+    overall: Dict[str, int] = {}
+    for counts in stats.values():
+        for status, count in counts.items():
+            overall[status] = overall.get(status, 0) + count
+    summary = totals(overall)
+    summary['responses'] = sum(overall.values())
+    summary['by_stage'] = {stage: totals(counts) for stage, counts in sorted(stats.items())}
+    return summary
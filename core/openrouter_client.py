@@ -6,136 +6,525 @@
 
 import requests
 import json
+import gzip
 import time
 import logging
-from typing import Dict, Any, Optional
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple, List, Callable
 from functools import wraps
+from requests.adapters import HTTPAdapter
 
-def retry_on_error(max_retries: int = 3, delay: float = 2.0):
-    """Декоратор для повторных попыток при ошибках"""
+from .retry import RetryPolicy, APIError, parse_retry_after
+from .concurrency import AdaptiveLimiter
+from .tokens import estimate_tokens
+from .streaming import StreamAccumulator, parse_sse_line
+
+# Цены Claude 3.5 Sonnet (USD за токен) - если /models недоступен
+DEFAULT_PRICING = {
+    "prompt": 0.000003,
+    "completion": 0.000015,
+    "input_cache_read": 0.0000003
+}
+
+@dataclass
+class CompletionResult:
+    """Ответ модели вместе с фактическим расходом токенов"""
+    content: str
+    model: str = ""
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    cost: Optional[float] = None  # None - стоимость не сообщена API
+    latency: float = 0.0
+    finish_reason: str = ""
+    usage_estimated: bool = False  # True - токены оценены локально (нет usage в ответе)
+    from_cache: bool = False  # True - ответ взят из кэша, API не вызывался
+    ttft: Optional[float] = None  # Время до первого токена (только потоковый режим)
+    tokens_per_sec: Optional[float] = None  # Скорость генерации (только потоковый режим)
+    
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+def retry_on_error(max_retries: int = 3, delay: float = 2.0, policy: Optional[RetryPolicy] = None):
+    """Декоратор для повторных попыток при ошибках (на основе RetryPolicy)"""
     def decorator(func):
+        retry_policy = policy or RetryPolicy(max_retries=max_retries, base_delay=delay)
+        
         @wraps(func)
         def wrapper(*args, **kwargs):
-            last_error = None
-            for attempt in range(max_retries):
-                try:
-                    return func(*args, **kwargs)
-                except Exception as e:
-                    last_error = e
-                    if attempt < max_retries - 1:
-                        print(f"   ⏳ API ошибка. Повтор через {delay} сек... (попытка {attempt + 1}/{max_retries})")
-                        time.sleep(delay)
-                        delay *= 1.5  # Экспоненциальная задержка
-                    else:
-                        print(f"   ❌ Не удалось выполнить запрос после {max_retries} попыток")
-                        raise last_error
-            raise last_error
+            return retry_policy.call(func, *args, **kwargs)
+        wrapper.retry_policy = retry_policy
         return wrapper
     return decorator
 
+def build_chat_payload(model: str, prompt: str, max_tokens: int, temperature: float,
+                       stream: bool = False, response_format: Optional[Dict[str, Any]] = None,
+                       prefill: Optional[str] = None) -> Dict[str, Any]:
+    """Тело запроса /chat/completions
+    
+    response_format - структурированный ответ (см. core/schemas.py); prefill -
+    начало ответа ассистента: модель продолжает его, а не начинает заново.
+    """
+    messages = [
+        {
+            "role": "user",
+            "content": prompt
+        }
+    ]
+    if prefill:
+        messages.append({"role": "assistant", "content": prefill})
+    payload = {
+        "model": model,
+        "messages": messages,
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+        "stream": stream,
+        "usage": {"include": True}
+    }
+    if response_format is not None:
+        payload["response_format"] = response_format
+    return payload
+
+def parse_chat_content(result: Dict[str, Any]) -> str:
+    """Извлечение текста ответа из JSON /chat/completions"""
+    if "choices" in result and len(result["choices"]) > 0:
+        return result["choices"][0]["message"]["content"]
+    # Обрезанный/пустой ответ провайдера - временная ошибка
+    raise APIError("Неожиданный формат ответа от API", retryable=True)
+
+def parse_completion(result: Dict[str, Any], prompt: str, latency: float) -> CompletionResult:
+    """CompletionResult из JSON /chat/completions (с блоком usage)"""
+    content = parse_chat_content(result)
+    choice = result["choices"][0]
+    usage = result.get("usage") or {}
+    details = usage.get("prompt_tokens_details") or {}
+    
+    completion = CompletionResult(
+        content=content,
+        model=result.get("model", ""),
+        prompt_tokens=int(usage.get("prompt_tokens") or 0),
+        completion_tokens=int(usage.get("completion_tokens") or 0),
+        cached_tokens=int(details.get("cached_tokens") or 0),
+        cost=float(usage["cost"]) if usage.get("cost") is not None else None,
+        latency=latency,
+        finish_reason=choice.get("finish_reason") or ""
+    )
+    
+    if not usage:
+        # Провайдер не вернул usage - оцениваем локально
+        completion.prompt_tokens = estimate_tokens(prompt)
+        completion.completion_tokens = estimate_tokens(content or "")
+        completion.usage_estimated = True
+    
+    return completion
+
+def parse_stream_completion(accumulator: StreamAccumulator, prompt: str) -> CompletionResult:
+    """CompletionResult из собранного потокового ответа (с TTFT и скоростью генерации)"""
+    finished = time.monotonic()
+    completion = parse_completion(accumulator.to_result(), prompt, finished - accumulator.started)
+    if accumulator.first_token_at is not None:
+        completion.ttft = round(accumulator.ttft, 3)
+        generation = finished - accumulator.first_token_at
+        if generation > 0:
+            completion.tokens_per_sec = round(completion.completion_tokens / generation, 1)
+    return completion
+
+def parse_pricing(pricing: Optional[Dict[str, Any]]) -> Optional[Dict[str, float]]:
+    """Цены за токен из метаданных /models (строки -> float)"""
+    if not pricing:
+        return None
+    parsed = {}
+    for key, value in pricing.items():
+        try:
+            parsed[key] = float(value)
+        except (TypeError, ValueError):
+            continue
+    if "prompt" not in parsed or "completion" not in parsed:
+        return None
+    return parsed
+
+def error_for_status(status_code: int, headers: Dict[str, str], detail: str = "") -> Optional[APIError]:
+    """Классифицированная ошибка для HTTP статуса (None для успешного ответа)"""
+    if status_code < 400:
+        return None
+    if status_code == 429:
+        return APIError("Rate limit превышен. Попробуйте позже.", status_code,
+                        retry_after=parse_retry_after(headers))
+    if status_code == 401:
+        return APIError("Неверный API ключ", status_code)
+    if status_code == 403:
+        return APIError("Доступ запрещен. Проверьте права API ключа", status_code)
+    return APIError(f"Ошибка API: HTTP {status_code} {detail}".rstrip(), status_code,
+                    retry_after=parse_retry_after(headers))
+
 class OpenRouterClient:
     """Клиент для работы с OpenRouter API"""
     
-    def __init__(self, api_key: str, model: str = "anthropic/claude-3.5-sonnet"):
+    def __init__(self, api_key: str, model: str = "anthropic/claude-3.5-sonnet",
+                 pool_size: int = 10, connect_timeout: float = 10.0, read_timeout: float = 120.0,
+                 gzip_min_bytes: Optional[int] = None, retry_policy: Optional[RetryPolicy] = None,
+                 models_cache_path: Optional[str] = "cache/models.json", models_cache_ttl: float = 24 * 3600,
+                 base_url: str = "https://openrouter.ai/api/v1", limiter: Optional[AdaptiveLimiter] = None):
         self.api_key = api_key
         self.model = model
-        self.base_url = "https://openrouter.ai/api/v1"
+        self.base_url = base_url.rstrip("/")
         self.headers = {
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json",
             "HTTP-Referer": "https://ux-analyzer.local",
             "X-Title": "UX Analyzer"
         }
+        
+        # Таймауты (подключение, чтение) и сжатие больших запросов
+        self.timeout: Tuple[float, float] = (connect_timeout, read_timeout)
+        self.gzip_min_bytes = gzip_min_bytes
+        
+        # Постоянная сессия с пулом keep-alive соединений
+        self.pool_size = pool_size
+        self.session = self._create_session(pool_size)
+        self._requests_sent = 0
+        self._gzipped_requests = 0
+        self._stats_lock = threading.Lock()
+        
+        # Политика повторов (классификация ошибок, jitter, Retry-After)
+        self.retry_policy = retry_policy or RetryPolicy()
+        
+        # Адаптивный лимит запросов в полете (общий с другими клиентами; None - без лимита)
+        self.limiter = limiter
+        
+        # Цены моделей из /models (загружаются при первом обращении к модели)
+        self._pricing: Dict[str, Dict[str, float]] = {}
+        self._pricing_lock = threading.Lock()
+        
+        # Каталог моделей /models: в памяти и на диске с TTL
+        self.models_cache_path = Path(models_cache_path) if models_cache_path else None
+        self.models_cache_ttl = models_cache_ttl
+        self._models: Optional[List[Dict[str, Any]]] = None
+        self._models_lock = threading.Lock()
+    
+    def _create_session(self, pool_size: int) -> requests.Session:
+        """Создание сессии с пулом соединений нужного размера"""
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update(self.headers)
+        return session
+    
+    def _post_json(self, url: str, payload: Dict[str, Any], timeout: Optional[Tuple[float, float]] = None,
+                   **kwargs) -> requests.Response:
+        """POST запрос через пул соединений (с gzip для больших тел)"""
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        headers = {}
+        compressed = self.gzip_min_bytes is not None and len(body) >= self.gzip_min_bytes
+        if compressed:
+            body = gzip.compress(body, compresslevel=5)
+            headers["Content-Encoding"] = "gzip"
+        
+        with self._stats_lock:
+            self._requests_sent += 1
+            if compressed:
+                self._gzipped_requests += 1
+        
+        return self.session.post(url, data=body, headers=headers, timeout=timeout or self.timeout, **kwargs)
+    
+    def _get(self, url: str, timeout: Optional[Tuple[float, float]] = None, **kwargs) -> requests.Response:
+        """GET запрос через пул соединений"""
+        with self._stats_lock:
+            self._requests_sent += 1
+        return self.session.get(url, timeout=timeout or self.timeout, **kwargs)
+    
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """Статистика пула соединений (для проверки переиспользования)"""
+        opened = 0
+        served = 0
+        idle = 0
+        for adapter in set(self.session.adapters.values()):
+            for key in adapter.poolmanager.pools.keys():
+                pool = adapter.poolmanager.pools.get(key)
+                if pool is None:
+                    continue
+                opened += pool.num_connections
+                served += pool.num_requests
+                if pool.pool is not None:
+                    # В очереди пула пустые слоты представлены None
+                    idle += sum(1 for conn in list(pool.pool.queue) if conn is not None)
+        
+        with self._stats_lock:
+            sent = self._requests_sent
+            gzipped = self._gzipped_requests
+        
+        return {
+            "pool_size": self.pool_size,
+            "requests_sent": sent,
+            "pool_requests": served,
+            "connections_opened": opened,
+            "connections_reused": max(0, served - opened),
+            "reuse_ratio": round((served - opened) / served, 3) if served else 0.0,
+            "idle_connections": idle,
+            "gzipped_requests": gzipped
+        }
+    
+    def close(self):
+        """Закрытие сессии и всех соединений пула"""
+        self.session.close()
     
-    @retry_on_error(max_retries=3, delay=2.0)
     def generate_content(self, prompt: str, max_tokens: int = 8192, temperature: float = 0.1) -> str:
         """Генерация контента через OpenRouter API"""
+        return self.generate_completion(prompt, max_tokens, temperature).content
+    
+    def generate_completion(self, prompt: str, max_tokens: int = 8192, temperature: float = 0.1,
+                            response_format: Optional[Dict[str, Any]] = None,
+                            prefill: Optional[str] = None, model: Optional[str] = None,
+                            timeout: Optional[float] = None) -> CompletionResult:
+        """Генерация контента с фактическим расходом токенов и стоимостью
         
-        payload = {
-            "model": self.model,
-            "messages": [
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            "max_tokens": max_tokens,
-            "temperature": temperature,
-            "stream": False
-        }
+        prefill - уже полученное начало ответа (продолжение обрезанной генерации);
+        content результата - только продолжение. model - модель вызова вместо
+        self.model, timeout - таймаут чтения вместо read_timeout клиента.
+        """
+        completion = self.retry_policy.call(self._attempt, self._generate_once, prompt, max_tokens, temperature,
+                                            response_format, prefill, model, timeout)
+        return self.price_completion(completion, model)
+    
+    def _attempt(self, func: Callable[..., CompletionResult], *args) -> CompletionResult:
+        """Одна попытка запроса под адаптивным лимитом (каждый повтор снова ждет слот)"""
+        if self.limiter is None:
+            return func(*args)
+        return self.limiter.call(func, *args)
+    
+    def _generate_once(self, prompt: str, max_tokens: int, temperature: float,
+                       response_format: Optional[Dict[str, Any]] = None,
+                       prefill: Optional[str] = None, model: Optional[str] = None,
+                       timeout: Optional[float] = None) -> CompletionResult:
+        """Одна попытка запроса /chat/completions"""
+        payload = build_chat_payload(model or self.model, prompt, max_tokens, temperature,
+                                     response_format=response_format, prefill=prefill)
+        started = time.monotonic()
+        
+        try:
+            response = self._post_json(f"{self.base_url}/chat/completions", payload,
+                                       timeout=(self.timeout[0], timeout) if timeout else None)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            raise APIError(f"Сетевая ошибка: {e}", retryable=True) from e
+        except requests.exceptions.RequestException as e:
+            raise APIError(f"Ошибка API: {e}", retryable=False) from e
+        
+        error = error_for_status(response.status_code, response.headers, response.reason or "")
+        if error:
+            raise error
         
         try:
-            response = requests.post(
-                f"{self.base_url}/chat/completions",
-                headers=self.headers,
-                json=payload,
-                timeout=120
-            )
-            
-            response.raise_for_status()
-            
             result = response.json()
+        except ValueError as e:
+            raise APIError("Ответ API не является JSON", response.status_code, retryable=True) from e
+        return parse_completion(result, prompt, time.monotonic() - started)
+    
+    def generate_completion_stream(self, prompt: str, max_tokens: int = 8192, temperature: float = 0.1,
+                                   on_delta: Optional[Callable[[str, int], None]] = None,
+                                   stall_timeout: float = 30.0,
+                                   response_format: Optional[Dict[str, Any]] = None,
+                                   model: Optional[str] = None,
+                                   timeout: Optional[float] = None) -> CompletionResult:
+        """Потоковая генерация (SSE)
+        
+        on_delta(delta, offset) получает каждый новый фрагмент текста по мере
+        генерации и его позицию в ответе; после обрыва и повтора фрагменты
+        снова идут с offset 0. stall_timeout - максимальная пауза между данными
+        потока: зависшее соединение обнаруживается за секунды, а не через read_timeout.
+        timeout - время на весь ответ одной попытки; по истечении попытка
+        повторяется, как после обрыва.
+        """
+        completion = self.retry_policy.call(self._attempt, self._generate_stream_once, prompt, max_tokens,
+                                            temperature, on_delta, stall_timeout, response_format, model, timeout)
+        return self.price_completion(completion, model)
+    
+    def _generate_stream_once(self, prompt: str, max_tokens: int, temperature: float,
+                              on_delta: Optional[Callable[[str, int], None]], stall_timeout: float,
+                              response_format: Optional[Dict[str, Any]] = None,
+                              model: Optional[str] = None, timeout: Optional[float] = None) -> CompletionResult:
+        """Одна попытка потокового запроса /chat/completions"""
+        payload = build_chat_payload(model or self.model, prompt, max_tokens, temperature, stream=True,
+                                     response_format=response_format)
+        accumulator = StreamAccumulator()
+        started = time.monotonic()
+        if timeout:
+            stall_timeout = min(stall_timeout, timeout)
+        
+        try:
+            # Таймаут чтения requests действует на каждое чтение сокета - это и есть детектор зависания
+            response = self._post_json(f"{self.base_url}/chat/completions", payload,
+                                       timeout=(self.timeout[0], stall_timeout), stream=True)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            raise APIError(f"Сетевая ошибка: {e}", retryable=True) from e
+        except requests.exceptions.RequestException as e:
+            raise APIError(f"Ошибка API: {e}", retryable=False) from e
+        
+        with response:
+            error = error_for_status(response.status_code, response.headers, response.reason or "")
+            if error:
+                raise error
             
-            if "choices" in result and len(result["choices"]) > 0:
-                content = result["choices"][0]["message"]["content"]
-                return content
-            else:
-                raise Exception("Неожиданный формат ответа от API")
-                
+            response.encoding = "utf-8"
+            try:
+                for line in response.iter_lines(decode_unicode=True):
+                    event = parse_sse_line(line)
+                    if event is None:
+                        continue
+                    delta = accumulator.add_event(event)
+                    if delta and on_delta is not None:
+                        on_delta(delta, accumulator.length - len(delta))
+                    if timeout and time.monotonic() - started > timeout and not accumulator.finish_reason:
+                        raise APIError(f"Потоковый ответ не получен за {timeout} сек", retryable=True)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                raise APIError(f"Поток ответа прерван или завис более {stall_timeout} сек: {e}",
+                               retryable=True) from e
+        
+        if not accumulator.finish_reason and not accumulator.content:
+            raise APIError("Пустой потоковый ответ", retryable=True)
+        return parse_stream_completion(accumulator, prompt)
+    
+    def get_retry_stats(self) -> Dict[str, Any]:
+        """Статистика повторов: число повторов, 429, суммарное ожидание"""
+        return self.retry_policy.metrics.snapshot()
+    
+    def get_concurrency_stats(self) -> Dict[str, Any]:
+        """Адаптивный лимит: текущий лимит, очередь и события снижения ({} - лимит выключен)"""
+        return self.limiter.snapshot() if self.limiter else {}
+    
+    def check_auth(self) -> Optional[bool]:
+        """Бесплатная проверка ключа через /key
+        
+        True - ключ принят, False - ключ отклонен (401/403),
+        None - проверить не удалось (сеть, нет эндпоинта); тогда подключение
+        проверит первый реальный запрос.
+        """
+        try:
+            response = self._get(f"{self.base_url}/key", timeout=(self.timeout[0], 15))
         except requests.exceptions.RequestException as e:
-            if response.status_code == 429:
-                raise Exception("Rate limit превышен. Попробуйте позже.")
-            elif response.status_code == 401:
-                raise Exception("Неверный API ключ")
-            elif response.status_code == 403:
-                raise Exception("Доступ запрещен. Проверьте права API ключа")
-            else:
-                raise Exception(f"Ошибка API: {e}")
+            print(f"⚠️ Не удалось проверить API ключ: {e}")
+            return None
+        if response.status_code in (401, 403):
+            return False
+        if response.status_code >= 400:
+            return None
+        return True
     
     def test_connection(self) -> bool:
-        """Тестирование подключения к API"""
-        try:
-            test_prompt = "Привет! Это тест подключения. Ответь одним словом: 'Работает'"
-            response = self.generate_content(test_prompt, max_tokens=10, temperature=0)
-            return "Работает" in response
-        except Exception as e:
-            print(f"❌ Ошибка подключения к API: {e}")
+        """Тестирование подключения к API (без платного запроса генерации)"""
+        status = self.check_auth()
+        if status is False:
+            print("❌ Ошибка подключения к API: Неверный API ключ")
             return False
+        if status is None:
+            print("⚠️ Подключение будет проверено первым запросом к модели")
+        return True
     
-    def get_model_info(self) -> Dict[str, Any]:
-        """Получение информации о модели"""
-        try:
-            response = requests.get(
-                f"{self.base_url}/models",
-                headers=self.headers,
-                timeout=30
-            )
+    def get_models_catalog(self, refresh: bool = False) -> List[Dict[str, Any]]:
+        """Каталог моделей /models (кэшируется в памяти и на диске)"""
+        with self._models_lock:
+            if self._models is not None and not refresh:
+                return self._models
+            
+            if not refresh:
+                cached = self._load_models_cache()
+                if cached is not None:
+                    self._models = cached
+                    return cached
+            
+            response = self._get(f"{self.base_url}/models", timeout=(self.timeout[0], 30))
             response.raise_for_status()
             
-            models = response.json().get("data", [])
-            for model in models:
-                if model.get("id") == self.model:
-                    return {
-                        "id": model.get("id"),
-                        "name": model.get("name", ""),
-                        "description": model.get("description", ""),
-                        "context_length": model.get("context_length", 0),
-                        "pricing": model.get("pricing", {})
-                    }
+            models = [
+                {
+                    "id": model.get("id"),
+                    "name": model.get("name", ""),
+                    "description": model.get("description", ""),
+                    "context_length": model.get("context_length", 0),
+                    "pricing": model.get("pricing", {}),
+                    "supported_parameters": model.get("supported_parameters", []),
+                    "top_provider": model.get("top_provider", {})
+                }
+                for model in response.json().get("data", [])
+            ]
+            self._models = models
+            self._save_models_cache(models)
+            return models
+    
+    def _load_models_cache(self) -> Optional[List[Dict[str, Any]]]:
+        """Каталог моделей из файла, если он свежий и от того же API"""
+        if self.models_cache_path is None or not self.models_cache_path.exists():
+            return None
+        try:
+            with open(self.models_cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("base_url") != self.base_url:
+            return None
+        if time.time() - data.get("fetched_at", 0) > self.models_cache_ttl:
+            return None
+        return data.get("models")
+    
+    def _save_models_cache(self, models: List[Dict[str, Any]]):
+        """Сохранение каталога моделей на диск"""
+        if self.models_cache_path is None:
+            return
+        try:
+            self.models_cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.models_cache_path.with_suffix(".tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"base_url": self.base_url, "fetched_at": time.time(), "models": models},
+                          f, ensure_ascii=False)
+            tmp_path.replace(self.models_cache_path)
+        except OSError as e:
+            print(f"⚠️ Не удалось сохранить каталог моделей: {e}")
+    
+    def get_model_info(self, model_id: Optional[str] = None) -> Dict[str, Any]:
+        """Получение информации о модели"""
+        model_id = model_id or self.model
+        try:
+            for model in self.get_models_catalog():
+                if model.get("id") == model_id:
+                    return model
             
             return {"error": "Модель не найдена"}
             
         except Exception as e:
             return {"error": f"Ошибка получения информации: {e}"}
     
-    def estimate_cost(self, prompt_tokens: int, response_tokens: int) -> Dict[str, float]:
-        """Оценка стоимости запроса"""
-        # Примерные цены для Claude 3.5 Sonnet через OpenRouter
-        input_price_per_1k = 0.003  # $0.003 за 1K токенов ввода
-        output_price_per_1k = 0.015  # $0.015 за 1K токенов вывода
+    def get_model_pricing(self, model_id: Optional[str] = None) -> Dict[str, float]:
+        """Цены модели (по умолчанию текущей, USD за токен) из метаданных /models"""
+        model_id = model_id or self.model
+        with self._pricing_lock:
+            if model_id not in self._pricing:
+                info = self.get_model_info(model_id)
+                pricing = parse_pricing(info.get("pricing")) if "error" not in info else None
+                if pricing is None:
+                    print(f"⚠️ Цены модели {model_id} недоступны, используются цены по умолчанию")
+                    pricing = dict(DEFAULT_PRICING)
+                self._pricing[model_id] = pricing
+            return self._pricing[model_id]
+    
+    def price_completion(self, completion: CompletionResult, model: Optional[str] = None) -> CompletionResult:
+        """Заполнение стоимости, если API ее не сообщил (model - модель вызова)"""
+        if completion.cost is None:
+            completion.cost = self.estimate_cost(completion.prompt_tokens, completion.completion_tokens,
+                                                 completion.cached_tokens, model)['total_cost']
+        return completion
+    
+    def estimate_cost(self, prompt_tokens: int, response_tokens: int, cached_tokens: int = 0,
+                      model: Optional[str] = None) -> Dict[str, float]:
+        """Оценка стоимости запроса по ценам модели (по умолчанию текущей)"""
+        pricing = self.get_model_pricing(model)
         
-        input_cost = (prompt_tokens / 1000) * input_price_per_1k
-        output_cost = (response_tokens / 1000) * output_price_per_1k
+        # Кэшированные токены входят в prompt_tokens, но тарифицируются отдельно
+        cache_price = pricing.get("input_cache_read", pricing["prompt"])
+        input_cost = (prompt_tokens - cached_tokens) * pricing["prompt"] + cached_tokens * cache_price
+        output_cost = response_tokens * pricing["completion"]
         total_cost = input_cost + output_cost
         
         return {
@@ -143,5 +532,6 @@ class OpenRouterClient:
             "output_cost": round(output_cost, 6),
             "total_cost": round(total_cost, 6),
             "input_tokens": prompt_tokens,
-            "output_tokens": response_tokens
+            "output_tokens": response_tokens,
+            "cached_tokens": cached_tokens
         }
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Проверка цитат по исходным транскриптам (индекс словесных n-грамм)
+"""
+
+import re
+from bisect import bisect_right
+from collections import Counter
+from dataclasses import dataclass, asdict
+from typing import Dict, Any, List, Optional, Tuple
+
+# Длина n-граммы индекса в словах
+NGRAM = 3
+
+# n-граммы, встречающиеся в транскрипте чаще, не участвуют в поиске ("и я не")
+MAX_POSTINGS = 64
+
+# Допустимый сдвиг выравнивания (пропущенные или вставленные слова)
+DIAGONAL_SLACK = 6
+
+# Доля n-грамм цитаты, найденных подряд в транскрипте
+VERIFIED_SCORE = 0.9
+APPROXIMATE_SCORE = 0.5
+
+STATUSES = ("verified", "approximate", "unverified")
+
+# Поля InterviewSummary со списками сущностей, у которых есть цитаты
+QUOTED_FIELDS = ("key_themes", "pain_points", "needs", "insights",
+                 "business_pains", "user_problems", "opportunities")
+
+_WORD = re.compile(r'\w+')
+_SHIFTS = sorted(range(-DIAGONAL_SLACK, DIAGONAL_SLACK + 1), key=abs)
+
+def _normalize(text: str) -> str:
+    return text.lower().replace("ё", "е")
+
+@dataclass
+class QuoteMatch:
+    """Результат поиска цитаты в транскрипте"""
+    status: str  # verified / approximate / unverified
+    score: float = 0.0
+    start: Optional[int] = None  # смещения в исходном транскрипте
+    end: Optional[int] = None
+    interview_id: Optional[int] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["score"] = round(self.score, 3)
+        return data
+
+class TranscriptIndex:
+    """Индекс словесных n-грамм одного транскрипта
+
+    Цитата находится голосованием n-грамм за смещение выравнивания
+    (позиция в транскрипте минус позиция в цитате): поиск стоит
+    O(длина цитаты), а не O(длина транскрипта). Регистр и пунктуация
+    не учитываются, небольшие пропуски и вставки слов допускаются.
+    """
+
+    def __init__(self, text: str, interview_id: Optional[int] = None):
+        self.text = text
+        self.interview_id = interview_id
+        self._starts: List[int] = []
+        self._ends: List[int] = []
+        words: List[str] = []
+        for match in _WORD.finditer(_normalize(text)):
+            words.append(match.group())
+            self._starts.append(match.start())
+            self._ends.append(match.end())
+        self._words = words
+
+        self._postings: Dict[Tuple[str, ...], List[int]] = {}
+        for position in range(len(words) - NGRAM + 1):
+            self._postings.setdefault(tuple(words[position:position + NGRAM]), []).append(position)
+
+        # Для коротких цитат (меньше NGRAM слов) - поиск по нормализованной строке
+        self._joined: Optional[str] = None
+        self._joined_starts: List[int] = []
+
+    def _locate_short(self, words: List[str]) -> Optional[Tuple[int, int]]:
+        """Позиции первого и последнего слова короткой цитаты"""
+        if self._joined is None:
+            offsets, position = [], 0
+            for word in self._words:
+                offsets.append(position)
+                position += len(word) + 1
+            self._joined = " ".join(self._words)
+            self._joined_starts = offsets
+        needle = " ".join(words)
+        found = self._joined.find(needle)
+        while found != -1:
+            first = bisect_right(self._joined_starts, found) - 1
+            # Совпадение только по целым словам: и начало, и конец - на границе слова
+            end = found + len(needle)
+            if self._joined_starts[first] == found and (end == len(self._joined) or self._joined[end] == " "):
+                return first, first + len(words) - 1
+            found = self._joined.find(needle, found + 1)
+        return None
+
+    def _best_diagonal(self, grams: List[List[str]], max_postings: Optional[int]) -> Optional[int]:
+        """Смещение выравнивания с наибольшим числом голосов n-грамм
+
+        Сначала голосуют только редкие n-граммы (max_postings), частые
+        учитываются, если редких в цитате нет.
+        """
+        votes: Counter = Counter()
+        for gram_index, gram in enumerate(grams):
+            positions = self._postings.get(tuple(gram))
+            if not positions or (max_postings is not None and len(positions) > max_postings):
+                continue
+            for position in positions:
+                votes[position - gram_index] += 1
+        if not votes:
+            return None
+        return max(votes, key=lambda d: (sum(votes.get(d + k, 0) for k in range(-DIAGONAL_SLACK, DIAGONAL_SLACK + 1)), -d))
+
+    def locate(self, quote: str) -> QuoteMatch:
+        """Поиск цитаты: статус, оценка и смещения найденного фрагмента"""
+        words = _WORD.findall(_normalize(quote or ""))
+        if not words or not self._words:
+            return QuoteMatch("unverified", interview_id=self.interview_id)
+
+        if len(words) < NGRAM:
+            span = self._locate_short(words)
+            if span is None:
+                return QuoteMatch("unverified", interview_id=self.interview_id)
+            return QuoteMatch("verified", 1.0, self._starts[span[0]], self._ends[span[1]], self.interview_id)
+
+        grams = [words[i:i + NGRAM] for i in range(len(words) - NGRAM + 1)]
+        best = self._best_diagonal(grams, MAX_POSTINGS)
+        if best is None:
+            best = self._best_diagonal(grams, None)
+        if best is None:
+            return QuoteMatch("unverified", interview_id=self.interview_id)
+
+        # Проход вдоль диагонали: каждая n-грамма ищется рядом с ожидаемой
+        # позицией, сдвиг накапливается (пропуски и вставки слов в цитате)
+        drift = 0
+        matched_positions: List[int] = []
+        for gram_index, gram in enumerate(grams):
+            expected = best + gram_index + drift
+            for shift in _SHIFTS:
+                position = expected + shift
+                if 0 <= position and self._words[position:position + NGRAM] == gram:
+                    matched_positions.append(position)
+                    drift += shift
+                    break
+        if not matched_positions:
+            return QuoteMatch("unverified", interview_id=self.interview_id)
+
+        score = len(matched_positions) / len(grams)
+        first = min(matched_positions)
+        last = max(matched_positions) + NGRAM - 1
+
+        if score < APPROXIMATE_SCORE:
+            return QuoteMatch("unverified", score, interview_id=self.interview_id)
+        status = "verified" if score >= VERIFIED_SCORE else "approximate"
+        return QuoteMatch(status, score, self._starts[first], self._ends[last], self.interview_id)
+
+def locate_quote(quote: str, indices: Dict[int, "TranscriptIndex"],
+                 interview_id: Optional[int] = None) -> QuoteMatch:
+    """Поиск цитаты в транскрипте интервью interview_id или, если он не указан, во всех"""
+    if interview_id in indices:
+        candidates = [indices[interview_id]]
+    else:
+        candidates = list(indices.values())
+    best = QuoteMatch("unverified")
+    for index in candidates:
+        match = index.locate(quote)
+        if match.score > best.score:
+            best = match
+            if match.score >= 1.0:
+                break
+    return best
+
+def _quote_text(quote: Any) -> str:
+    if isinstance(quote, dict):
+        return quote.get("text") or ""
+    return quote if isinstance(quote, str) else ""
+
+def verify_summary_quotes(summary: Any, index: TranscriptIndex):
+    """Проверка цитат саммари интервью по его транскрипту
+
+    - цитатам-объектам (summary.quotes) добавляется поле verification;
+    - сущностям со списком строк quotes (боли, потребности, темы...)
+      добавляется параллельный список quote_verification;
+    - моментам emotional_journey с полем quote - quote_verification.
+    """
+    for quote in summary.quotes or []:
+        if isinstance(quote, dict):
+            quote["verification"] = index.locate(quote.get("text") or "").to_dict()
+
+    for field_name in QUOTED_FIELDS:
+        for item in getattr(summary, field_name, None) or []:
+            if isinstance(item, dict) and isinstance(item.get("quotes"), list):
+                item["quote_verification"] = [index.locate(_quote_text(q)).to_dict() for q in item["quotes"]]
+
+    for moment in summary.emotional_journey or []:
+        if isinstance(moment, dict) and moment.get("quote"):
+            moment["quote_verification"] = index.locate(moment["quote"]).to_dict()
+
+def verify_insight_quotes(insights: List[Dict[str, Any]], indices: Dict[int, TranscriptIndex]):
+    """Проверка цитат ключевых инсайтов (цитаты из разных интервью)"""
+    for insight in insights or []:
+        if not isinstance(insight, dict):
+            continue
+        for quote in insight.get("quotes") or []:
+            if isinstance(quote, dict):
+                interview_id = quote.get("interview_id")
+                quote["verification"] = locate_quote(
+                    quote.get("text") or "", indices, interview_id if isinstance(interview_id, int) else None
+                ).to_dict()
+
+def quote_verification_stats(summaries: List[Any], insights: Optional[List[Dict[str, Any]]] = None) -> Dict[str, int]:
+    """Число цитат по статусам проверки"""
+    stats = {status: 0 for status in STATUSES}
+
+    def count(verification: Any):
+        if isinstance(verification, dict) and verification.get("status") in stats:
+            stats[verification["status"]] += 1
+
+    for summary in summaries:
+        for quote in summary.quotes or []:
+            if isinstance(quote, dict):
+                count(quote.get("verification"))
+        for field_name in QUOTED_FIELDS:
+            for item in getattr(summary, field_name, None) or []:
+                if isinstance(item, dict):
+                    for verification in item.get("quote_verification") or []:
+                        count(verification)
+        for moment in summary.emotional_journey or []:
+            if isinstance(moment, dict):
+                count(moment.get("quote_verification"))
+    for insight in insights or []:
+        if isinstance(insight, dict):
+            for quote in insight.get("quotes") or []:
+                if isinstance(quote, dict):
+                    count(quote.get("verification"))
+    stats["total"] = sum(stats[status] for status in STATUSES)
+    return stats
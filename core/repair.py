@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Исправление обрезанных и невалидных ответов этапов без повторного запуска этапа
+"""
+
+import re
+import json
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Tuple
+
+from .json_extract import (StageParse, STAGE_SCHEMAS, extract_json, validate_stage,
+                           PARSE_OK, PARSE_FAILED)
+from .schemas import fields_schema
+
+# Продолжений обрезанного по max_tokens ответа (assistant prefill) на один вызов
+DEFAULT_MAX_CONTINUATIONS = 2
+
+# Фрагмент длиннее этого не отправляется на исправление - дешевле спасти локально
+REPAIR_MAX_CHARS = 16000
+
+# Совпадение начала продолжения с началом ответа: модель начала ответ заново
+RESTART_PROBE_CHARS = 40
+
+# Модель иногда повторяет конец префикса в начале продолжения
+MIN_OVERLAP_CHARS = 20
+MAX_OVERLAP_CHARS = 200
+
+# Счетчики статистики исправлений одного этапа
+REPAIR_COUNTERS = ("continued", "continued_ok", "invalid", "fixed_local", "repair_calls", "fixed_call",
+                   "salvaged", "repair_tokens", "tokens_saved")
+
+_TOKENS = re.compile(r'[{}\[\]",\\]')
+_CLOSING = {'}': '{', ']': '['}
+_CLOSE_FOR = {'{': '}', '[': ']'}
+_TRAILING_COMMA = re.compile(r'\s*[}\]]')
+
+@dataclass
+class RepairRequest:
+    """Вызов исправления: промпт и поля, которые модель должна вернуть"""
+    prompt: str
+    fields: List[str]
+    fragment_chars: int = 0
+
+@dataclass
+class ScanResult:
+    """Результат сканирования JSON-кандидата"""
+    start: int = -1  # первая скобка
+    end: Optional[int] = None  # конец сбалансированного значения (None - не закрыт)
+    open_stack: str = ""  # незакрытые скобки в конце текста
+    cut: Optional[Tuple[int, str]] = None  # последняя точка среза: позиция и незакрытые скобки
+    trailing_commas: List[int] = field(default_factory=list)  # запятые перед } или ]
+
+def scan_json(text: str) -> ScanResult:
+    """Один проход по первому JSON-значению текста
+
+    Запоминает висячие запятые и точки, где можно обрезать значение без
+    потери уже завершенных элементов (после закрытой скобки или перед
+    запятой), - по ним обрезанный ответ закрывается в валидный JSON.
+    """
+    result = ScanResult()
+    first = re.search(r'[{\[]', text)
+    if first is None:
+        return result
+    result.start = first.start()
+    stack: List[str] = []
+    in_string = False
+    escaped_at = -1
+    for match in _TOKENS.finditer(text, result.start):
+        position = match.start()
+        if position == escaped_at:
+            continue
+        char = match.group()
+        if in_string:
+            if char == '\\':
+                escaped_at = position + 1
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+        elif char in '{[':
+            stack.append(char)
+        elif char in _CLOSING:
+            if not stack or stack[-1] != _CLOSING[char]:
+                break
+            stack.pop()
+            if not stack:
+                result.end = position + 1
+                return result
+            result.cut = (position + 1, "".join(stack))
+        elif char == ',':
+            if _TRAILING_COMMA.match(text, position + 1):
+                result.trailing_commas.append(position)
+            else:
+                result.cut = (position, "".join(stack))
+    result.open_stack = "".join(stack)
+    return result
+
+def is_truncated(text: str) -> bool:
+    """JSON в ответе оборван: скобки первого значения не закрыты до конца текста"""
+    scan = scan_json(text)
+    return scan.start >= 0 and scan.end is None and bool(scan.open_stack)
+
+def strip_trailing_commas(text: str) -> str:
+    """Удаление висячих запятых перед } и ] (вне строк) - частая ошибка моделей"""
+    commas = scan_json(text).trailing_commas
+    if not commas:
+        return text
+    parts = []
+    previous = 0
+    for position in commas:
+        parts.append(text[previous:position])
+        previous = position + 1
+    parts.append(text[previous:])
+    return "".join(parts)
+
+def salvage_truncated(text: str) -> Optional[str]:
+    """Обрезанный JSON, закрытый после последнего завершенного элемента
+
+    Незавершенный элемент массива (или поле объекта) отбрасывается, открытые
+    скобки закрываются: из ответа, оборванного на десятой боли, остаются
+    девять целых.
+    """
+    scan = scan_json(text)
+    if scan.start < 0:
+        return None
+    if scan.end is not None:
+        return text[scan.start:scan.end]
+    if scan.cut is None:
+        return None
+    position, open_stack = scan.cut
+    body = strip_trailing_commas(text[scan.start:position]).rstrip().rstrip(',')
+    return body + "".join(_CLOSE_FOR[char] for char in reversed(open_stack))
+
+def unwrap_stage_object(stage: str, data: Any) -> Any:
+    """Ответ, завернутый в лишний объект ({"analysis": {...поля этапа...}}), без обертки"""
+    schema = STAGE_SCHEMAS.get(stage)
+    if not schema or not isinstance(data, dict) or any(key in data for key in schema):
+        return data
+    nested = [value for value in data.values() if isinstance(value, dict) and any(key in value for key in schema)]
+    return nested[0] if len(nested) == 1 else data
+
+def repair_locally(stage: str, text: str) -> Optional[StageParse]:
+    """Исправление без вызова модели и без потери данных
+
+    Висячие запятые и лишняя обертка объекта. None - локально не исправить.
+    """
+    data = extract_json(strip_trailing_commas(text))
+    if data is None:
+        return None
+    parsed = validate_stage(stage, unwrap_stage_object(stage, data))
+    return parsed if parsed.status != PARSE_FAILED else None
+
+def salvage(stage: str, text: str) -> Optional[StageParse]:
+    """Спасение завершенных элементов обрезанного ответа (None - спасать нечего)"""
+    salvaged = salvage_truncated(text)
+    if salvaged is None:
+        return None
+    data = extract_json(salvaged)
+    if data is None:
+        return None
+    parsed = validate_stage(stage, unwrap_stage_object(stage, data))
+    return parsed if parsed.status != PARSE_FAILED else None
+
+def _parse_error(text: str) -> str:
+    """Сообщение json о синтаксической ошибке (с позицией)"""
+    try:
+        json.loads(text)
+    except ValueError as e:
+        return str(e)
+    return "JSON не найден"
+
+def build_repair_request(stage: str, text: str, parsed: StageParse,
+                         include_schema: bool = False) -> Optional[RepairRequest]:
+    """Промпт исправления: только сломанный фрагмент и ошибки проверки
+
+    - поля неверного типа - отправляются только они;
+    - синтаксическая ошибка - JSON из ответа без пояснений вокруг него;
+    - JSON без полей этапа - весь объект.
+    include_schema - схема исправляемых полей в тексте промпта (модель без
+    response_format). None - фрагмент слишком велик или этап без схемы.
+    """
+    stage_schema = STAGE_SCHEMAS.get(stage)
+    if not stage_schema:
+        return None
+
+    if parsed.rejected:
+        fields = list(parsed.rejected)
+        fragment = json.dumps(parsed.rejected, ensure_ascii=False)
+        errors = parsed.errors
+    elif extract_json(text) is None:
+        scan = scan_json(text)
+        if scan.start < 0:
+            return None
+        fields = list(stage_schema)
+        fragment = text[scan.start:scan.end] if scan.end is not None else text[scan.start:]
+        errors = [_parse_error(fragment)]
+    else:
+        fields = list(stage_schema)
+        fragment = json.dumps(extract_json(text), ensure_ascii=False)
+        errors = parsed.errors
+
+    if len(fragment) > REPAIR_MAX_CHARS:
+        return None
+
+    error_lines = "\n".join(f"- {error}" for error in errors)
+    schema = fields_schema(stage, fields) if include_schema else None
+    schema_block = f"\n\nСХЕМА:\n{json.dumps(schema, ensure_ascii=False)}" if schema else ""
+    prompt = f"""Исправь фрагмент JSON из ответа этапа анализа "{stage}".
+
+ОШИБКИ ПРОВЕРКИ:
+{error_lines}
+
+Верни ТОЛЬКО JSON-объект с полями: {', '.join(fields)}.
+- Исправь только синтаксис, структуру и типы полей.
+- Сохрани содержание и цитаты дословно, ничего не добавляй и не сокращай.{schema_block}
+
+ФРАГМЕНТ:
+{fragment}"""
+    return RepairRequest(prompt=prompt, fields=fields, fragment_chars=len(fragment))
+
+def apply_repair(stage: str, parsed: StageParse, request: RepairRequest, response: str) -> StageParse:
+    """Ответ исправления, вписанный в уже разобранные поля этапа"""
+    data = unwrap_stage_object(stage, extract_json(response))
+    if not isinstance(data, dict):
+        return parsed
+    merged = dict(parsed.data)
+    merged.update({key: data[key] for key in request.fields if key in data})
+    return validate_stage(stage, merged)
+
+def is_improved(before: StageParse, after: StageParse) -> bool:
+    """Исправление удалось: ответ стал валидным или хотя бы разобранным"""
+    if after.status == PARSE_OK:
+        return True
+    return before.status == PARSE_FAILED and after.status != PARSE_FAILED
+
+def merge_continuation(head: str, tail: str) -> str:
+    """Ответ из начала (prefill) и продолжения модели
+
+    Если модель начала ответ заново, берется продолжение; если повторила
+    конец префикса - повтор отбрасывается.
+    """
+    head = head.rstrip()
+    if not tail:
+        return head
+    probe = head.lstrip()[:RESTART_PROBE_CHARS]
+    if len(probe) == RESTART_PROBE_CHARS and tail.lstrip().startswith(probe):
+        return tail
+    for size in range(min(len(tail), len(head), MAX_OVERLAP_CHARS), MIN_OVERLAP_CHARS - 1, -1):
+        if head.endswith(tail[:size]):
+            return head + tail[size:]
+    return head + tail
+
+def summarize_repair_stats(stats: Dict[str, Dict[str, int]]) -> Dict[str, Any]:
+    """Сводка исправлений: доля успешных и сэкономленные токены, в целом и по этапам"""
+    def totals(counts: Dict[str, int]) -> Dict[str, Any]:
+        result = {name: counts.get(name, 0) for name in REPAIR_COUNTERS}
+        attempts = result["continued"] + result["invalid"]
+        fixed = result["continued_ok"] + result["fixed_local"] + result["fixed_call"] + result["salvaged"]
+        result["success_rate"] = round(min(fixed, attempts) / attempts, 4) if attempts else 0.0
+        return result
+
+    overall: Dict[str, int] = {}
+    for counts in stats.values():
+        for name, value in counts.items():
+            overall[name] = overall.get(name, 0) + value
+    summary = totals(overall)
+    summary["by_stage"] = {stage: totals(counts) for stage, counts in sorted(stats.items())}
+    return summary
@@ -9,6 +9,8 @@ import json
 import os
 from pathlib import Path
 
+from .clustering import merge_entities, collect_entities, QUOTE_THRESHOLD
+
 class ReportGenerator:
     """Генератор отчетов в различных форматах"""
     
@@ -47,17 +49,18 @@ class ReportGenerator:
         if analysis_result.research_findings:
             findings = analysis_result.research_findings
             key_insights = findings.key_insights or []
-            recommendations = findings.recommendations or []
+            recommendations = merge_entities(findings.recommendations or [],
+                                             ['title', 'recommendation', 'description'])
             behavioral_patterns = findings.behavioral_patterns or []
         
-        # Сбор всех болей
-        for summary in analysis_result.interview_summaries:
-            pain_points.extend(summary.pain_points or [])
+        # Сбор всех болей: одна и та же боль из разных интервью - одна карточка
+        summaries = analysis_result.interview_summaries
+        pain_points = merge_entities(collect_entities(summaries, 'pain_points'), ['pain'])
         
-        # Статистика
+        # Статистика (уникальные сущности после объединения формулировок)
         total_pains = len(pain_points)
-        total_needs = sum(len(s.needs or []) for s in analysis_result.interview_summaries)
-        total_quotes = sum(len(s.quotes or []) for s in analysis_result.interview_summaries)
+        total_needs = len(merge_entities(collect_entities(summaries, 'needs'), ['need']))
+        total_quotes = len(merge_entities(collect_entities(summaries, 'quotes'), ['text'], QUOTE_THRESHOLD))
         
         html = f"""<!DOCTYPE html>
 <html lang="ru">
@@ -341,14 +344,16 @@ class ReportGenerator:
             pain_html += f'<h3 class="severity-title {severity}">{severity_name} проблемы</h3>\n'
             pain_html += '<div class="pain-points-grid">\n'
             
-            for pain in pains[:4]:  # Максимум 4 на группу
+            for pain in pains[:4]:  # Максимум 4 на группу (самые частые)
                 pain_text = pain.get('pain', 'Описание недоступно')
                 context = pain.get('context', '')
+                interviews = pain.get('frequency_count', 1)
                 
                 pain_html += f'''
                 <div class="pain-point-card {severity}">
                     <h4>{pain_text[:100]}{"..." if len(pain_text) > 100 else ""}</h4>
                     {f'<p class="pain-context">{context[:150]}{"..." if len(context) > 150 else ""}</p>' if context else ''}
+                    <p class="pain-frequency">👥 Интервью: {interviews}</p>
                 </div>'''
             
             pain_html += '</div>\n</div>\n'
@@ -395,6 +400,7 @@ class ReportGenerator:
                 severity = problem.get('severity', 'medium')
                 frequency = problem.get('frequency', 'N/A')
                 impact = problem.get('impact', '')
+                interview_ids = problem.get('interview_ids', [])
                 
                 pain_html += f'''
                 <div class="pain-point-detailed-card {severity}">
@@ -405,6 +411,7 @@ class ReportGenerator:
                     {f'<p class="pain-context">{context[:150]}{"..." if len(context) > 150 else ""}</p>' if context else ''}
                     <div class="pain-point-meta">
                         <span class="frequency">🔄 {frequency}</span>
+                        {f'<span class="interviews">👥 Интервью: {", ".join(map(str, interview_ids))}</span>' if interview_ids else ''}
                         {f'<span class="impact">💥 {impact}</span>' if impact else ''}
                     </div>
                 </div>'''
@@ -556,14 +563,16 @@ class ReportGenerator:
         if not summaries:
             return ""
         
-        # Сбор всех цитат
-        all_quotes = []
-        for summary in summaries:
-            all_quotes.extend(summary.quotes or [])
+        # Сбор всех цитат (одна цитата из разных этапов - один раз)
+        all_quotes = merge_entities(collect_entities(summaries, 'quotes'), ['text'], QUOTE_THRESHOLD)
         
         if not all_quotes:
             return ""
         
+        # Сверенные с транскриптом цитаты - первыми, не найденные - в конце
+        status_rank = {'verified': 0, 'approximate': 1, 'unverified': 3}
+        all_quotes.sort(key=lambda q: status_rank.get((q.get('verification') or {}).get('status'), 2))
+        
         quotes_html = '<section class="quotes-section">\n'
         quotes_html += '<h2>💬 Ключевые цитаты пользователей</h2>\n'
         quotes_html += '<div class="quotes-grid">\n'
@@ -573,12 +582,19 @@ class ReportGenerator:
             context = quote.get('context', '')
             significance = quote.get('significance', '')
             quote_type = quote.get('quote_type', 'general')
+            status = (quote.get('verification') or {}).get('status')
+            verification = {
+                'verified': '<span class="quote-verification verified">✓ Сверено с транскриптом</span>',
+                'approximate': '<span class="quote-verification approximate">≈ Близко к тексту транскрипта</span>',
+                'unverified': '<span class="quote-verification unverified">⚠️ Не найдено в транскрипте</span>'
+            }.get(status, '')
             
             quotes_html += f'''
             <div class="quote-card {quote_type}">
                 <blockquote class="quote-text">"{text}"</blockquote>
                 <div class="quote-meta">
                     <span class="quote-type">{quote_type.title()}</span>
+                    {verification}
                     {f'<p class="quote-context">{context}</p>' if context else ''}
                     {f'<p class="quote-significance">{significance}</p>' if significance else ''}
                 </div>
@@ -929,7 +945,7 @@ class ReportGenerator:
             font-size: 0.9rem;
         }
         
-        .affected-users {
+        .affected-users, .pain-frequency, .quote-verification {
             color: #6b7280;
             font-weight: 500;
         }
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Локальный поиск по материалам интервью (BM25) для сборки контекста этапов
+"""
+
+import re
+import math
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .chunking import TurnChunker
+
+# Размер фрагмента (passage) индекса в токенах
+PASSAGE_TOKENS = 200
+
+# Параметры BM25
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Длина основы слова: грубый стемминг для русской морфологии
+# ("проблема", "проблемы", "проблемой" -> "пробле")
+STEM_LENGTH = 6
+
+_WORD = re.compile(r'[0-9a-zа-яё]+')
+
+_STOP_WORDS = frozenset(
+    "и в во не что он на я с со как а то все она так его но да ты к у же вы за бы по только "
+    "ее мне было вот от меня еще нет о из ему теперь когда даже ну вдруг ли если уже или ни "
+    "быть был него до вас нибудь опять уж вам ведь там потом себя ничего ей может они тут где "
+    "есть надо ней для мы тебя их чем была сам чтоб без будто чего раз тоже себе под будет ж "
+    "тогда кто этот того потому этого какой совсем ним здесь этом один почти мой тем чтобы нее "
+    "были куда зачем всех никогда можно при наконец два об другой хоть после над больше тот "
+    "через эти нас про всего них какая много разве три эту моя впрочем хорошо свою этой перед "
+    "иногда лучше чуть том нельзя такой им более всегда конечно всю между это "
+    "the a an and or of to in on for is are was were be it this that with as at by".split()
+)
+
+def tokenize(text: str) -> List[str]:
+    """Основы слов текста без стоп-слов"""
+    return [word[:STEM_LENGTH] for word in _WORD.findall(text.lower().replace("ё", "е"))
+            if len(word) > 2 and word not in _STOP_WORDS]
+
+@dataclass
+class Passage:
+    """Фрагмент материала интервью"""
+    source: str  # summary / transcript
+    position: int  # порядок внутри источника
+    text: str
+    tokens: int
+
+class PassageIndex:
+    """BM25-индекс фрагментов саммари и транскрипта одного интервью
+
+    Фрагменты - целые реплики или абзацы до PASSAGE_TOKENS токенов. Частоты
+    терминов хранятся в отсортированных массивах numpy, поэтому оценка запроса
+    стоит O(число вхождений терминов запроса), а не O(размер словаря).
+    """
+
+    SOURCE_ORDER = ("summary", "transcript")
+
+    def __init__(self, sources: Dict[str, str], passage_tokens: int = PASSAGE_TOKENS):
+        self.passages: List[Passage] = []
+        chunker = TurnChunker(passage_tokens)
+        for source in self.SOURCE_ORDER:
+            text = sources.get(source) or ""
+            if not text.strip():
+                continue
+            for position, (start, end, tokens) in enumerate(chunker.chunk_spans(text)):
+                passage_text = text[start:end].strip()
+                if passage_text:
+                    self.passages.append(Passage(source, position, passage_text, tokens))
+
+        vocabulary: Dict[str, int] = {}
+        term_ids: List[int] = []
+        doc_ids: List[int] = []
+        for doc, passage in enumerate(self.passages):
+            for term in tokenize(passage.text):
+                term_ids.append(vocabulary.setdefault(term, len(vocabulary)))
+                doc_ids.append(doc)
+        self.vocabulary = vocabulary
+
+        n_docs = len(self.passages)
+        terms = np.asarray(term_ids, dtype=np.int64)
+        docs = np.asarray(doc_ids, dtype=np.int64)
+        order = np.argsort(terms, kind="stable")
+        self._terms = terms[order]
+        self._docs = docs[order]
+        self._doc_len = np.bincount(docs, minlength=n_docs).astype(float)
+        self._avg_len = float(self._doc_len.mean()) if n_docs and self._doc_len.mean() > 0 else 1.0
+
+        # Документная частота: число фрагментов с термином
+        pairs = np.unique(terms * max(n_docs, 1) + docs) if len(terms) else terms
+        self._df = np.bincount(pairs // max(n_docs, 1), minlength=len(vocabulary)).astype(float)
+
+    @property
+    def total_tokens(self) -> int:
+        return sum(passage.tokens for passage in self.passages)
+
+    def score(self, query: str) -> np.ndarray:
+        """BM25-оценка каждого фрагмента по запросу"""
+        n_docs = len(self.passages)
+        scores = np.zeros(n_docs)
+        if not n_docs:
+            return scores
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * self._doc_len / self._avg_len)
+        for term in set(tokenize(query)):
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            start = np.searchsorted(self._terms, term_id, side="left")
+            end = np.searchsorted(self._terms, term_id, side="right")
+            tf = np.bincount(self._docs[start:end], minlength=n_docs).astype(float)
+            df = self._df[term_id]
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            scores += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return scores
+
+    def pack(self, query: str, budget_tokens: int) -> str:
+        """Контекст до budget_tokens токенов из фрагментов, наиболее релевантных запросу
+
+        Если саммари помещается целиком, оно включается полностью, а остаток
+        бюджета заполняется фрагментами транскрипта. Выбранные фрагменты идут
+        в исходном порядке, транскрипт - отдельным блоком.
+        """
+        if not self.passages:
+            return ""
+
+        summary = [i for i, p in enumerate(self.passages) if p.source == "summary"]
+        summary_tokens = sum(self.passages[i].tokens for i in summary)
+        if summary_tokens <= budget_tokens:
+            selected = set(summary)
+            remaining = budget_tokens - summary_tokens
+        else:
+            selected = set()
+            remaining = budget_tokens
+
+        scores = self.score(query)
+        # При равной оценке предпочтение саммари и более ранним фрагментам
+        ranked = sorted(
+            (i for i in range(len(self.passages)) if i not in selected),
+            key=lambda i: (-scores[i], self.SOURCE_ORDER.index(self.passages[i].source), i)
+        )
+        for i in ranked:
+            tokens = self.passages[i].tokens
+            if tokens <= remaining:
+                selected.add(i)
+                remaining -= tokens
+            if remaining <= 0:
+                break
+
+        blocks = []
+        summary_text = "\n".join(self.passages[i].text for i in sorted(selected)
+                                 if self.passages[i].source == "summary")
+        if summary_text:
+            blocks.append(summary_text)
+        transcript_text = "\n...\n".join(self.passages[i].text for i in sorted(selected)
+                                         if self.passages[i].source == "transcript")
+        if transcript_text:
+            blocks.append(f"ФРАГМЕНТЫ ТРАНСКРИПТА:\n{transcript_text}")
+        return "\n\n".join(blocks)
+
+def build_passage_index(summary: str, transcript: Optional[str] = None) -> PassageIndex:
+    """Индекс по объединенному саммари чанков и исходному транскрипту"""
+    return PassageIndex({"summary": summary, "transcript": transcript or ""})
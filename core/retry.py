@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Политика повторных попыток для запросов к API
+"""
+
+import time
+import random
+import asyncio
+import threading
+from email.utils import parsedate_to_datetime
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional, Callable, Awaitable, Mapping
+
+# HTTP статусы, при которых повтор имеет смысл
+RETRYABLE_STATUSES = {408, 409, 425, 429, 500, 502, 503, 504, 520, 522, 524, 529}
+
+class APIError(Exception):
+    """Ошибка API с классификацией для политики повторов"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None,
+                 retry_after: Optional[float] = None, retryable: Optional[bool] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        if retryable is None:
+            retryable = status_code is None or status_code in RETRYABLE_STATUSES or status_code >= 500
+        self.retryable = retryable
+
+def parse_retry_after(headers: Mapping[str, str], now: Optional[float] = None) -> Optional[float]:
+    """Время ожидания (сек) из заголовков Retry-After / X-RateLimit-Reset"""
+    now = time.time() if now is None else now
+
+    value = headers.get("Retry-After") or headers.get("retry-after")
+    if value:
+        value = value.strip()
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - now)
+            except (TypeError, ValueError):
+                pass
+
+    value = headers.get("X-RateLimit-Reset") or headers.get("x-ratelimit-reset")
+    if value:
+        try:
+            reset = float(value)
+        except ValueError:
+            return None
+        if reset > 1e12:  # Метка времени в миллисекундах (OpenRouter)
+            return max(0.0, reset / 1000 - now)
+        if reset > 1e9:  # Метка времени в секундах
+            return max(0.0, reset - now)
+        return max(0.0, reset)  # Количество секунд до сброса
+
+    return None
+
+@dataclass
+class RetryMetrics:
+    """Счетчики повторов (потокобезопасные)"""
+    calls: int = 0
+    retries: int = 0
+    rate_limited: int = 0
+    fatal_errors: int = 0
+    exhausted: int = 0
+    total_wait: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, **increments):
+        with self._lock:
+            for name, value in increments.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def reset(self):
+        """Обнуление счетчиков (перед новым прогоном анализа)"""
+        with self._lock:
+            self.calls = self.retries = self.rate_limited = self.fatal_errors = self.exhausted = 0
+            self.total_wait = 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "retries": self.retries,
+                "rate_limited": self.rate_limited,
+                "fatal_errors": self.fatal_errors,
+                "exhausted": self.exhausted,
+                "total_wait": round(self.total_wait, 3)
+            }
+
+class RetryPolicy:
+    """Повторы с классификацией ошибок и экспоненциальной задержкой (full jitter)
+
+    - фатальные ошибки (401/403/400/...) не повторяются;
+    - подсказка сервера (Retry-After, X-RateLimit-Reset) имеет приоритет над
+      вычисленной задержкой и соблюдается как есть: max_delay ограничивает
+      только вычисленную задержку, иначе повтор придет раньше, чем разрешил
+      сервер, и только продлит ограничение;
+    - общее время ожидания одного вызова ограничено бюджетом total_budget:
+      если подсказка в него не укладывается, ошибка возвращается сразу.
+    """
+
+    def __init__(self, max_retries: int = 3, base_delay: float = 2.0, max_delay: float = 60.0,
+                 total_budget: float = 300.0, rng: Optional[random.Random] = None):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.total_budget = total_budget
+        self.metrics = RetryMetrics()
+        self._rng = rng or random.Random()
+
+    def is_retryable(self, error: BaseException) -> bool:
+        """Классификация ошибки: повторяемая или фатальная"""
+        if isinstance(error, APIError):
+            return error.retryable
+        return isinstance(error, (ConnectionError, TimeoutError))
+
+    def compute_delay(self, attempt: int, error: BaseException) -> float:
+        """Задержка перед повтором номер attempt (с нуля)"""
+        hint = getattr(error, "retry_after", None)
+        if hint is not None:
+            return max(0.0, float(hint))
+        cap = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return self._rng.uniform(0, cap)
+
+    def _next_delay(self, attempt: int, error: BaseException, started: float) -> Optional[float]:
+        """Задержка до следующей попытки или None, если повторять нельзя"""
+        if not self.is_retryable(error):
+            self.metrics.record(fatal_errors=1)
+            return None
+        if attempt >= self.max_retries:
+            self.metrics.record(exhausted=1)
+            return None
+
+        delay = self.compute_delay(attempt, error)
+        if time.monotonic() - started + delay > self.total_budget:
+            self.metrics.record(exhausted=1)
+            return None
+
+        status = getattr(error, "status_code", None)
+        self.metrics.record(retries=1, total_wait=delay, rate_limited=1 if status == 429 else 0)
+        print(f"   ⏳ API ошибка ({error}). Повтор через {delay:.1f} сек... "
+              f"(попытка {attempt + 1}/{self.max_retries})")
+        return delay
+
+    def call(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Синхронный вызов с повторами"""
+        self.metrics.record(calls=1)
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                delay = self._next_delay(attempt, e, started)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+
+    async def call_async(self, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """Асинхронный вызов с повторами"""
+        self.metrics.record(calls=1)
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            try:
+                return await func(*args, **kwargs)
+            except Exception as e:
+                delay = self._next_delay(attempt, e, started)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
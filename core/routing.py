@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Маршрутизация вызовов по этапам: модель, max_tokens, температура, таймаут и каскад
+"""
+
+from dataclasses import dataclass, replace, fields
+from typing import Dict, Any, List, Optional, Callable, Tuple
+
+from .json_extract import STAGE_SCHEMAS, parse_stage_response, PARSE_OK
+from .openrouter_client import parse_pricing
+from .call_profile import CallProfile
+
+# Значение model маршрута: самая дешевая из моделей-кандидатов, в контекст которой помещается вызов
+AUTO_MODEL = "auto"
+
+# Маршрут по умолчанию для этапов, которых нет в таблице
+DEFAULT_ROUTE = "*"
+
+# Суффикс этапа вызова исправления (core/repair.py): маршрут - как у исходного этапа, без каскада
+REPAIR_SUFFIX = "_repair"
+
+# Каскад: саммари чанка короче - признак слабого ответа дешевой модели
+MIN_CHUNK_SUMMARY_CHARS = 200
+
+# Каскад: доля пустых списков ответа этапа, начиная с которой ответ считается неуверенным
+MAX_EMPTY_LIST_SHARE = 0.5
+
+@dataclass
+class StageRoute:
+    """Маршрут этапа из таблицы конфигурации (None - значение по умолчанию)"""
+    model: Optional[str] = None  # id модели или "auto"; None - основная модель
+    max_tokens: Optional[int] = None
+    temperature: Optional[float] = None
+    timeout: Optional[float] = None  # таймаут ожидания ответа одной попытки (сек)
+    cascade: bool = False  # сначала model, при неудачной проверке ответа - escalate_to
+    escalate_to: Optional[str] = None  # модель эскалации; None - основная модель
+
+@dataclass
+class RouteDecision:
+    """Параметры одного вызова этапа"""
+    model: str
+    max_tokens: int
+    temperature: float
+    timeout: Optional[float] = None
+    escalate_to: Optional[str] = None  # None - без каскада
+    stage: str = ""
+    learned: bool = False  # max_tokens или таймаут взяты из профиля вызовов
+    cache_max_tokens: Optional[int] = None  # max_tokens для ключа кэша - без лимита из профиля вызовов
+
+def parse_routes(table: Optional[Dict[str, Dict[str, Any]]]) -> Dict[str, StageRoute]:
+    """Таблица маршрутов из конфигурации: {этап: {model, max_tokens, temperature, timeout, cascade}}
+
+    Строка вместо словаря - только модель этапа. Неизвестные параметры -
+    ValueError, чтобы опечатка в конфигурации не отключала маршрут молча.
+    """
+    allowed = {f.name for f in fields(StageRoute)}
+    routes: Dict[str, StageRoute] = {}
+    for stage, spec in (table or {}).items():
+        if isinstance(spec, str):
+            spec = {'model': spec}
+        unknown = set(spec) - allowed
+        if unknown:
+            raise ValueError(f"Неизвестные параметры маршрута этапа {stage}: {', '.join(sorted(unknown))}")
+        routes[stage] = StageRoute(**spec)
+    return routes
+
+def expected_cost(info: Dict[str, Any], prompt_tokens: int, completion_tokens: int) -> Optional[float]:
+    """Оценка стоимости вызова по ценам модели из /models (None - цены неизвестны)"""
+    pricing = parse_pricing(info.get('pricing'))
+    if pricing is None:
+        return None
+    return prompt_tokens * pricing['prompt'] + completion_tokens * pricing['completion']
+
+class ModelRouter:
+    """Выбор модели и параметров вызова этапа
+
+    Маршрут берется из таблицы по имени этапа (или "*"). Модель маршрута
+    используется, только если вызов помещается в ее context_length, иначе -
+    основная модель. "auto" - самая дешевая из candidates по ценам /models
+    среди моделей с достаточным контекстом. max_tokens ограничивается
+    max_completion_tokens модели.
+
+    max_tokens и таймаут, не заданные маршрутом, берутся из профиля
+    вызовов (profile) - по истории этапа на выбранной модели; max_tokens
+    анализатора остается верхней границей.
+    """
+
+    def __init__(self, routes: Dict[str, StageRoute], default_model: str, max_tokens: int, temperature: float,
+                 model_info: Callable[[str], Dict[str, Any]], candidates: Optional[List[str]] = None,
+                 profile: Optional[CallProfile] = None):
+        self.routes = routes
+        self.default_model = default_model
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.model_info = model_info
+        self.candidates = list(candidates or [])
+        self.profile = profile
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.routes)
+
+    def route_for(self, stage: str) -> Tuple[StageRoute, bool]:
+        """Маршрут этапа и признак вызова исправления"""
+        repair = stage.endswith(REPAIR_SUFFIX)
+        base = stage[:-len(REPAIR_SUFFIX)] if repair else stage
+        route = self.routes.get(stage) or self.routes.get(base) or self.routes.get(DEFAULT_ROUTE) or StageRoute()
+        return route, repair and stage not in self.routes
+
+    def models(self) -> List[str]:
+        """Все модели, которые могут получить вызовы (для загрузки метаданных заранее)"""
+        models = {self.default_model, *self.candidates}
+        for route in self.routes.values():
+            models.update(m for m in (route.model, route.escalate_to) if m and m != AUTO_MODEL)
+        return sorted(models)
+
+    def _info(self, model: str) -> Dict[str, Any]:
+        info = self.model_info(model)
+        return info if "error" not in info else {}
+
+    def _fits(self, model: str, needed_tokens: int) -> bool:
+        """Вызов помещается в контекст модели (модель без метаданных - считается, что помещается)"""
+        context = self._info(model).get('context_length')
+        return not context or needed_tokens <= int(context)
+
+    def _completion_limit(self, model: str, max_tokens: int) -> int:
+        """max_tokens, ограниченный max_completion_tokens модели"""
+        limit = (self._info(model).get('top_provider') or {}).get('max_completion_tokens')
+        return min(max_tokens, int(limit)) if limit else max_tokens
+
+    def cheapest(self, prompt_tokens: int, max_tokens: int) -> Optional[str]:
+        """Самая дешевая модель-кандидат, в контекст которой помещается вызов"""
+        priced = []
+        for model in self.candidates:
+            info = self._info(model)
+            if not info or not self._fits(model, prompt_tokens + max_tokens):
+                continue
+            cost = expected_cost(info, prompt_tokens, self._completion_limit(model, max_tokens))
+            if cost is not None:
+                priced.append((cost, model))
+        return min(priced)[1] if priced else None
+
+    def resolve(self, stage: str, prompt_tokens: int) -> RouteDecision:
+        """Параметры вызова этапа для промпта из prompt_tokens токенов"""
+        route, repair = self.route_for(stage)
+        max_tokens = route.max_tokens or self.max_tokens
+        temperature = route.temperature if route.temperature is not None else self.temperature
+
+        model = route.model
+        if model == AUTO_MODEL:
+            model = self.cheapest(prompt_tokens, max_tokens)
+        if not model or not self._fits(model, prompt_tokens + max_tokens):
+            model = self.default_model
+
+        escalate_to = None
+        if route.cascade and not repair:
+            escalate_to = route.escalate_to or self.default_model
+            if escalate_to == model:
+                escalate_to = None
+        max_tokens, timeout, learned = self._call_limits(stage, route, model)
+        return RouteDecision(model, max_tokens, temperature, timeout, escalate_to, stage, learned,
+                             self._configured_max_tokens(route, model))
+
+    def escalate(self, decision: RouteDecision) -> RouteDecision:
+        """Параметры повторного вызова на модели эскалации"""
+        model = decision.escalate_to or self.default_model
+        route, _ = self.route_for(decision.stage)
+        max_tokens, timeout, learned = self._call_limits(decision.stage, route, model)
+        return replace(decision, model=model, max_tokens=max_tokens, timeout=timeout, escalate_to=None,
+                       learned=learned, cache_max_tokens=self._configured_max_tokens(route, model))
+
+    def _call_limits(self, stage: str, route: StageRoute, model: str) -> Tuple[int, Optional[float], bool]:
+        """max_tokens и таймаут вызова: из маршрута, иначе из профиля вызовов, иначе по умолчанию"""
+        learned_tokens, learned_timeout = self.profile.limits(stage, model) if self.profile else (None, None)
+        max_tokens = route.max_tokens or min(learned_tokens or self.max_tokens, self.max_tokens)
+        timeout = route.timeout or learned_timeout
+        learned = (not route.max_tokens and learned_tokens is not None) or (not route.timeout and
+                                                                            learned_timeout is not None)
+        return self._completion_limit(model, max_tokens), timeout, learned
+
+    def _configured_max_tokens(self, route: StageRoute, model: str) -> int:
+        """max_tokens из маршрута или конфигурации, без профиля вызовов
+
+        Входит в ключ кэша: лимит из профиля меняется, когда набирается
+        история (в том числе посреди прогона), и ключ не должен меняться с ним.
+        """
+        return self._completion_limit(model, route.max_tokens or self.max_tokens)
+
+    def context_length(self, stage: str, default: int) -> int:
+        """Контекст модели этапа (для размера чанков и групп); "auto" и без маршрута - default"""
+        route, _ = self.route_for(stage)
+        if not route.model or route.model == AUTO_MODEL:
+            return default
+        context = self._info(route.model).get('context_length')
+        return min(int(context), default) if context else default
+
+def cascade_verdict(stage: str, content: str, finish_reason: Optional[str] = None) -> Optional[str]:
+    """Проверка ответа дешевой модели в каскаде: None - ответ принят, иначе причина эскалации
+
+    - ответ обрезан по max_tokens;
+    - саммари чанка слишком короткое;
+    - JSON этапа не разобран, не соответствует схеме или в нем нет полей этапа;
+    - неуверенный ответ: больше половины списков этапа пустые.
+    """
+    if finish_reason == 'length':
+        return "truncated"
+    schema = STAGE_SCHEMAS.get(stage)
+    if schema is None:
+        return "short" if len((content or "").strip()) < MIN_CHUNK_SUMMARY_CHARS else None
+
+    parsed = parse_stage_response(stage, content)
+    if parsed.status != PARSE_OK:
+        return f"invalid_{parsed.status}"
+    required = [name for name in schema if name != 'brief_related_findings']
+    if any(name not in parsed.data for name in required):
+        return "missing_fields"
+    lists = [name for name in required if schema[name] is list]
+    if lists and sum(1 for name in lists if not parsed.data[name]) / len(lists) > MAX_EMPTY_LIST_SHARE:
+        return "low_confidence"
+    return None
+
+def summarize_cascade_stats(stats: Dict[str, Dict[str, int]]) -> Dict[str, Any]:
+    """Сводка каскада: доля эскалаций в целом и по этапам, причины эскалаций"""
+    def totals(counts: Dict[str, int]) -> Dict[str, Any]:
+        attempts = counts.get('attempts', 0)
+        escalated = counts.get('escalated', 0)
+        return {
+            'attempts': attempts,
+            'escalated': escalated,
+            'escalation_rate': round(escalated / attempts, 4) if attempts else 0.0,
+            'reasons': {key[len('reason:'):]: value for key, value in sorted(counts.items())
+                        if key.startswith('reason:')}
+        }
+
+    overall: Dict[str, int] = {}
+    for counts in stats.values():
+        for name, value in counts.items():
+            overall[name] = overall.get(name, 0) + value
+    summary = totals(overall)
+    summary['by_stage'] = {stage: totals(counts) for stage, counts in sorted(stats.items())}
+    return summary
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+JSON-схемы ответов этапов из моделей данных (структурированный вывод response_format)
+"""
+
+import typing
+from dataclasses import fields, is_dataclass
+from functools import lru_cache
+from typing import Dict, Any, List, Optional
+
+from .data_models import (InterviewSummary, ResearchFindings, RespondentProfile, KeyTheme, PainPoint,
+                          UserNeed, EmotionalMoment, Insight, Quote, Contradiction, KeyInsight)
+from .json_extract import STAGE_SCHEMAS
+
+# Режимы структурированного вывода (по supported_parameters модели в каталоге /models)
+MODE_JSON_SCHEMA = "json_schema"  # ответ по JSON-схеме
+MODE_JSON_OBJECT = "json_object"  # только валидный JSON, структура - из промпта
+MODE_PROMPT = "prompt"  # схема только в тексте промпта
+
+# Модель данных сущностей каждого поля ответа (в InterviewSummary и ResearchFindings
+# эти поля объявлены как List[Dict] / Dict)
+ENTITY_MODELS = {
+    'respondent_profile': RespondentProfile,
+    'key_themes': KeyTheme,
+    'pain_points': PainPoint,
+    'needs': UserNeed,
+    'emotional_journey': EmotionalMoment,
+    'insights': Insight,
+    'quotes': Quote,
+    'contradictions': Contradiction,
+    'key_insights': KeyInsight,
+}
+
+# Этапы, ответ которых - свободный текст
+TEXT_STAGES = frozenset({'chunk'})
+
+_JSON_TYPES = {str: "string", int: "integer", float: "number", bool: "boolean"}
+_KIND_SCHEMAS = {list: {"type": "array"}, dict: {"type": "object"}, str: {"type": "string"},
+                 float: {"type": "number"}}
+
+def type_schema(annotation: Any) -> Dict[str, Any]:
+    """JSON-схема для аннотации типа поля dataclass"""
+    if annotation in _JSON_TYPES:
+        return {"type": _JSON_TYPES[annotation]}
+    if is_dataclass(annotation):
+        return dataclass_schema(annotation)
+
+    origin = typing.get_origin(annotation)
+    args = typing.get_args(annotation)
+    if origin in (list, List):
+        return {"type": "array", "items": type_schema(args[0]) if args else {}}
+    if origin in (dict, Dict):
+        value = args[1] if len(args) == 2 else Any
+        return {"type": "object"} if value is Any else {"type": "object", "additionalProperties": type_schema(value)}
+    if origin is typing.Union:
+        options = [arg for arg in args if arg is not type(None)]
+        if len(options) == 1:
+            return type_schema(options[0])
+        return {"anyOf": [type_schema(arg) for arg in options]}
+    return {}
+
+@lru_cache(maxsize=None)
+def dataclass_schema(cls: type) -> Dict[str, Any]:
+    """Схема объекта из полей dataclass
+
+    Поля не обязательные и дополнительные свойства разрешены: модели данных
+    задают форму ответа, но промпты могут просить больше полей.
+    """
+    hints = typing.get_type_hints(cls)
+    return {
+        "type": "object",
+        "properties": {f.name: type_schema(hints[f.name]) for f in fields(cls)}
+    }
+
+def field_schema(name: str, kind: type) -> Dict[str, Any]:
+    """Схема поля ответа этапа
+
+    Сущности (боли, потребности, цитаты...) - по ENTITY_MODELS, остальные поля -
+    по аннотациям InterviewSummary/ResearchFindings или типу из STAGE_SCHEMAS.
+    """
+    model = ENTITY_MODELS.get(name)
+    if model is not None:
+        return dataclass_schema(model) if kind is dict else {"type": "array", "items": dataclass_schema(model)}
+    for container in (InterviewSummary, ResearchFindings):
+        hints = typing.get_type_hints(container)
+        if name in hints:
+            return type_schema(hints[name])
+    return dict(_KIND_SCHEMAS.get(kind, {}))
+
+@lru_cache(maxsize=None)
+def stage_schema(stage: str) -> Optional[Dict[str, Any]]:
+    """JSON-схема ответа этапа (None - этап без схемы)"""
+    schema = STAGE_SCHEMAS.get(stage)
+    if schema is None:
+        return None
+    return {
+        "type": "object",
+        "properties": {name: field_schema(name, kind) for name, kind in schema.items()},
+        # Блок брифа объединенного режима есть только при загруженном брифе
+        "required": [name for name in schema if name != 'brief_related_findings']
+    }
+
+def structured_output_mode(supported_parameters: Optional[List[str]]) -> str:
+    """Режим структурированного вывода по supported_parameters модели
+
+    structured_outputs - модель принимает json_schema; только response_format -
+    режим JSON без схемы; без сведений о модели схема остается в промпте.
+    """
+    supported = set(supported_parameters or [])
+    if "structured_outputs" in supported:
+        return MODE_JSON_SCHEMA
+    if "response_format" in supported:
+        return MODE_JSON_OBJECT
+    return MODE_PROMPT
+
+def fields_schema(stage: str, names: List[str]) -> Optional[Dict[str, Any]]:
+    """Схема объекта из части полей этапа (ответ вызова исправления)"""
+    schema = STAGE_SCHEMAS.get(stage)
+    if schema is None:
+        return None
+    names = [name for name in names if name in schema]
+    return {
+        "type": "object",
+        "properties": {name: field_schema(name, schema[name]) for name in names},
+        "required": names
+    }
+
+def response_format_for(stage: str, mode: str, schema: Optional[Dict[str, Any]] = None,
+                        name: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Параметр response_format запроса этапа (None - не передавать)
+
+    schema - своя схема вместо схемы этапа (например, fields_schema).
+    """
+    if mode == MODE_PROMPT or stage in TEXT_STAGES:
+        return None
+    schema = schema or stage_schema(stage)
+    if schema is None:
+        return None
+    if mode == MODE_JSON_OBJECT:
+        return {"type": "json_object"}
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": name or f"{stage}_result",
+            # Нестрогий режим: в схемах есть объекты с произвольными ключами (reveals, analysis),
+            # которые strict-режим OpenAI не допускает
+            "strict": False,
+            "schema": schema
+        }
+    }
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Потоковые ответы OpenRouter API: разбор SSE и инкрементальный разбор JSON
+"""
+
+import json
+import time
+from typing import Dict, Any, Optional, Callable, List
+
+from .retry import APIError
+
+def parse_sse_line(line: str) -> Optional[Dict[str, Any]]:
+    """Событие из строки SSE потока
+
+    None - пустая строка, комментарий (": OPENROUTER PROCESSING") или [DONE].
+    """
+    if not line or line.startswith(":") or not line.startswith("data:"):
+        return None
+    data = line[5:].strip()
+    if not data or data == "[DONE]":
+        return None
+    try:
+        return json.loads(data)
+    except ValueError:
+        return None
+
+class StreamAccumulator:
+    """Сборка потокового ответа /chat/completions
+
+    Накапливает текст из delta-фрагментов, запоминает finish_reason, блок usage
+    (приходит в последнем событии) и время до первого токена.
+    """
+
+    def __init__(self, started: Optional[float] = None):
+        self.started = started if started is not None else time.monotonic()
+        self.first_token_at: Optional[float] = None
+        self.model = ""
+        self.finish_reason = ""
+        self.usage: Dict[str, Any] = {}
+        self.length = 0
+        self._parts: List[str] = []
+
+    def add_event(self, event: Dict[str, Any]) -> str:
+        """Обработка события; возвращает новый фрагмент текста"""
+        if "error" in event:
+            error = event["error"] or {}
+            code = error.get("code")
+            status = code if isinstance(code, int) else None
+            # Ошибка посреди потока (провайдер оборвал генерацию) - временная
+            raise APIError(f"Ошибка в потоке ответа: {error.get('message', error)}", status, retryable=True)
+
+        self.model = event.get("model") or self.model
+        if event.get("usage"):
+            self.usage = event["usage"]
+
+        delta = ""
+        for choice in event.get("choices") or []:
+            delta += (choice.get("delta") or {}).get("content") or ""
+            if choice.get("finish_reason"):
+                self.finish_reason = choice["finish_reason"]
+
+        if delta:
+            if self.first_token_at is None:
+                self.first_token_at = time.monotonic()
+            self._parts.append(delta)
+            self.length += len(delta)
+        return delta
+
+    @property
+    def content(self) -> str:
+        return "".join(self._parts)
+
+    @property
+    def ttft(self) -> Optional[float]:
+        """Время до первого токена (сек)"""
+        if self.first_token_at is None:
+            return None
+        return self.first_token_at - self.started
+
+    def to_result(self) -> Dict[str, Any]:
+        """Собранный ответ в формате обычного (не потокового) /chat/completions"""
+        result: Dict[str, Any] = {
+            "model": self.model,
+            "choices": [{"message": {"role": "assistant", "content": self.content},
+                         "finish_reason": self.finish_reason}]
+        }
+        if self.usage:
+            result["usage"] = self.usage
+        return result
+
+class StreamItemSink:
+    """Приемник фрагментов потокового ответа для on_delta
+
+    Разбирает ответ IncrementalJSONParser и передает готовые элементы массивов в
+    emit(key, item). Если поток начался заново (повтор после обрыва, offset 0),
+    разбор начинается сначала, а уже переданные элементы не дублируются.
+    """
+
+    def __init__(self, emit: Callable[[Optional[str], Any], None]):
+        self.emit = emit
+        self.parser: Optional[IncrementalJSONParser] = None
+        self._forwarded: Dict[Optional[str], int] = {}
+        self._seen: Dict[Optional[str], int] = {}
+
+    def __call__(self, delta: str, offset: int):
+        if self.parser is None or offset == 0:
+            self.parser = IncrementalJSONParser(self._on_item)
+            self._seen = {}
+        self.parser.feed(delta)
+
+    def _on_item(self, key: Optional[str], item: Any):
+        seen = self._seen[key] = self._seen.get(key, 0) + 1
+        if seen > self._forwarded.get(key, 0):
+            self._forwarded[key] = seen
+            self.emit(key, item)
+
+class IncrementalJSONParser:
+    """Инкрементальный разбор JSON ответа модели
+
+    feed() получает очередной фрагмент текста. Как только элемент массива
+    верхнего уровня (например, pain_points[i] в {"pain_points": [...]}) получен
+    полностью, он разбирается и передается в on_item(key, item) - не дожидаясь
+    конца ответа. Каждый символ просматривается один раз; текст до первой
+    скобки (```json и т.п.) пропускается.
+    """
+
+    def __init__(self, on_item: Optional[Callable[[Optional[str], Any], None]] = None):
+        self.on_item = on_item
+        self.items: Dict[Optional[str], List[Any]] = {}
+        self.failed_items = 0
+        self.done = False
+
+        self._started = False
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+
+        # Ключи объекта верхнего уровня
+        self._key_chars: Optional[List[str]] = None
+        self._last_key: Optional[str] = None
+        self._current_key: Optional[str] = None
+
+        # Отслеживаемый массив и текущий элемент
+        self._array_depth: Optional[int] = None
+        self._array_key: Optional[str] = None
+        self._item: Optional[List[str]] = None
+
+    def _at_item_level(self) -> bool:
+        return self._array_depth is not None and len(self._stack) == self._array_depth
+
+    def _finish_item(self):
+        text = "".join(self._item).strip()
+        self._item = None
+        if not text:
+            return
+        try:
+            value = json.loads(text)
+        except ValueError:
+            self.failed_items += 1
+            return
+        self.items.setdefault(self._array_key, []).append(value)
+        if self.on_item is not None:
+            self.on_item(self._array_key, value)
+
+    def feed(self, text: str):
+        """Обработка очередного фрагмента ответа"""
+        for ch in text:
+            if self.done:
+                return
+
+            if not self._started:
+                if ch not in "{[":
+                    continue
+                self._started = True
+
+            if self._in_string:
+                if self._item is not None:
+                    self._item.append(ch)
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._key_chars is not None:
+                        try:
+                            self._last_key = json.loads('"' + "".join(self._key_chars) + '"')
+                        except ValueError:
+                            self._last_key = "".join(self._key_chars)
+                        self._key_chars = None
+                    continue
+                if self._key_chars is not None:
+                    self._key_chars.append(ch)
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                if self._at_item_level() and self._item is None:
+                    self._item = []
+                if self._item is not None:
+                    self._item.append(ch)
+                elif self._stack == ["{"]:
+                    self._key_chars = []
+                continue
+
+            if ch in "{[":
+                if self._at_item_level() and self._item is None:
+                    self._item = []
+                if self._item is not None:
+                    self._item.append(ch)
+                self._stack.append(ch)
+                if self._item is None and ch == "[" and self._array_depth is None:
+                    if self._stack == ["{", "["]:
+                        self._array_depth, self._array_key = 2, self._current_key
+                    elif self._stack == ["["]:
+                        self._array_depth, self._array_key = 1, None
+                continue
+
+            if ch in "}]":
+                if self._at_item_level():
+                    # Закрытие самого отслеживаемого массива
+                    if self._item is not None:
+                        self._finish_item()
+                    self._stack.pop()
+                    self._array_depth = None
+                    self._array_key = None
+                else:
+                    if self._stack:
+                        self._stack.pop()
+                    if self._item is not None:
+                        self._item.append(ch)
+                        if self._at_item_level():
+                            self._finish_item()
+                if not self._stack:
+                    self.done = True
+                continue
+
+            if self._at_item_level():
+                if ch == ",":
+                    if self._item is not None:
+                        self._finish_item()
+                elif self._item is not None or not ch.isspace():
+                    if self._item is None:
+                        self._item = []
+                    self._item.append(ch)
+                continue
+
+            if self._item is not None:
+                self._item.append(ch)
+            elif ch == ":" and self._stack == ["{"]:
+                self._current_key = self._last_key
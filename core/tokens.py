@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Оценка количества токенов без токенизатора модели
+"""
+
+import re
+
+# Средняя длина токена в символах для BPE-токенизаторов Claude/GPT:
+# кириллица кодируется заметно плотнее латиницы
+CHARS_PER_TOKEN_CYRILLIC = 2.6
+CHARS_PER_TOKEN_OTHER = 3.8
+
+_CYRILLIC = re.compile(r'[Ѐ-ӿ]')
+_CYRILLIC_RUN = re.compile(r'[Ѐ-ӿ]+')
+
+def estimate_tokens(text: str) -> int:
+    """Оценка числа токенов в тексте с учетом доли кириллицы"""
+    if not text:
+        return 0
+    cyrillic = len(_CYRILLIC.findall(text))
+    other = len(text) - cyrillic
+    return int(cyrillic / CHARS_PER_TOKEN_CYRILLIC + other / CHARS_PER_TOKEN_OTHER) + 1
+
+def estimate_span_tokens(text: str, start: int, end: int) -> int:
+    """Оценка числа токенов в text[start:end] без копирования подстроки"""
+    if end <= start:
+        return 0
+    cyrillic = sum(m.end() - m.start() for m in _CYRILLIC_RUN.finditer(text, start, end))
+    other = (end - start) - cyrillic
+    return int(cyrillic / CHARS_PER_TOKEN_CYRILLIC + other / CHARS_PER_TOKEN_OTHER) + 1
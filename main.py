@@ -10,6 +10,7 @@ import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from core.analyzer import OpenRouterAnalyzer
+from core.cache import ResponseCache
 from core.brief_manager import BriefManager
 from core.report_generator import ReportGenerator
 from ui.interface import UserInterface
@@ -26,8 +27,52 @@ def main():
     # Создание интерфейса
     ui = UserInterface()
     
+    # Кэш ответов LLM
+    response_cache = ResponseCache(**config.get_cache_config()) if config.cache_enabled else None
+    
     # Запуск анализатора
-    analyzer = OpenRouterAnalyzer(config.openrouter_api_key)
+    analyzer = OpenRouterAnalyzer(
+        config.openrouter_api_key,
+        config.openrouter_model,
+        max_workers=config.max_workers,
+        max_concurrent_requests=config.max_concurrent_requests,
+        fan_out_stages=config.fan_out_stages,
+        connect_timeout=config.connect_timeout,
+        read_timeout=config.read_timeout,
+        gzip_min_bytes=config.gzip_min_bytes,
+        async_max_in_flight=config.async_max_in_flight,
+        async_call_timeout=config.async_call_timeout,
+        max_retries=config.max_retries,
+        retry_delay=config.retry_delay,
+        retry_max_delay=config.retry_max_delay,
+        retry_budget=config.retry_budget,
+        max_tokens=config.max_tokens,
+        temperature=config.temperature,
+        response_cache=response_cache,
+        cache_bypass=config.cache_bypass,
+        models_cache_path=config.models_cache_path,
+        models_cache_ttl=config.models_cache_ttl_hours * 3600,
+        extraction_mode=config.extraction_mode,
+        base_url=config.openrouter_base_url,
+        streaming=config.streaming,
+        stream_stall_timeout=config.stream_stall_timeout,
+        checkpoint_dir=config.checkpoint_dir if config.checkpoint_enabled else None,
+        cross_group_tokens=config.cross_group_tokens,
+        chunk_size=config.chunk_size,
+        chunk_overlap=config.chunk_overlap,
+        stage_context_tokens=config.stage_context_tokens,
+        duplicate_threshold=config.duplicate_threshold,
+        drop_duplicates=config.drop_duplicates,
+        structured_output=config.structured_output,
+        repair_invalid=config.repair_invalid,
+        max_continuations=config.max_continuations,
+        stage_routes=config.stage_routes,
+        router_models=config.router_models,
+        adaptive_limits=config.adaptive_limits,
+        call_profile_path=config.call_profile_path,
+        adaptive_concurrency=config.adaptive_concurrency,
+        min_concurrent_requests=config.min_concurrent_requests
+    )
     
     # Основной цикл
     ui.run(analyzer, config)
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты асинхронного клиента (core/async_client.py) на заменителе OpenRouter
+"""
+
+import asyncio
+
+import pytest
+
+from core.async_client import AsyncOpenRouterClient, httpx
+from core.retry import RetryPolicy
+from tools.mock_openrouter import MockOpenRouterServer, MockSettings
+
+pytestmark = pytest.mark.skipif(httpx is None, reason="httpx не установлен")
+
+def _client(server: MockOpenRouterServer, **kwargs) -> AsyncOpenRouterClient:
+    return AsyncOpenRouterClient("mock-key", base_url=server.url, http2=False,
+                                 retry_policy=RetryPolicy(max_retries=2, base_delay=0.01), **kwargs)
+
+def test_pool_stats_show_connection_reuse():
+    async def main(server):
+        async with _client(server, max_connections=4) as client:
+            await asyncio.gather(*(client.generate_completion(f"Запрос {i}", 50) for i in range(20)))
+            return client.get_pool_stats()
+
+    with MockOpenRouterServer(MockSettings(latency="fixed:0.02", seed=1)) as server:
+        stats = asyncio.run(main(server))
+    assert stats["pool_size"] == 4
+    assert stats["requests_sent"] == stats["pool_requests"] == 20
+    assert 1 <= stats["connections_opened"] <= 4
+    assert stats["connections_reused"] == 20 - stats["connections_opened"]
+    assert stats["reuse_ratio"] >= 0.8
+    assert stats["idle_connections"] == stats["connections_opened"]
+
+def test_pool_stats_count_gzip():
+    async def main(server):
+        async with _client(server, gzip_min_bytes=500) as client:
+            await client.generate_completion("Длинный запрос " * 50, 50)
+            await client.generate_completion("Коротко", 50)
+            return client.get_pool_stats()
+
+    with MockOpenRouterServer(MockSettings(seed=1)) as server:
+        stats = asyncio.run(main(server))
+    assert stats["gzipped_requests"] == 1
+    assert stats["pool_requests"] == 2
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты кэша ответов LLM (core/cache.py)
+"""
+
+import time
+import asyncio
+import threading
+import concurrent.futures
+
+import pytest
+
+from core.analyzer import OpenRouterAnalyzer
+from core.cache import ResponseCache, make_cache_key, CODEC_NONE, CODEC_ZLIB
+from core.call_profile import MIN_SAMPLES
+from tools.load_test import make_transcript
+from tools.mock_openrouter import MockOpenRouterServer, MockSettings
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), compression="zlib")
+    yield cache
+    cache.close()
+
+def test_key_depends_on_every_parameter():
+    base = make_cache_key("m", "промпт", 100, 0.1, "1")
+    assert base == make_cache_key("m", "промпт", 100, 0.10000001, "1")
+    assert base != make_cache_key("m2", "промпт", 100, 0.1, "1")
+    assert base != make_cache_key("m", "промпт!", 100, 0.1, "1")
+    assert base != make_cache_key("m", "промпт", 200, 0.1, "1")
+    assert base != make_cache_key("m", "промпт", 100, 0.1, "2")
+    assert base != make_cache_key("m", "промпт", 100, 0.1, "1", {"type": "json_object"})
+
+@pytest.mark.parametrize("compression, codec", [("zlib", CODEC_ZLIB), ("none", CODEC_NONE)])
+def test_roundtrip_survives_reopen(tmp_path, compression, codec):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResponseCache(path, compression=compression)
+    assert cache.codec == codec
+    cache.set("k", {"content": "ответ", "prompt_tokens": 10})
+    cache.close()
+
+    reopened = ResponseCache(path, compression="zlib")
+    assert reopened.get("k") == {"content": "ответ", "prompt_tokens": 10}
+    assert reopened.get("нет") is None
+    stats = reopened.get_stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+    reopened.close()
+
+def test_expired_entries_are_removed(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), ttl=0.05)
+    cache.set("k", {"content": "ответ"})
+    time.sleep(0.1)
+    assert cache.get("k") is None
+    stats = cache.get_stats()
+    assert stats["expired"] == 1
+    assert stats["entries"] == 0
+    assert stats["bytes"] == 0
+    cache.close()
+
+def test_lru_eviction_keeps_recently_read(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), compression="none", max_bytes=300)
+    for key in ("a", "b"):
+        cache.set(key, {"content": key * 100})
+        time.sleep(0.01)
+    cache.get("a")
+    time.sleep(0.01)
+    cache.set("c", {"content": "c" * 100})
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    assert cache.get_stats()["evictions"] == 1
+    assert cache.get_stats()["bytes"] <= 300
+    cache.close()
+
+def test_store_predicate_rejects_bad_results(cache):
+    bad = {"content": "", "finish_reason": "length"}
+    assert cache.get_or_compute("k", lambda: bad, store=lambda value: bool(value["content"])) == bad
+    assert cache.get("k") is None
+    good = {"content": "ответ"}
+    assert cache.get_or_compute("k", lambda: good, store=lambda value: bool(value["content"])) == good
+    assert cache.get("k") == good
+    assert cache.get_stats()["rejected"] == 1
+
+def test_bypass_skips_read_but_stores(cache):
+    cache.set("k", {"content": "старый"})
+    assert cache.get_or_compute("k", lambda: {"content": "новый"}, bypass=True) == {"content": "новый"}
+    assert cache.get("k") == {"content": "новый"}
+    assert cache.get_stats()["bypassed"] == 1
+
+def test_concurrent_duplicates_are_coalesced(cache):
+    calls = []
+    release = threading.Event()
+
+    def compute():
+        calls.append(1)
+        release.wait(2)
+        return {"content": "ответ"}
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(cache.get_or_compute, "k", compute, True) for _ in range(4)]
+        time.sleep(0.1)
+        release.set()
+        results = [future.result() for future in futures]
+    assert len(calls) == 1
+    assert results == [{"content": "ответ"}] * 4
+    assert cache.get_stats()["coalesced"] == 3
+
+def test_async_coalescing_and_errors(cache):
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"content": "ответ"}
+
+    async def failing():
+        raise ValueError("сбой")
+
+    async def main():
+        results = await asyncio.gather(*(cache.get_or_compute_async("k", compute) for _ in range(3)))
+        with pytest.raises(ValueError):
+            await cache.get_or_compute_async("ошибка", failing)
+        return results
+
+    assert asyncio.run(main()) == [{"content": "ответ"}] * 3
+    assert len(calls) == 1
+    assert cache.get("ошибка") is None
+
+@pytest.mark.parametrize("stage, value, cacheable", [
+    ("pains", {"content": '{"pain_points": [], "needs": []}', "finish_reason": "stop"}, True),
+    ("pains", {"content": '{"pain_points": [], "needs": []}', "finish_reason": "length"}, False),
+    ("pains", {"content": '{"pain_points": [{"pain": "обры', "finish_reason": "stop"}, False),
+    ("pains", {"content": '{"pain_points": "строка"}', "finish_reason": "stop"}, False),
+    ("pains", {"content": "   ", "finish_reason": "stop"}, False),
+    ("chunk", {"content": "### РЕСПОНДЕНТ\nтекст", "finish_reason": "stop"}, True),
+])
+def test_analyzer_caches_only_valid_responses(stage, value, cacheable):
+    analyzer = OpenRouterAnalyzer("mock-key", models_cache_path=None)
+    assert analyzer._cacheable(stage, value) is cacheable
+
+def test_learned_limits_keep_cache_keys(tmp_path):
+    """Лимит max_tokens из профиля вызовов не меняет ключи: повторный прогон - из кэша"""
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    transcripts = [make_transcript(0, 10)]
+    with MockOpenRouterServer(MockSettings(seed=1)) as server:
+        analyzer = OpenRouterAnalyzer("mock-key", models_cache_path=None, base_url=server.url,
+                                      response_cache=cache)
+        first = analyzer.analyze_transcripts(transcripts)
+        assert first.api_calls > 0
+        for entry in first.usage_ledger:
+            for _ in range(MIN_SAMPLES):
+                analyzer.call_profile.record(entry['stage'], entry['route_model'], 100, 1.0)
+        route = analyzer.router.resolve('pains', 1000)
+        assert route.learned and route.max_tokens < route.cache_max_tokens
+
+        second = analyzer.analyze_transcripts(transcripts)
+    assert second.api_calls == 0
+    assert all(entry['cache_hit'] for entry in second.usage_ledger)
+    cache.close()
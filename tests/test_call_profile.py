@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты профиля вызовов (core/call_profile.py) и лимитов этапов по истории
+"""
+
+import json
+
+from core.call_profile import CallProfile, MIN_SAMPLES, MIN_MAX_TOKENS, MIN_TIMEOUT, WINDOW, PROFILE_VERSION
+from core.routing import ModelRouter, parse_routes
+
+def _fill(profile: CallProfile, stage: str = "pains", model: str = "m", tokens: int = 1000, latency: float = 10.0,
+          count: int = MIN_SAMPLES):
+    for _ in range(count):
+        profile.record(stage, model, tokens, latency)
+
+def test_no_limits_before_min_samples():
+    profile = CallProfile()
+    _fill(profile, count=MIN_SAMPLES - 1)
+    assert profile.limits("pains", "m") == (None, None)
+    profile.record("pains", "m", 1000, 10.0)
+    assert profile.limits("pains", "m") != (None, None)
+
+def test_limits_from_history():
+    profile = CallProfile()
+    _fill(profile, tokens=1000, latency=10.0)
+    # 1000 * 1.25 -> 2048 (степень двойки); 10 * 2 + 5 сек
+    assert profile.limits("pains", "m") == (2048, 25.0)
+    assert profile.limits("pains", "other") == (None, None)
+
+def test_limits_have_floor():
+    profile = CallProfile()
+    _fill(profile, tokens=10, latency=0.5)
+    assert profile.limits("pains", "m") == (MIN_MAX_TOKENS, MIN_TIMEOUT)
+
+def test_window_forgets_old_calls():
+    profile = CallProfile()
+    _fill(profile, tokens=8000, count=WINDOW)
+    _fill(profile, tokens=500, count=WINDOW)
+    assert profile.limits("pains", "m")[0] == 1024
+
+def test_profile_persists_between_runs(tmp_path):
+    path = tmp_path / "profile.json"
+    profile = CallProfile(str(path))
+    _fill(profile)
+    profile.save()
+    assert json.loads(path.read_text(encoding="utf-8"))["version"] == PROFILE_VERSION
+
+    reloaded = CallProfile(str(path))
+    assert reloaded.limits("pains", "m") == profile.limits("pains", "m")
+    assert reloaded.summary()["pains|m"]["samples"] == MIN_SAMPLES
+
+def test_broken_or_foreign_profile_is_ignored(tmp_path):
+    path = tmp_path / "profile.json"
+    path.write_text("{", encoding="utf-8")
+    assert CallProfile(str(path)).summary() == {}
+    path.write_text(json.dumps({"version": PROFILE_VERSION + 1, "calls": {"pains|m": [[1, 1.0]]}}),
+                    encoding="utf-8")
+    assert CallProfile(str(path)).summary() == {}
+
+def test_router_uses_learned_limits_under_route_overrides():
+    profile = CallProfile()
+    _fill(profile, model="main", tokens=1000, latency=10.0)
+    router = ModelRouter(parse_routes({"quotes": {"timeout": 60}}), "main", 8192, 0.1, lambda model: {},
+                         profile=profile)
+
+    learned = router.resolve("pains", 1000)
+    assert (learned.max_tokens, learned.timeout, learned.learned) == (2048, 25.0, True)
+    # Таймаут маршрута важнее истории, max_tokens - из истории
+    _fill(profile, stage="quotes", model="main", tokens=1000, latency=10.0)
+    assert (router.resolve("quotes", 1000).max_tokens, router.resolve("quotes", 1000).timeout) == (2048, 60)
+    # Без истории - значения по умолчанию
+    default = router.resolve("business", 1000)
+    assert (default.max_tokens, default.timeout, default.learned) == (8192, None, False)
+
+def test_learned_max_tokens_never_exceed_configured():
+    profile = CallProfile()
+    _fill(profile, model="main", tokens=7000)
+    router = ModelRouter({}, "main", 4096, 0.1, lambda model: {}, profile=profile)
+    assert router.resolve("pains", 1000).max_tokens == 4096
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты контрольных точек прогона (core/checkpoint.py)
+"""
+
+import json
+
+from config.settings import Config
+from core.checkpoint import RunCheckpoint, list_runs
+from core.data_models import InterviewSummary
+
+def test_checkpoints_are_opt_in():
+    assert not Config().checkpoint_enabled
+
+def test_responses_and_summaries_survive_reopen(tmp_path):
+    checkpoint = RunCheckpoint.create(str(tmp_path), ["Интервью 1", "Интервью 2"], {"engine": "sequential"})
+    checkpoint.save_response("промпт", "pains", 1, '{"pain_points": []}')
+    checkpoint.save_summary(InterviewSummary(interview_id=1, sentiment_score=0.5))
+    checkpoint.mark_failed(2)
+    checkpoint.save_summary(InterviewSummary(interview_id=2))
+
+    reopened = RunCheckpoint(str(checkpoint.run_dir))
+    assert reopened.load_transcripts() == ["Интервью 1", "Интервью 2"]
+    assert reopened.load_response("промпт") == '{"pain_points": []}'
+    assert reopened.load_response("другой промпт") is None
+    assert reopened.load_summary(1).sentiment_score == 0.5
+    # Саммари с ошибками API не считается готовым
+    assert reopened.load_summary(2) is None
+    assert [s.interview_id for s in reopened.load_all_summaries()] == [1, 2]
+    assert reopened.manifest["engine"] == "sequential"
+
+def test_truncated_journal_line_is_skipped(tmp_path):
+    checkpoint = RunCheckpoint.create(str(tmp_path), ["Интервью"], {})
+    checkpoint.save_response("промпт", "chunk", 1, "ответ")
+    with open(checkpoint.steps_path, "a", encoding="utf-8") as f:
+        f.write('{"key": "оборван')
+    assert RunCheckpoint(str(checkpoint.run_dir)).load_response("промпт") == "ответ"
+
+def test_list_runs_reads_only_manifests(tmp_path):
+    checkpoint = RunCheckpoint.create(str(tmp_path), ["Интервью 1", "Интервью 2"], {})
+    checkpoint.save_response("промпт", "pains", 1, "ответ")
+    checkpoint.save_summary(InterviewSummary(interview_id=1))
+    checkpoint.update_manifest(status="complete")
+    # Испорченные журналы не мешают списку прогонов
+    checkpoint.steps_path.write_text("{", encoding="utf-8")
+    checkpoint.summaries_path.write_text("{", encoding="utf-8")
+    (tmp_path / "broken").mkdir()
+    (tmp_path / "broken" / "manifest.json").write_text("{", encoding="utf-8")
+
+    runs = list_runs(str(tmp_path))
+    assert len(runs) == 1
+    assert runs[0]["run_id"] == checkpoint.run_id
+    assert runs[0]["status"] == "complete"
+    assert runs[0]["total_interviews"] == 2
+    assert runs[0]["completed_interviews"] == 1
+    assert runs[0]["saved_steps"] == 1
+
+    manifest = json.loads(checkpoint.manifest_path.read_text(encoding="utf-8"))
+    assert manifest["completed_interviews"] == 1
+
+def test_list_runs_without_directory(tmp_path):
+    assert list_runs(str(tmp_path / "нет")) == []
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты разбиения транскриптов на чанки (core/chunking.py)
+"""
+
+import pytest
+
+from core.chunking import TurnChunker, detect_speaker_format, split_turns
+from core.tokens import estimate_tokens
+
+DIALOG = "\n".join(
+    f"{'Интервьюер' if i % 2 == 0 else 'Респондент'}: Реплика номер {i}. "
+    + "Я пользуюсь приложением каждый день и часто сталкиваюсь с проблемами. " * 3
+    for i in range(20)
+)
+
+@pytest.mark.parametrize("line", [
+    "Интервьюер: Расскажите о себе",
+    "ИНТЕРВЬЮЕР: Расскажите о себе",
+    "респондент: да",
+    "speaker 2: hello",
+    "Спикер 1: да",
+    "Анна К.: да",
+    "- Иван: хорошо",
+    "[Респондент]: ответ",
+])
+def test_speaker_lines_are_detected(line):
+    text = "\n".join([line] * 5)
+    assert detect_speaker_format(text)
+    assert len(split_turns(text)) == 5
+
+@pytest.mark.parametrize("line", [
+    "пример: ещё строка",
+    "например: так бывает",
+    "то есть: не совсем",
+])
+def test_lowercase_words_are_not_speakers(line):
+    text = "Интервьюер: вопрос\nРеспондент: ответ, вот " + line + "\n" + line
+    speakers = [speaker for speaker, _, _ in split_turns(text)]
+    assert speakers == ["Интервьюер", "Респондент"]
+
+def test_turns_cover_text_without_gaps():
+    turns = split_turns(DIALOG)
+    assert turns[0][1] == 0
+    assert turns[-1][2] == len(DIALOG)
+    for (_, _, end), (_, start, _) in zip(turns, turns[1:]):
+        assert end == start
+
+def test_plain_text_splits_by_paragraphs():
+    text = "Первый абзац текста.\n\nВторой абзац.\n\nТретий."
+    assert not detect_speaker_format(text)
+    assert len(split_turns(text)) == 3
+
+def test_chunks_respect_budget_and_keep_turns_whole():
+    chunker = TurnChunker(target_tokens=200)
+    chunks = chunker.chunk(DIALOG)
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert estimate_tokens(chunk) <= 200 + 5
+        assert chunk.startswith(("Интервьюер:", "Респондент:"))
+    assert "".join(chunks) == DIALOG
+
+def test_overlap_repeats_whole_turns():
+    chunker = TurnChunker(target_tokens=400, overlap_tokens=100)
+    chunks = chunker.chunk(DIALOG)
+    assert len(chunks) > 1
+    for previous, current in zip(chunks, chunks[1:]):
+        first_turn = current.split("\n")[0]
+        assert first_turn in previous
+
+def test_long_turn_is_cut_at_sentence_with_speaker_prefix():
+    text = "Респондент: " + "Это одно длинное предложение про опыт. " * 60
+    chunks = TurnChunker(target_tokens=100).chunk(text)
+    assert len(chunks) > 1
+    for chunk in chunks[1:]:
+        assert chunk.startswith("Респондент: ")
+    for chunk in chunks[:-1]:
+        assert chunk.rstrip().endswith(".")
+
+def test_empty_text():
+    assert TurnChunker(100).chunk("") == []
+    assert TurnChunker(100).chunk("   ") == ["   "]
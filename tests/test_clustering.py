@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты локальной дедупликации сущностей (core/clustering.py)
+"""
+
+import numpy as np
+import pytest
+
+from core.clustering import vectorize_texts, cluster_vectors, cluster_texts, merge_entities, VECTOR_DIM
+
+LATE = ["Курьер опаздывает с доставкой", "Курьеры часто опаздывают с доставкой"]
+HISTORY = ["Не могу найти историю заказов", "Не получается найти историю заказа"]
+SLOW_APP = "Приложение долго грузится"
+
+def test_vectors_are_normalized():
+    vectors = vectorize_texts(LATE + [SLOW_APP, "", "а и"])
+    assert vectors.shape == (5, VECTOR_DIM) and vectors.dtype == np.float32
+    assert np.allclose(np.linalg.norm(vectors[:3], axis=1), 1.0)
+    # Без слов из 3+ букв - нулевой вектор
+    assert not vectors[3].any() and not vectors[4].any()
+    assert vectorize_texts([]).shape == (0, VECTOR_DIM)
+
+def test_vectors_ignore_case_yo_and_endings():
+    assert np.allclose(vectorize_texts(["Всё ещё ждём"]), vectorize_texts(["все еще ждем"]))
+    vectors = vectorize_texts(LATE + HISTORY + [SLOW_APP])
+    similarity = vectors @ vectors.T
+    assert similarity[0, 1] > 0.6 and similarity[2, 3] > 0.6
+    assert similarity[0, 2] < 0.2 and similarity[0, 4] < 0.2
+
+def test_vectors_are_stable_between_calls():
+    """Хэши n-грамм не зависят от запуска (crc32, а не hash())"""
+    assert np.array_equal(vectorize_texts(LATE), vectorize_texts(list(LATE)))
+
+@pytest.mark.parametrize("block_size", [1, 2, 512])
+def test_cluster_vectors_same_result_for_any_block(block_size):
+    """Лидеры из того же блока (block_size=512) и из прошлых блоков (1, 2) дают одни кластеры"""
+    texts = [LATE[0], HISTORY[0], SLOW_APP, LATE[1], HISTORY[1]]
+    assert cluster_vectors(vectorize_texts(texts), block_size=block_size) == [[0, 3], [1, 4], [2]]
+
+def test_cluster_vectors_matches_leader_opened_in_same_block():
+    # Все тексты в одном блоке: лидеры 0 и 1 еще не в матрице лидеров, совпадение ищется среди новых лидеров
+    vectors = vectorize_texts([HISTORY[0], LATE[0], LATE[1]])
+    assert cluster_vectors(vectors, block_size=3) == [[0], [1, 2]]
+
+def test_cluster_vectors_threshold_and_empty():
+    vectors = vectorize_texts(LATE)
+    assert cluster_vectors(vectors, threshold=0.99) == [[0], [1]]
+    assert cluster_vectors(vectors, threshold=0.5) == [[0, 1]]
+    assert cluster_vectors(np.zeros((0, VECTOR_DIM), dtype=np.float32)) == []
+    assert cluster_texts(LATE + [SLOW_APP]) == [[0, 1], [2]]
+
+def test_merge_entities_rules():
+    items = [
+        {"pain": LATE[0], "severity": "medium", "interview_id": 1, "quotes": ["Ждал час"]},
+        {"pain": SLOW_APP, "severity": "critical", "interview_id": 2},
+        {"pain": LATE[1], "severity": "high", "interview_id": 3, "quotes": ["Ждал час", "Опять опоздал"]},
+        {"pain": LATE[0], "severity": "low", "interview_ids": [1, 4], "quotes": "Курьер потерялся"},
+        {"pain": "   ", "interview_id": 5},
+    ]
+    merged = merge_entities(items, keys=["pain"])
+    assert len(merged) == 2
+    late, slow = merged
+    # Серьезность - максимальная в кластере, номера интервью - без повторов и по порядку
+    assert late["severity"] == "high"
+    assert late["interview_ids"] == [1, 3, 4]
+    assert (late["frequency_count"], late["mentions"]) == (3, 3)
+    # Цитаты объединяются без повторов, строка считается одной цитатой
+    assert late["quotes"] == ["Ждал час", "Опять опоздал", "Курьер потерялся"]
+    assert late["pain"] in LATE
+    assert late["variations"] == [text for text in LATE if text != late["pain"]]
+    assert "interview_id" not in late
+    assert (slow["pain"], slow["severity"], slow["interview_ids"]) == (SLOW_APP, "critical", [2])
+    assert "quotes" not in slow
+
+def test_merge_entities_sorting_and_plain_strings():
+    items = [SLOW_APP, {"text": HISTORY[0], "interview_id": 1}, {"text": HISTORY[1], "interview_id": 2}]
+    merged = merge_entities(items, keys=["text"])
+    assert [entity["frequency_count"] for entity in merged] == [2, 1]
+    # Сущность-строка становится словарем по первому ключу, без номеров интервью считаются упоминания
+    assert merged[1] == {"text": SLOW_APP, "interview_ids": [], "frequency_count": 1, "mentions": 1,
+                         "variations": []}
+    assert merge_entities([], keys=["text"]) == []
+    assert merge_entities([{"text": ""}], keys=["text"]) == []
+
+def test_merge_entities_falls_back_to_next_key():
+    merged = merge_entities([{"need": "", "description": LATE[0]}, {"need": LATE[1]}], keys=["need", "description"])
+    assert len(merged) == 1 and merged[0]["mentions"] == 2
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты адаптивного лимита запросов (core/concurrency.py)
+"""
+
+import random
+import asyncio
+import concurrent.futures
+from collections import deque
+from typing import Callable, Union
+
+import pytest
+
+from core.concurrency import AdaptiveLimiter, is_overload, normalized_latency, LATENCY_SPIKE_STREAK
+from core.openrouter_client import OpenRouterClient, CompletionResult
+from core.retry import RetryPolicy, APIError
+from tools.mock_openrouter import MockOpenRouterServer, MockSettings
+
+def _steady_load(limiter: AdaptiveLimiter, concurrency: int, responses: int,
+                 latency: Union[float, Callable[[int], float]] = 1.0):
+    """Постоянная нагрузка: до concurrency запросов в полете (в пределах лимита), responses ответов
+
+    latency - нормированная задержка или функция номера ответа.
+    """
+    in_flight = deque()
+    for i in range(responses):
+        while len(in_flight) < min(concurrency, limiter.limit):
+            in_flight.append(limiter.acquire())
+        limiter.release(in_flight.popleft(), latency=latency(i) if callable(latency) else latency)
+
+def test_slow_start_grows_when_saturated():
+    limiter = AdaptiveLimiter(initial=4, max_limit=64)
+    _steady_load(limiter, concurrency=100, responses=4)
+    assert limiter.limit == 8
+
+def test_limit_does_not_grow_below_saturation():
+    """Лимит 32 при 5 запросах в полете не был ограничением - роста нет"""
+    limiter = AdaptiveLimiter(initial=32, max_limit=64)
+    _steady_load(limiter, concurrency=5, responses=250)
+    assert limiter.limit == 32
+    assert limiter.snapshot()["highest_limit"] == 32
+
+def test_overload_halves_once_per_window():
+    limiter = AdaptiveLimiter(initial=16, max_limit=64)
+    started = [limiter.acquire() for _ in range(8)]
+    for start in started:
+        limiter.release(start, overloaded=True, status_code=429)
+    snapshot = limiter.snapshot()
+    assert snapshot["limit"] == 8
+    assert snapshot["throttle_events"] == 1
+    assert snapshot["rate_limited"] == 8
+    assert not snapshot["slow_start"]
+
+def test_additive_increase_after_overload():
+    limiter = AdaptiveLimiter(initial=8, max_limit=64)
+    limiter.release(limiter.acquire(), overloaded=True, status_code=503)
+    assert limiter.limit == 4
+    # Шаг 1/limit на ответ - около единицы за круг из limit ответов
+    _steady_load(limiter, concurrency=100, responses=5)
+    assert limiter.limit == 5
+
+def test_normal_latency_variance_does_not_throttle():
+    """Без ошибок и с обычным разбросом времени генерации лимит не снижается"""
+    rng = random.Random(7)
+    limiter = AdaptiveLimiter(initial=16, max_limit=64)
+    _steady_load(limiter, concurrency=32, responses=5000, latency=lambda i: rng.lognormvariate(0.8, 0.5))
+    snapshot = limiter.snapshot()
+    assert snapshot["throttle_events"] == 0
+    assert snapshot["latency_spikes"] == 0
+    assert snapshot["limit"] >= 32
+
+def test_isolated_slow_responses_do_not_throttle():
+    limiter = AdaptiveLimiter(initial=16, max_limit=64)
+    slow = {100 + k * 10 for k in range(20)}
+    _steady_load(limiter, concurrency=16, responses=400, latency=lambda i: 50.0 if i in slow else 1.0)
+    assert limiter.snapshot()["throttle_events"] == 0
+
+def test_sustained_latency_spike_throttles():
+    limiter = AdaptiveLimiter(initial=16, max_limit=64)
+    before_spike = []
+
+    def latency(i):
+        if i == 100:
+            before_spike.append(limiter.limit)
+        return 1.0 if i < 100 else 10.0
+
+    _steady_load(limiter, concurrency=16, responses=100 + LATENCY_SPIKE_STREAK, latency=latency)
+    snapshot = limiter.snapshot()
+    assert snapshot["latency_spikes"] == 1
+    assert snapshot["limit"] < before_spike[0]
+
+def test_set_max_limit_caps_current_limit():
+    limiter = AdaptiveLimiter(initial=32, max_limit=64)
+    limiter.set_max_limit(10)
+    assert limiter.limit == 10
+    _steady_load(limiter, concurrency=100, responses=50)
+    assert limiter.limit == 10
+
+def test_waiters_are_served_in_order():
+    limiter = AdaptiveLimiter(initial=1, max_limit=1)
+    first = limiter.acquire()
+    order = []
+
+    async def waiter(name: str):
+        started = await limiter.acquire_async()
+        order.append(name)
+        limiter.release(started)
+
+    async def main():
+        tasks = [asyncio.create_task(waiter(name)) for name in "abc"]
+        await asyncio.sleep(0.01)
+        assert limiter.snapshot()["queue_depth"] == 3
+        limiter.release(first)
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    assert order == ["a", "b", "c"]
+    assert limiter.snapshot()["in_flight"] == 0
+
+def test_cancelled_waiter_leaves_queue():
+    limiter = AdaptiveLimiter(initial=1, max_limit=1)
+    first = limiter.acquire()
+
+    async def main():
+        task = asyncio.create_task(limiter.acquire_async())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    limiter.release(first)
+    snapshot = limiter.snapshot()
+    assert snapshot["queue_depth"] == 0
+    assert snapshot["in_flight"] == 0
+
+def test_helpers():
+    assert is_overload(APIError("x", 429))
+    assert is_overload(APIError("x", 502))
+    assert not is_overload(APIError("x", 400))
+    assert not is_overload(ValueError("x"))
+    completion = CompletionResult(content="", model="m", prompt_tokens=0, completion_tokens=2000, latency=4.0)
+    assert normalized_latency(completion) == pytest.approx(2.0)
+    assert normalized_latency(None) is None
+
+def _load(server: MockOpenRouterServer, limiter: AdaptiveLimiter, workers: int, requests: int):
+    """requests запросов из workers потоков через общий лимит"""
+    client = OpenRouterClient("mock-key", base_url=server.url, models_cache_path=None, pool_size=workers,
+                              retry_policy=RetryPolicy(max_retries=8, base_delay=0.01, max_delay=0.1),
+                              limiter=limiter)
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(client.generate_completion, f"Запрос {i}", 50) for i in range(requests)]
+            for future in futures:
+                future.result()
+    finally:
+        client.close()
+
+def test_mock_limit_stays_near_actual_concurrency():
+    """5 потоков не насыщают лимит 32: лимит не уходит к max_limit"""
+    limiter = AdaptiveLimiter(initial=32, max_limit=64)
+    with MockOpenRouterServer(MockSettings(latency="fixed:0.01", seed=1)) as server:
+        _load(server, limiter, workers=5, requests=60)
+    snapshot = limiter.snapshot()
+    assert snapshot["peak_in_flight"] <= 5
+    assert snapshot["highest_limit"] == 32
+
+def test_mock_capacity_throttles_limit():
+    """Заменитель с емкостью 4 отвечает 429 сверх нее - лимит снижается"""
+    limiter = AdaptiveLimiter(initial=16, max_limit=16)
+    with MockOpenRouterServer(MockSettings(latency="fixed:0.05", capacity=4, retry_after=0.01, seed=1)) as server:
+        _load(server, limiter, workers=16, requests=64)
+    snapshot = limiter.snapshot()
+    assert snapshot["rate_limited"] > 0
+    assert snapshot["throttle_events"] > 0
+    assert snapshot["lowest_limit"] <= 8
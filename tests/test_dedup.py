@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты поиска почти одинаковых транскриптов (core/dedup.py)
+"""
+
+import numpy as np
+
+from core.analyzer import OpenRouterAnalyzer
+from core.dedup import find_near_duplicates, drop_near_duplicates, minhash_signature, NUM_PERM
+from tools.load_test import make_transcript
+
+def _edited(text: str) -> str:
+    """Та же беседа: другой регистр, пунктуация, "е" вместо "ё" и одна правка в конце"""
+    return text.upper().replace(".", "!").replace("Ё", "Е") + "\nРеспондент: Спасибо, на этом всё."
+
+def test_signature_ignores_case_punctuation_and_yo():
+    assert minhash_signature("Всё! Ещё раз, ПОЖАЛУЙСТА.").shape == (NUM_PERM,)
+    assert np.array_equal(minhash_signature("Всё! Ещё раз, ПОЖАЛУЙСТА."), minhash_signature("все ещё, раз пожалуйста"))
+
+def test_exact_duplicate():
+    texts = [make_transcript(0), make_transcript(1), make_transcript(0)]
+    report = find_near_duplicates(texts)
+    assert report.kept == [0, 1]
+    assert report.duplicates == {2: (0, 1.0)}
+    assert report.saved_tokens > 0
+
+def test_near_duplicate_keeps_earliest():
+    original = make_transcript(3)
+    texts, report = drop_near_duplicates([_edited(original), make_transcript(4), original])
+    assert report.kept == [0, 1]
+    assert list(report.duplicates) == [2]
+    original_index, similarity = report.duplicates[2]
+    assert original_index == 0
+    assert similarity >= 0.85
+    assert texts == [_edited(original), make_transcript(4)]
+
+def test_distinct_transcripts_are_not_duplicates():
+    """Интервью по одному сценарию с похожими ответами - не дубликаты"""
+    report = find_near_duplicates([make_transcript(i) for i in range(50)])
+    assert not report.has_duplicates
+    assert report.kept == list(range(50))
+    assert report.to_dict()["duplicates"] == []
+
+def test_empty_and_short_texts():
+    assert find_near_duplicates([]).total == 0
+    report = find_near_duplicates(["", "Да", "Нет"])
+    assert report.kept == [0, 1, 2]
+
+def test_analyzer_checks_new_transcripts_against_base():
+    """При добавлении интервью дубликат уже проанализированного транскрипта пропускается"""
+    analyzer = OpenRouterAnalyzer("mock-key", models_cache_path=None)
+    base = [make_transcript(0), make_transcript(1)]
+    new = [make_transcript(2), _edited(make_transcript(1)), make_transcript(2)]
+    kept, interview_ids = analyzer._filter_duplicates(new, base=base, first_id=3)
+    assert kept == [make_transcript(2)]
+    assert interview_ids == [3]
+    duplicates = analyzer.run_metadata["duplicates"]
+    assert duplicates["base_transcripts"] == 2
+    assert duplicates["skipped_interview_ids"] == [4, 5]
+    # Отрицательный original - номер среди прежних транскриптов
+    assert [(item["index"], item["original"]) for item in duplicates["duplicates"]] == [(1, -1), (2, 0)]
+
+def test_analyzer_only_warns_when_dropping_disabled():
+    analyzer = OpenRouterAnalyzer("mock-key", models_cache_path=None, drop_duplicates=False)
+    transcripts = [make_transcript(0), make_transcript(0)]
+    assert analyzer._filter_duplicates(transcripts) == (transcripts, [1, 2])
+    assert analyzer.run_metadata["duplicates"]["dropped"] is False
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты извлечения JSON из ответов модели (core/json_extract.py)
+"""
+
+import time
+
+import pytest
+
+from core.json_extract import (extract_json, iter_json_spans, parse_stage_response, validate_stage,
+                               summarize_parse_stats, PARSE_OK, PARSE_PARTIAL, PARSE_EMPTY, PARSE_FAILED)
+
+@pytest.mark.parametrize("text", [
+    '{"pain_points": [], "needs": []}',
+    '```json\n{"pain_points": [], "needs": []}\n```',
+    'Вот результат анализа:\n{"pain_points": [], "needs": []}\nНадеюсь, это поможет.',
+    '\ufeff  {"pain_points": [], "needs": []}  ',
+])
+def test_extracts_object_from_surrounding_text(text):
+    assert extract_json(text) == {"pain_points": [], "needs": []}
+
+def test_braces_and_quotes_inside_strings():
+    text = 'Ответ: {"quote": "он сказал \\"}{\\" и ушел", "items": ["[", "]"]} конец'
+    assert extract_json(text) == {"quote": 'он сказал "}{" и ушел', "items": ["[", "]"]}
+
+def test_quotes_outside_json_do_not_open_string():
+    text = 'Модель "подумала" и вернула {"a": 1}'
+    assert extract_json(text) == {"a": 1}
+
+def test_longest_fragment_wins_over_short_examples():
+    text = 'Например [1, 3] или {"x": 1}. Итог: {"pain_points": [{"pain": "долго"}], "needs": []}'
+    assert extract_json(text) == {"pain_points": [{"pain": "долго"}], "needs": []}
+
+def test_mismatched_bracket_restarts_scan():
+    text = '{"a": [1, 2} мусор {"b": 2}'
+    assert list(iter_json_spans(text)) == [(text.index('{"b"'), len(text))]
+    assert extract_json(text) == {"b": 2}
+
+@pytest.mark.parametrize("text", ["", "просто текст", '{"a": 1', "{оборвано: [1, 2]}"])
+def test_no_json(text):
+    assert extract_json(text) is None
+
+def test_linear_time_on_unbalanced_input():
+    text = "{" * 200000
+    started = time.perf_counter()
+    assert extract_json(text) is None
+    assert time.perf_counter() - started < 2.0
+
+def test_stage_statuses():
+    assert parse_stage_response("pains", '{"pain_points": [], "needs": []}').status == PARSE_OK
+    assert parse_stage_response("pains", "{}").status == PARSE_EMPTY
+    assert parse_stage_response("pains", "нет JSON").status == PARSE_FAILED
+    assert parse_stage_response("pains", '{"other": 1}').status == PARSE_FAILED
+    assert parse_stage_response("pains", "[1, 2]").status == PARSE_FAILED
+
+def test_wrong_types_are_dropped_as_partial():
+    parsed = validate_stage("pains", {"pain_points": "строка вместо списка", "needs": [], "extra": 1})
+    assert parsed.status == PARSE_PARTIAL
+    assert parsed.data == {"needs": [], "extra": 1}
+    assert parsed.rejected == {"pain_points": "строка вместо списка"}
+    assert parsed.errors
+
+def test_sentiment_score_is_coerced_to_float():
+    parsed = validate_stage("emotions", {"sentiment_score": "0,7", "insights": []})
+    assert parsed.status == PARSE_OK
+    assert parsed.data["sentiment_score"] == pytest.approx(0.7)
+    assert validate_stage("emotions", {"sentiment_score": True}).status == PARSE_FAILED
+
+def test_stage_without_schema_only_needs_json():
+    assert validate_stage("unknown", [1, 2]).status == PARSE_OK
+
+def test_failure_rate_ignores_empty_responses():
+    stats = summarize_parse_stats({"pains": {PARSE_OK: 3, PARSE_FAILED: 1, PARSE_EMPTY: 4}})
+    assert stats["by_stage"]["pains"]["failure_rate"] == 0.25
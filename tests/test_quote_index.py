@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты проверки цитат по транскриптам (core/quote_index.py)
+"""
+
+import pytest
+
+from core.data_models import InterviewSummary
+from core.quote_index import (TranscriptIndex, locate_quote, verify_summary_quotes, verify_insight_quotes,
+                              quote_verification_stats)
+from tools.load_test import make_transcript
+
+TRANSCRIPT = (
+    "Интервьюер: Как вы заказываете еду?\n"
+    "Респондент: Обычно вечером, после работы. Ещё раз повторю: приложение всё время зависает "
+    "на оплате, и я уже дважды терял заказ. Поддержка отвечает шаблонами — ничего не решает!\n"
+    "Интервьюер: Что бы вы изменили?\n"
+    "Респондент: Я бы хотел видеть реальное время доставки, а не обещания приложения."
+)
+
+@pytest.fixture
+def index():
+    return TranscriptIndex(TRANSCRIPT, interview_id=7)
+
+def test_exact_quote(index):
+    quote = "Поддержка отвечает шаблонами — ничего не решает!"
+    match = index.locate(quote)
+    assert (match.status, match.score, match.interview_id) == ("verified", 1.0, 7)
+    assert TRANSCRIPT[match.start:match.end] == "Поддержка отвечает шаблонами — ничего не решает"
+
+def test_yo_case_and_punctuation_are_normalized(index):
+    match = index.locate("ЕЩЕ РАЗ ПОВТОРЮ - приложение все время зависает на оплате...")
+    assert (match.status, match.score) == ("verified", 1.0)
+    assert TRANSCRIPT[match.start:match.end] == "Ещё раз повторю: приложение всё время зависает на оплате"
+
+def test_near_quote_with_missing_and_changed_words(index):
+    # Пересказ: пропущено "уже" - не совпадают две n-граммы из двенадцати
+    match = index.locate("приложение всё время зависает на оплате и я дважды терял заказ поддержка отвечает шаблонами")
+    assert match.status == "approximate"
+    assert 0.8 <= match.score < 0.9
+    assert TRANSCRIPT[match.start:match.end].endswith("Поддержка отвечает шаблонами")
+    # "дважды" заменено на "три раза"
+    changed = index.locate("приложение всё время зависает на оплате, и я уже три раза терял заказ")
+    assert changed.status == "approximate"
+    assert 0.5 <= changed.score < 0.8
+    assert TRANSCRIPT[changed.start:changed.end].startswith("приложение всё время зависает")
+    # Длинная цитата с одним пропущенным словом остается дословной
+    long_quote = TRANSCRIPT.split("Респондент: ")[1].replace("уже ", "")
+    assert index.locate(long_quote).status == "verified"
+
+def test_absent_quote(index):
+    match = index.locate("Я никогда не пользуюсь доставкой, готовлю сам каждый день")
+    assert (match.status, match.start, match.end) == ("unverified", None, None)
+    # Отдельные слова из транскрипта в другом порядке - тоже не цитата
+    assert index.locate("оплате заказ время приложение шаблонами поддержка").status == "unverified"
+
+def test_short_and_empty_quotes(index):
+    match = index.locate("Всё время!")
+    assert match.status == "verified"
+    assert TRANSCRIPT[match.start:match.end] == "всё время"
+    # Короткая цитата ищется по целым словам
+    assert index.locate("время дост").status == "unverified"
+    assert index.locate("").status == "unverified"
+    assert index.locate("?!").status == "unverified"
+    assert TranscriptIndex("").locate("что угодно").status == "unverified"
+
+def test_frequent_ngrams_do_not_hide_quote():
+    """Повторяющиеся реплики интервьюера не сбивают выравнивание"""
+    transcript = make_transcript(0, 200)
+    quote = transcript.splitlines()[301].split(": ", 1)[1]
+    match = TranscriptIndex(transcript).locate(quote)
+    assert (match.status, match.score) == ("verified", 1.0)
+    assert transcript[match.start:match.end] in quote
+
+def test_locate_quote_across_interviews():
+    indices = {1: TranscriptIndex(make_transcript(5), 1), 2: TranscriptIndex(TRANSCRIPT, 2)}
+    quote = "приложение всё время зависает на оплате"
+    assert locate_quote(quote, indices).interview_id == 2
+    assert locate_quote(quote, indices, interview_id=2).status == "verified"
+    # Неизвестный номер интервью - поиск по всем транскриптам
+    assert locate_quote(quote, indices, interview_id=99).interview_id == 2
+    assert locate_quote("совсем другая фраза про погоду", indices).status == "unverified"
+
+def test_verification_fields_and_stats(index):
+    summary = InterviewSummary(
+        interview_id=7,
+        quotes=[{"text": "я уже дважды терял заказ"}, {"text": "Выдуманная цитата про погоду и дождь"}],
+        pain_points=[{"pain": "Зависания", "quotes": ["приложение всё время зависает на оплате", {"text": "нет"}]}],
+        emotional_journey=[{"stage": "оплата", "quote": "ничего не решает"}, {"stage": "выбор"}],
+    )
+    verify_summary_quotes(summary, index)
+    assert summary.quotes[0]["verification"]["status"] == "verified"
+    assert summary.quotes[1]["verification"]["status"] == "unverified"
+    assert [v["status"] for v in summary.pain_points[0]["quote_verification"]] == ["verified", "unverified"]
+    assert summary.emotional_journey[0]["quote_verification"]["status"] == "verified"
+    assert "quote_verification" not in summary.emotional_journey[1]
+
+    insights = [{"insight": "x", "quotes": [{"text": "Поддержка отвечает шаблонами", "interview_id": 7}]}]
+    verify_insight_quotes(insights, {7: index})
+    assert insights[0]["quotes"][0]["verification"]["interview_id"] == 7
+
+    stats = quote_verification_stats([summary], insights)
+    assert stats == {"verified": 4, "approximate": 0, "unverified": 2, "total": 6}
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты исправления обрезанных и невалидных ответов этапов (core/repair.py)
+"""
+
+import json
+
+from core.json_extract import parse_stage_response, PARSE_OK, PARSE_PARTIAL, PARSE_FAILED
+from core.repair import (is_truncated, strip_trailing_commas, salvage_truncated, repair_locally, salvage,
+                         build_repair_request, apply_repair, is_improved, merge_continuation,
+                         REPAIR_MAX_CHARS)
+
+TRUNCATED = '{"pain_points": [{"pain": "долго", "quotes": ["a"]}, {"pain": "до'
+
+def test_truncation_detection():
+    assert is_truncated(TRUNCATED)
+    assert not is_truncated('{"pain_points": []}')
+    assert not is_truncated("просто текст")
+    # Скобка внутри строки не считается открытой
+    assert not is_truncated('{"quote": "{["}')
+
+def test_trailing_commas_outside_strings():
+    text = '{"a": [1, 2, ], "b": "x, ]",}'
+    assert strip_trailing_commas(text) == '{"a": [1, 2 ], "b": "x, ]"}'
+    assert json.loads(strip_trailing_commas(text)) == {"a": [1, 2], "b": "x, ]"}
+
+def test_salvage_keeps_complete_items():
+    salvaged = salvage_truncated(TRUNCATED)
+    assert json.loads(salvaged) == {"pain_points": [{"pain": "долго", "quotes": ["a"]}]}
+    assert salvage_truncated('{"pain_points": []} хвост') == '{"pain_points": []}'
+    assert salvage_truncated('{"pain') is None
+    assert salvage_truncated("нет JSON") is None
+
+def test_salvage_stage():
+    parsed = salvage("pains", TRUNCATED)
+    assert parsed.status == PARSE_OK
+    assert len(parsed.data["pain_points"]) == 1
+
+def test_local_repair_commas_and_wrapper():
+    parsed = repair_locally("pains", '```json\n{"analysis": {"pain_points": [], "needs": [],}}\n```')
+    assert parsed.status == PARSE_OK
+    assert parsed.data == {"pain_points": [], "needs": []}
+    assert repair_locally("pains", '{"other": 1}') is None
+    assert repair_locally("pains", TRUNCATED) is None
+
+def test_repair_request_sends_only_rejected_fields():
+    text = '{"pain_points": "строка", "needs": []}'
+    parsed = parse_stage_response("pains", text)
+    assert parsed.status == PARSE_PARTIAL
+    request = build_repair_request("pains", text, parsed)
+    assert request.fields == ["pain_points"]
+    assert '"needs"' not in request.prompt.split("ФРАГМЕНТ:")[1]
+
+    fixed = apply_repair("pains", parsed, request, '{"pain_points": [{"pain": "строка"}], "needs": ["лишнее"]}')
+    assert fixed.status == PARSE_OK
+    assert fixed.data == {"needs": [], "pain_points": [{"pain": "строка"}]}
+    assert is_improved(parsed, fixed)
+
+def test_repair_request_for_syntax_error():
+    text = 'Ответ: {"pain_points": [{"pain": "a" "b"}], "needs": []}'
+    parsed = parse_stage_response("pains", text)
+    assert parsed.status == PARSE_FAILED
+    request = build_repair_request("pains", text, parsed, include_schema=True)
+    assert request.fields == ["pain_points", "needs"]
+    assert "Ответ:" not in request.prompt
+    assert "СХЕМА:" in request.prompt
+
+def test_repair_request_limits():
+    assert build_repair_request("unknown", "{}", parse_stage_response("unknown", "{}")) is None
+    text = '{"pain_points": "' + "x" * REPAIR_MAX_CHARS + '"}'
+    assert build_repair_request("pains", text, parse_stage_response("pains", text)) is None
+
+def test_failed_repair_keeps_parsed_fields():
+    parsed = parse_stage_response("pains", '{"pain_points": "строка", "needs": []}')
+    request = build_repair_request("pains", '{"pain_points": "строка", "needs": []}', parsed)
+    assert apply_repair("pains", parsed, request, "не JSON") is parsed
+    assert not is_improved(parsed, parsed)
+
+def test_merge_continuation():
+    head = '{"pain_points": [{"pain": "медленная загрузка меню вечером"'
+    # Продолжение повторяет конец префикса
+    assert merge_continuation(head, 'загрузка меню вечером", "severity": "high"}]}') == (
+        head + ', "severity": "high"}]}')
+    # Модель начала ответ заново
+    restarted = head + ', "severity": "high"}]}'
+    assert merge_continuation(head, restarted) == restarted
+    assert merge_continuation(head + "  ", "") == head
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты локального поиска по материалам интервью (core/retrieval.py)
+"""
+
+import numpy as np
+
+from core.retrieval import PassageIndex, build_passage_index, tokenize
+
+TRANSCRIPT = "\n".join([
+    "Респондент: Оплата картой часто зависает, приходится перезапускать приложение.",
+    "Респондент: Курьеры опаздывают, доставка занимает больше часа.",
+    "Респондент: Поддержка отвечает шаблонами, проблемы с оплатой не решает.",
+    "Респондент: Курьер опоздал, потом курьер перепутал адрес, доставка снова сорвалась.",
+    "Респондент: Каталог удобный, ищу рестораны по кухне.",
+])
+SUMMARY = "Главная боль: зависания оплаты."
+
+def _index() -> PassageIndex:
+    return PassageIndex({"transcript": TRANSCRIPT, "summary": SUMMARY}, passage_tokens=40)
+
+def test_tokenize_stems_and_stop_words():
+    assert tokenize("Проблемы, проблемой и ещё ПРОБЛЕМА!") == ["пробле"] * 3
+    assert tokenize("Всё ещё это не то") == []
+    assert tokenize("Ёлка и елка") == ["елка", "елка"]
+
+def test_passages_keep_turns_and_sources():
+    index = _index()
+    assert [passage.source for passage in index.passages] == ["summary"] + ["transcript"] * 5
+    assert [passage.position for passage in index.passages[1:]] == list(range(5))
+    assert index.passages[2].text == TRANSCRIPT.splitlines()[1]
+    assert index.total_tokens == sum(passage.tokens for passage in index.passages)
+
+def test_ranking():
+    index = _index()
+    scores = index.score("курьер доставка")
+    ranked = list(np.argsort(-scores, kind="stable"))
+    # Больше вхождений редких терминов - выше; фрагменты без терминов запроса - ноль
+    assert ranked[:2] == [4, 2]
+    assert scores[4] > scores[2] > 0
+    assert scores[0] == scores[1] == scores[3] == scores[5] == 0
+    # Морфология: "курьеров" находит "курьер" и "курьеры"
+    assert set(np.flatnonzero(index.score("курьеров"))) == {2, 4}
+
+def test_rare_terms_weigh_more():
+    index = _index()
+    # "шаблонами" - в одном фрагменте, "доставка" - в двух: фрагмент 3 длиннее фрагмента 2, но выше
+    scores = index.score("шаблонами доставка")
+    assert int(scores.argmax()) == 3
+    assert index.passages[3].tokens > index.passages[2].tokens
+    assert scores[3] > scores[2] > 0
+
+def test_empty_query():
+    index = _index()
+    for query in ("", "   ", "и в на это", "?!"):
+        assert not index.score(query).any()
+    # Без совпадений - саммари и ранние фрагменты в исходном порядке
+    packed = index.pack("", budget_tokens=index.passages[0].tokens + index.passages[1].tokens)
+    assert packed == f"{SUMMARY}\n\nФРАГМЕНТЫ ТРАНСКРИПТА:\n{TRANSCRIPT.splitlines()[0]}"
+
+def test_empty_index():
+    index = build_passage_index("", None)
+    assert index.passages == []
+    assert index.score("курьер").shape == (0,)
+    assert index.pack("курьер", 1000) == ""
+
+def test_pack_respects_budget_and_order():
+    index = _index()
+    budget = index.passages[0].tokens + index.passages[2].tokens + index.passages[4].tokens
+    packed = index.pack("курьер доставка", budget)
+    lines = TRANSCRIPT.splitlines()
+    assert packed == f"{SUMMARY}\n\nФРАГМЕНТЫ ТРАНСКРИПТА:\n{lines[1]}\n...\n{lines[3]}"
+    # Весь материал помещается - все фрагменты
+    assert index.pack("курьер", index.total_tokens).count("\n...\n") == 4
+
+def test_summary_over_budget_competes_with_transcript():
+    index = _index()
+    packed = index.pack("курьер", index.passages[0].tokens - 1)
+    assert SUMMARY not in packed
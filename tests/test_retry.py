@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты политики повторов (core/retry.py)
+"""
+
+import random
+import asyncio
+from email.utils import formatdate
+
+import pytest
+
+from core.analyzer import OpenRouterAnalyzer
+from core.retry import RetryPolicy, APIError, parse_retry_after
+from tools.load_test import make_transcript
+from tools.mock_openrouter import MockOpenRouterServer, MockSettings
+
+NOW = 1_700_000_000.0
+
+@pytest.mark.parametrize("headers, expected", [
+    ({"Retry-After": "120"}, 120.0),
+    ({"retry-after": " 1.5 "}, 1.5),
+    ({"Retry-After": "-3"}, 0.0),
+    ({"Retry-After": formatdate(NOW + 90, usegmt=True)}, 90.0),
+    ({"Retry-After": formatdate(NOW - 90, usegmt=True)}, 0.0),
+    ({"X-RateLimit-Reset": str(int((NOW + 30) * 1000))}, 30.0),
+    ({"X-RateLimit-Reset": str(NOW + 45)}, 45.0),
+    ({"x-ratelimit-reset": "7"}, 7.0),
+    ({"Retry-After": "завтра", "X-RateLimit-Reset": "5"}, 5.0),
+    ({"X-RateLimit-Reset": "скоро"}, None),
+    ({}, None),
+])
+def test_parse_retry_after(headers, expected):
+    delay = parse_retry_after(headers, now=NOW)
+    if expected is None:
+        assert delay is None
+    else:
+        assert delay == pytest.approx(expected, abs=1.0)
+
+@pytest.mark.parametrize("error, retryable", [
+    (APIError("x", 429), True),
+    (APIError("x", 408), True),
+    (APIError("x", 503), True),
+    (APIError("x", 599), True),
+    (APIError("x"), True),
+    (APIError("x", 400), False),
+    (APIError("x", 401), False),
+    (APIError("x", 403), False),
+    (APIError("x", 404), False),
+    (APIError("x", 400, retryable=True), True),
+    (ConnectionError("x"), True),
+    (TimeoutError("x"), True),
+    (ValueError("x"), False),
+])
+def test_classification(error, retryable):
+    assert RetryPolicy().is_retryable(error) is retryable
+
+def test_full_jitter_bounds():
+    policy = RetryPolicy(base_delay=2.0, max_delay=10.0, rng=random.Random(1))
+    for attempt, cap in [(0, 2.0), (1, 4.0), (2, 8.0), (3, 10.0), (8, 10.0)]:
+        delays = [policy.compute_delay(attempt, APIError("x", 503)) for _ in range(500)]
+        assert all(0.0 <= delay <= cap for delay in delays)
+        assert max(delays) > cap * 0.9
+        assert min(delays) < cap * 0.1
+
+def test_server_hint_is_not_capped_by_max_delay():
+    policy = RetryPolicy(max_delay=60.0)
+    assert policy.compute_delay(0, APIError("x", 429, retry_after=120.0)) == 120.0
+    assert policy.compute_delay(0, APIError("x", 429, retry_after=0.5)) == 0.5
+
+def _failing(errors):
+    calls = []
+
+    def func():
+        calls.append(1)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return "ok"
+    return func, calls
+
+def test_retries_until_success(monkeypatch):
+    monkeypatch.setattr("core.retry.time.sleep", lambda delay: None)
+    policy = RetryPolicy(max_retries=3, base_delay=0.01)
+    func, calls = _failing([APIError("x", 503), APIError("x", 429, retry_after=0.2)])
+    assert policy.call(func) == "ok"
+    assert len(calls) == 3
+    metrics = policy.metrics.snapshot()
+    assert (metrics["retries"], metrics["rate_limited"]) == (2, 1)
+    assert metrics["total_wait"] >= 0.2
+
+def test_fatal_error_is_not_retried():
+    policy = RetryPolicy(max_retries=3)
+    func, calls = _failing([APIError("x", 401)])
+    with pytest.raises(APIError):
+        policy.call(func)
+    assert len(calls) == 1
+    assert policy.metrics.snapshot()["fatal_errors"] == 1
+
+def test_max_retries_exhausted(monkeypatch):
+    monkeypatch.setattr("core.retry.time.sleep", lambda delay: None)
+    policy = RetryPolicy(max_retries=2, base_delay=0.01)
+    func, calls = _failing([APIError("x", 503)] * 5)
+    with pytest.raises(APIError):
+        policy.call(func)
+    assert len(calls) == 3
+    assert policy.metrics.snapshot()["exhausted"] == 1
+
+def test_hint_beyond_budget_gives_up_without_waiting(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr("core.retry.time.sleep", sleeps.append)
+    policy = RetryPolicy(max_retries=5, max_delay=60.0, total_budget=300.0)
+    func, calls = _failing([APIError("x", 429, retry_after=600.0)])
+    with pytest.raises(APIError):
+        policy.call(func)
+    assert len(calls) == 1
+    assert sleeps == []
+    assert policy.metrics.snapshot()["exhausted"] == 1
+
+def test_hint_within_budget_is_waited_in_full(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr("core.retry.time.sleep", sleeps.append)
+    policy = RetryPolicy(max_retries=5, max_delay=60.0, total_budget=300.0)
+    func, _ = _failing([APIError("x", 429, retry_after=120.0)])
+    assert policy.call(func) == "ok"
+    assert sleeps == [120.0]
+
+def test_async_retries():
+    policy = RetryPolicy(max_retries=2, base_delay=0.01)
+    calls = []
+
+    async def func():
+        calls.append(1)
+        if len(calls) < 3:
+            raise APIError("x", 502)
+        return "ok"
+
+    assert asyncio.run(policy.call_async(func)) == "ok"
+    assert len(calls) == 3
+
+def test_analyzer_reports_retries_and_throttling_per_run():
+    """Повторы и снижения лимита прошлых прогонов не попадают в отчет следующего"""
+    with MockOpenRouterServer(MockSettings(seed=1)) as server:
+        analyzer = OpenRouterAnalyzer("mock-key", models_cache_path=None, base_url=server.url)
+        # Счетчики предыдущего прогона того же анализатора
+        analyzer.retry_policy.metrics.record(calls=5, retries=4, rate_limited=3, total_wait=12.0)
+        analyzer.limiter.release(analyzer.limiter.acquire(), overloaded=True, status_code=429)
+        result = analyzer.analyze_transcripts([make_transcript(0, 10)])
+    assert result.run_metadata['retries']['retries'] == 0
+    assert result.run_metadata['retries']['total_wait'] == 0
+    assert result.run_metadata['retries']['calls'] > 0
+    concurrency = result.run_metadata['concurrency']
+    assert (concurrency['throttle_events'], concurrency['rate_limited']) == (0, 0)
+    assert concurrency['peak_in_flight'] >= 1
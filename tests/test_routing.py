@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты маршрутизации этапов и каскада (core/routing.py)
+"""
+
+import json
+
+import pytest
+
+from core.routing import (ModelRouter, StageRoute, parse_routes, cascade_verdict, summarize_cascade_stats,
+                          MIN_CHUNK_SUMMARY_CHARS)
+
+MODELS = {
+    "main": {"context_length": 200000, "pricing": {"prompt": "0.000003", "completion": "0.000015"}},
+    "cheap": {"context_length": 16000, "pricing": {"prompt": "0.0000002", "completion": "0.000001"},
+              "top_provider": {"max_completion_tokens": 4096}},
+    "mid": {"context_length": 128000, "pricing": {"prompt": "0.000001", "completion": "0.000005"}},
+}
+
+def _router(table, candidates=None, max_tokens=8192):
+    return ModelRouter(parse_routes(table), "main", max_tokens, 0.1,
+                       lambda model: MODELS.get(model, {"error": "нет модели"}), candidates=candidates)
+
+def test_parse_routes():
+    routes = parse_routes({"chunk": "cheap", "pains": {"model": "mid", "max_tokens": 2048, "cascade": True}})
+    assert routes["chunk"] == StageRoute(model="cheap")
+    assert routes["pains"].max_tokens == 2048 and routes["pains"].cascade
+    assert parse_routes(None) == {}
+    with pytest.raises(ValueError, match="modle"):
+        parse_routes({"chunk": {"modle": "cheap"}})
+
+def test_default_route_and_fallback():
+    router = _router({"chunk": {"model": "cheap", "temperature": 0.0}, "*": {"model": "mid"}})
+    decision = router.resolve("chunk", 1000)
+    assert (decision.model, decision.temperature) == ("cheap", 0.0)
+    # max_tokens маршрута по умолчанию ограничен max_completion_tokens модели
+    assert decision.max_tokens == 4096
+    assert router.resolve("pains", 1000).model == "mid"
+    assert _router({}).resolve("pains", 1000).model == "main"
+
+def test_model_without_room_falls_back_to_main():
+    router = _router({"chunk": {"model": "cheap", "max_tokens": 2000}})
+    assert router.resolve("chunk", 10000).model == "cheap"
+    assert router.resolve("chunk", 15000).model == "main"
+
+def test_auto_picks_cheapest_that_fits():
+    router = _router({"*": {"model": "auto", "max_tokens": 2000}}, candidates=["mid", "cheap", "unknown"])
+    assert router.resolve("pains", 1000).model == "cheap"
+    assert router.resolve("pains", 50000).model == "mid"
+    assert router.resolve("pains", 500000).model == "main"
+
+def test_cascade_and_escalation():
+    router = _router({"pains": {"model": "cheap", "max_tokens": 2000, "cascade": True, "timeout": 30}})
+    decision = router.resolve("pains", 1000)
+    assert (decision.model, decision.escalate_to, decision.timeout) == ("cheap", "main", 30)
+    escalated = router.escalate(decision)
+    assert (escalated.model, escalated.escalate_to, escalated.max_tokens) == ("main", None, 2000)
+    # Вызов исправления идет по маршруту этапа, но без каскада
+    repair = router.resolve("pains_repair", 1000)
+    assert (repair.model, repair.escalate_to) == ("cheap", None)
+
+def test_cascade_to_same_model_is_disabled():
+    router = _router({"pains": {"cascade": True}})
+    assert router.resolve("pains", 1000).escalate_to is None
+
+def test_models_and_context_length():
+    router = _router({"chunk": "cheap", "pains": {"model": "auto"}, "quotes": {"escalate_to": "mid"}},
+                     candidates=["mid"])
+    assert router.models() == ["cheap", "main", "mid"]
+    assert router.context_length("chunk", 128000) == 16000
+    assert router.context_length("pains", 128000) == 128000
+    assert router.context_length("emotions", 64000) == 64000
+
+def _pains(pain_points, needs):
+    return json.dumps({"pain_points": pain_points, "needs": needs}, ensure_ascii=False)
+
+@pytest.mark.parametrize("stage, content, finish_reason, verdict", [
+    ("pains", _pains([{"pain": "долго"}], [{"need": "быстрее"}]), "stop", None),
+    ("pains", _pains([{"pain": "долго"}], [{"need": "быстрее"}]), "length", "truncated"),
+    ("pains", "не JSON", "stop", "invalid_failed"),
+    ("pains", '{"pain_points": "строка", "needs": []}', "stop", "invalid_partial"),
+    ("pains", '{"pain_points": [{"pain": "долго"}]}', "stop", "missing_fields"),
+    ("pains", _pains([], []), "stop", "low_confidence"),
+    ("chunk", "коротко", "stop", "short"),
+    ("chunk", "х" * MIN_CHUNK_SUMMARY_CHARS, "stop", None),
+])
+def test_cascade_verdict(stage, content, finish_reason, verdict):
+    assert cascade_verdict(stage, content, finish_reason) == verdict
+
+def test_cascade_stats():
+    stats = summarize_cascade_stats({
+        "chunk": {"attempts": 4, "escalated": 1, "reason:short": 1},
+        "pains": {"attempts": 4, "escalated": 2, "reason:low_confidence": 2},
+    })
+    assert stats["escalation_rate"] == 0.375
+    assert stats["reasons"] == {"low_confidence": 2, "short": 1}
+    assert stats["by_stage"]["chunk"]["escalation_rate"] == 0.25
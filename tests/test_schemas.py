@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты схем ответов этапов (core/schemas.py) и формы профиля респондента
+"""
+
+import pytest
+
+from core.analyzer import OpenRouterAnalyzer, PROFILE_LIST_FIELDS
+from core.schemas import stage_schema
+
+@pytest.fixture
+def analyzer():
+    return OpenRouterAnalyzer("mock-key", models_cache_path=None)
+
+@pytest.mark.parametrize("stage", ["profile", "fused"])
+def test_profile_list_fields_are_arrays(stage):
+    profile = stage_schema(stage)["properties"]["respondent_profile"]["properties"]
+    for key in PROFILE_LIST_FIELDS:
+        assert profile[key] == {"type": "array", "items": {"type": "string"}}
+
+def test_prompts_ask_for_profile_lists(analyzer):
+    staged = analyzer._build_profile_prompt("саммари", 1)
+    fused = analyzer._build_fused_prompt("саммари", 1)
+    for key in PROFILE_LIST_FIELDS:
+        assert f'"{key}": [' in staged
+        assert f'"{key}": [' in fused
+
+def test_string_profile_fields_become_lists():
+    profile = OpenRouterAnalyzer._normalize_profile({
+        "archetype": "Прагматик", "motivations": "Экономия времени", "unique_traits": "  "
+    })
+    assert profile == {"archetype": "Прагматик", "motivations": ["Экономия времени"], "unique_traits": []}
+    assert OpenRouterAnalyzer._normalize_profile(None) == {}
+    assert OpenRouterAnalyzer._normalize_profile({"motivations": ["a"]}) == {"motivations": ["a"]}
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты разбора потоковых ответов (core/streaming.py)
+"""
+
+import pytest
+
+from core.openrouter_client import OpenRouterClient
+from core.retry import APIError, RetryPolicy
+from core.streaming import parse_sse_line, StreamAccumulator, StreamItemSink, IncrementalJSONParser
+from tools.mock_openrouter import MockOpenRouterServer, MockSettings
+
+def _event(content=None, finish_reason=None, usage=None, model="m"):
+    delta = {} if content is None else {"content": content}
+    event = {"id": "x", "model": model, "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+    if usage is not None:
+        event["usage"] = usage
+    return event
+
+@pytest.mark.parametrize("line, expected", [
+    ('data: {"a": 1}', {"a": 1}),
+    ('data:{"a": "ё"}', {"a": "ё"}),
+    ("data: [DONE]", None),
+    ("data:  [DONE]  ", None),
+    (": OPENROUTER PROCESSING", None),
+    (":", None),
+    ("", None),
+    ("event: message", None),
+    ("id: 5", None),
+    ("data:", None),
+    ('data: {"a": ', None),
+])
+def test_parse_sse_line(line, expected):
+    assert parse_sse_line(line) == expected
+
+def test_accumulator_joins_split_chunks():
+    accumulator = StreamAccumulator(started=0.0)
+    text = '{"pain_points": ["Долго ждать курьера"]}'
+    deltas = [accumulator.add_event(_event(text[i:i + 3])) for i in range(0, len(text), 3)]
+    assert "".join(deltas) == text
+    assert accumulator.content == text
+    assert accumulator.length == len(text)
+    assert accumulator.ttft is not None and accumulator.ttft > 0
+
+def test_accumulator_usage_and_finish_reason_from_last_event():
+    accumulator = StreamAccumulator()
+    assert accumulator.ttft is None
+    accumulator.add_event(_event(""))
+    assert accumulator.first_token_at is None
+    accumulator.add_event(_event("Ответ", model="anthropic/claude-3.5-sonnet"))
+    assert accumulator.finish_reason == ""
+    usage = {"prompt_tokens": 12, "completion_tokens": 3, "total_tokens": 15}
+    assert accumulator.add_event(_event(finish_reason="length", usage=usage, model="")) == ""
+    assert (accumulator.finish_reason, accumulator.usage) == ("length", usage)
+    assert accumulator.to_result() == {
+        "model": "anthropic/claude-3.5-sonnet",
+        "choices": [{"message": {"role": "assistant", "content": "Ответ"}, "finish_reason": "length"}],
+        "usage": usage,
+    }
+
+def test_accumulator_without_usage():
+    accumulator = StreamAccumulator()
+    accumulator.add_event(_event("текст", finish_reason="stop"))
+    assert "usage" not in accumulator.to_result()
+    assert accumulator.finish_reason == "stop"
+
+def test_error_event_is_retryable():
+    accumulator = StreamAccumulator()
+    with pytest.raises(APIError) as error:
+        accumulator.add_event({"error": {"message": "Provider disconnected", "code": 502}})
+    assert (error.value.status_code, error.value.retryable) == (502, True)
+
+def test_incremental_parser_emits_items_before_end():
+    items = []
+    parser = IncrementalJSONParser(lambda key, item: items.append((key, item)))
+    text = '```json\n{"pain_points": [{"pain": "a]b"}, {"pain": "c\\"}"}], "needs": ["x", 2]}\n```'
+    parser.feed(text[:text.index("},")])
+    assert items == []
+    # Элемент передается, как только закрыт, а не в конце ответа
+    parser.feed(text[text.index("},"):text.index("}]")])
+    assert items == [("pain_points", {"pain": "a]b"})]
+    for ch in text[text.index("}]"):]:
+        parser.feed(ch)
+    assert items == [("pain_points", {"pain": "a]b"}), ("pain_points", {"pain": 'c"}'}),
+                     ("needs", "x"), ("needs", 2)]
+    assert parser.done and parser.failed_items == 0
+
+def test_sink_restarted_stream_does_not_repeat_items():
+    emitted = []
+    sink = StreamItemSink(lambda key, item: emitted.append(item))
+    sink('{"needs": ["a", "b", ', 0)
+    # Повтор после обрыва: поток начинается заново
+    sink('{"needs": ["a", "b", "c"]}', 0)
+    assert emitted == ["a", "b", "c"]
+
+def test_stream_through_mock_server():
+    """Сквозной поток: фрагменты по 3 символа кириллицы, комментарий, usage и [DONE]"""
+    deltas = []
+    with MockOpenRouterServer(MockSettings(stream_chunk_chars=3, seed=1)) as server:
+        client = OpenRouterClient("mock-key", models_cache_path=None, base_url=server.url,
+                                  retry_policy=RetryPolicy(max_retries=0))
+        result = client.generate_completion_stream("Проанализируй фрагмент интервью", 500,
+                                                   on_delta=lambda delta, offset: deltas.append((offset, delta)))
+    assert result.content and "".join(delta for _, delta in deltas) == result.content
+    assert [offset for offset, _ in deltas] == [sum(len(d) for _, d in deltas[:i]) for i in range(len(deltas))]
+    assert len(deltas) > 1
+    assert result.finish_reason == "stop"
+    assert result.completion_tokens > 0 and not result.usage_estimated
+    assert result.ttft is not None
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Нагрузочный тест анализатора против локального заменителя OpenRouter API
+
+Прогоняет полный конвейер OpenRouterAnalyzer на синтетических интервью
+разного объема и печатает пропускную способность, перцентили задержки по
+этапам и пиковое потребление памяти.
+
+Запуск:
+    python -m tools.load_test --sizes 10,100,1000 --engine async --latency lognormal:0.8:0.5
+"""
+
+import sys
+import os
+import io
+import json
+import time
+import random
+import asyncio
+import argparse
+import tracemalloc
+import contextlib
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.analyzer import OpenRouterAnalyzer
+from tools.mock_openrouter import MockOpenRouterServer, MockSettings
+
+# Этапы, которые --cheap-model переводит на дешевую модель: чанки и извлечение по интервью
+CHEAP_STAGES = ("chunk", "profile", "pains", "emotions", "quotes", "business", "brief", "fused")
+
+try:
+    import resource
+except ImportError:  # resource есть только на Unix
+    resource = None
+
+_TOPICS = [
+    "Обычно я заказываю еду вечером после работы, когда нет сил готовить",
+    "Меню загружается очень долго, особенно когда плохой интернет в метро",
+    "Мне важно видеть реальное время доставки, а не обещания приложения",
+    "Я часто повторяю один и тот же заказ, но каждый раз собираю корзину заново",
+    "Отзывам я не очень доверяю, потому что их явно накручивают",
+    "Промокоды сложно применить, они постоянно слетают при оформлении",
+    "Когда курьер опаздывает, поддержка отвечает шаблонами и ничего не решает",
+    "Я бы платил за подписку, если бы доставка была бесплатной и быстрой"
+]
+
+def make_transcript(index: int, turns: int = 40, rng: Optional[random.Random] = None) -> str:
+    """Синтетический транскрипт интервью с чередованием реплик"""
+    rng = rng or random.Random(index)
+    lines = [f"Интервью {index + 1}"]
+    for turn in range(turns):
+        lines.append(f"Интервьюер: Расскажите подробнее, вопрос {turn + 1}?")
+        answer = ". ".join(rng.sample(_TOPICS, 3))
+        lines.append(f"Респондент: {answer}. Вот как это выглядит у меня на практике.")
+    return "\n".join(lines)
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    """p50/p95/p99 в секундах"""
+    if not values:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0}
+    p50, p95, p99 = np.percentile(np.asarray(values, dtype=float), [50, 95, 99])
+    return {"p50": round(float(p50), 3), "p95": round(float(p95), 3), "p99": round(float(p99), 3)}
+
+def _max_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    # ru_maxrss в килобайтах на Linux и в байтах на macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def run_once(server: MockOpenRouterServer, size: int, engine: str, mode: str,
+             max_workers: int, max_concurrent: int, max_in_flight: int, quiet: bool,
+             streaming: bool = False, turns: int = 40,
+             stage_routes: Optional[Dict[str, Any]] = None,
+             adaptive_concurrency: bool = True) -> Dict[str, Any]:
+    """Один прогон анализа на size интервью"""
+    transcripts = [make_transcript(i, turns) for i in range(size)]
+    analyzer = OpenRouterAnalyzer(
+        "mock-key", max_workers=max_workers, max_concurrent_requests=max_concurrent,
+        async_max_in_flight=max_in_flight, retry_delay=0.1, retry_max_delay=2.0,
+        response_cache=None, models_cache_path=None, extraction_mode=mode, base_url=server.url,
+        streaming=streaming, stage_routes=stage_routes, adaptive_concurrency=adaptive_concurrency
+    )
+
+    before = server.stats.snapshot()["requests"]
+    tracemalloc.start()
+    started = time.perf_counter()
+    output = io.StringIO() if quiet else None
+    with contextlib.redirect_stdout(output) if quiet else contextlib.nullcontext():
+        if engine == "async":
+            result = asyncio.run(analyzer.analyze_transcripts_async(transcripts))
+        elif engine == "parallel":
+            result = analyzer.analyze_transcripts_parallel(transcripts)
+        else:
+            result = analyzer.analyze_transcripts(transcripts)
+    elapsed = time.perf_counter() - started
+    _, peak_traced = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    analyzer.client.close()
+
+    by_stage: Dict[str, List[float]] = {}
+    for entry in result.usage_ledger:
+        by_stage.setdefault(entry["stage"], []).append(entry["latency"])
+
+    http_requests = server.stats.snapshot()["requests"] - before
+    return {
+        "size": size,
+        "engine": engine,
+        "mode": mode,
+        "streaming": streaming,
+        "elapsed": round(elapsed, 2),
+        "api_calls": result.api_calls,
+        "chunk_calls_per_interview": round(len(by_stage.get("chunk", [])) / size, 2) if size else 0.0,
+        "http_requests": http_requests,
+        "cost": round(result.total_cost, 6),
+        "cost_by_model": {model: usage["cost"] for model, usage in result.token_usage["by_model"].items()},
+        "escalation_rate": result.run_metadata.get("routing", {}).get("cascade", {}).get("escalation_rate", 0.0),
+        "json_failure_rate": result.run_metadata.get("json_parsing", {}).get("failure_rate", 0.0),
+        "repair_success_rate": result.run_metadata.get("repairs", {}).get("success_rate", 0.0),
+        "repair_tokens_saved": result.run_metadata.get("repairs", {}).get("tokens_saved", 0),
+        "retries": analyzer.client.get_retry_stats()["retries"],
+        "concurrency": analyzer.client.get_concurrency_stats(),
+        "http_pool": result.run_metadata.get("http_pool", {}),
+        "interviews_per_sec": round(size / elapsed, 2) if elapsed else 0.0,
+        "calls_per_sec": round(result.api_calls / elapsed, 2) if elapsed else 0.0,
+        "latency": percentiles([lat for values in by_stage.values() for lat in values]),
+        "latency_by_stage": {stage: percentiles(values) for stage, values in sorted(by_stage.items())},
+        "ttft": percentiles([e["ttft"] for e in result.usage_ledger if e.get("ttft") is not None]),
+        "peak_traced_mb": round(peak_traced / (1024 * 1024), 1),
+        "max_rss_mb": _max_rss_mb()
+    }
+
+def print_report(report: Dict[str, Any]):
+    """Вывод результатов одного прогона"""
+    print(f"\n📊 {report['size']} интервью ({report['engine']}, {report['mode']}): {report['elapsed']}с")
+    print(f"   Пропускная способность: {report['interviews_per_sec']} интервью/с, "
+          f"{report['calls_per_sec']} вызовов/с")
+    print(f"   API вызовов: {report['api_calls']}, HTTP запросов: {report['http_requests']}, "
+          f"чанков на интервью: {report['chunk_calls_per_interview']}, "
+          f"не разобрано JSON: {report['json_failure_rate']:.1%}, "
+          f"исправлено: {report['repair_success_rate']:.1%} (~{report['repair_tokens_saved']} токенов сэкономлено)")
+    print(f"   Стоимость: ${report['cost']:.4f} ("
+          + ", ".join(f"{model}: ${cost:.4f}" for model, cost in report["cost_by_model"].items())
+          + f"), эскалаций каскада: {report['escalation_rate']:.1%}")
+    concurrency = report["concurrency"]
+    if concurrency:
+        print(f"   Лимит запросов: {concurrency['limit']} (от {concurrency['lowest_limit']} "
+              f"до {concurrency['highest_limit']}), снижений: {concurrency['throttle_events']}, "
+              f"пик в полете: {concurrency['peak_in_flight']}, пик очереди: {concurrency['peak_queue_depth']}, "
+              f"повторов: {report['retries']}")
+    pool = report["http_pool"]
+    if pool:
+        print(f"   Соединения: открыто {pool['connections_opened']} на {pool['pool_requests']} запросов, "
+              f"переиспользование {pool['reuse_ratio']:.0%}")
+    lat = report["latency"]
+    print(f"   Задержка: p50 {lat['p50']}с, p95 {lat['p95']}с, p99 {lat['p99']}с")
+    for stage, values in report["latency_by_stage"].items():
+        print(f"     {stage:<15} p50 {values['p50']:>6}с  p95 {values['p95']:>6}с  p99 {values['p99']:>6}с")
+    if report["streaming"]:
+        ttft = report["ttft"]
+        print(f"   TTFT: p50 {ttft['p50']}с, p95 {ttft['p95']}с, p99 {ttft['p99']}с")
+    print(f"   Память: пик Python {report['peak_traced_mb']} МБ, RSS {report['max_rss_mb']} МБ")
+
+def main():
+    """Запуск нагрузочного теста из командной строки"""
+    parser = argparse.ArgumentParser(description="Нагрузочный тест UX Analyzer")
+    parser.add_argument("--sizes", default="10,100,1000", help="Размеры прогонов через запятую")
+    parser.add_argument("--engine", choices=["sequential", "parallel", "async"], default="async")
+    parser.add_argument("--mode", choices=["staged", "fused"], default="staged")
+    parser.add_argument("--streaming", action="store_true", help="Потоковые ответы (SSE)")
+    parser.add_argument("--turns", type=int, default=40, help="Пар реплик в синтетическом интервью")
+    parser.add_argument("--latency", default="lognormal:0.8:0.5", help="Распределение задержки заменителя")
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--rate-5xx", type=float, default=0.0)
+    parser.add_argument("--rate-truncated", type=float, default=0.0, help="Доля ответов, обрезанных по max_tokens")
+    parser.add_argument("--rate-invalid", type=float, default=0.0, help="Доля ответов с невалидным JSON")
+    parser.add_argument("--rate-weak", type=float, default=0.0, help="Доля пустых ответов дешевой модели")
+    parser.add_argument("--cheap-model", default=None,
+                        help="Модель для чанков и этапов извлечения (например, anthropic/claude-3-haiku)")
+    parser.add_argument("--cascade", action="store_true", help="Эскалация слабых ответов дешевой модели")
+    parser.add_argument("--capacity", type=int, default=None,
+                        help="Емкость заменителя: сверх стольких запросов в обработке - 429")
+    parser.add_argument("--fixed-concurrency", action="store_true",
+                        help="Без адаптивного лимита запросов (для сравнения)")
+    parser.add_argument("--max-workers", type=int, default=8)
+    parser.add_argument("--max-concurrent", type=int, default=32)
+    parser.add_argument("--max-in-flight", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", dest="json_path", default=None, help="Сохранить результаты в JSON")
+    parser.add_argument("--verbose", action="store_true", help="Показывать вывод анализатора")
+    args = parser.parse_args()
+
+    settings = MockSettings(latency=args.latency, rate_429=args.rate_429, rate_5xx=args.rate_5xx,
+                            rate_truncated=args.rate_truncated, rate_invalid=args.rate_invalid,
+                            rate_weak=args.rate_weak, capacity=args.capacity, retry_after=0.2, seed=args.seed)
+    stage_routes = None
+    if args.cheap_model:
+        stage_routes = {stage: {"model": args.cheap_model, "cascade": args.cascade} for stage in CHEAP_STAGES}
+    reports = []
+    with MockOpenRouterServer(settings) as server:
+        print(f"🧪 Mock OpenRouter: {server.url} (задержка {settings.latency})")
+        for size in [int(s) for s in args.sizes.split(",") if s.strip()]:
+            report = run_once(server, size, args.engine, args.mode, args.max_workers,
+                              args.max_concurrent, args.max_in_flight, quiet=not args.verbose,
+                              streaming=args.streaming, turns=args.turns, stage_routes=stage_routes,
+                              adaptive_concurrency=not args.fixed_concurrency)
+            print_report(report)
+            reports.append(report)
+        mock_stats = server.stats.snapshot()
+
+    print(f"\n🧪 Заменитель: {mock_stats['requests']} запросов, пик одновременных {mock_stats['peak_in_flight']}, "
+          f"429: {mock_stats['injected_429']} + {mock_stats['over_capacity']} сверх емкости, "
+          f"5xx: {mock_stats['injected_5xx']}")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"runs": reports, "mock": mock_stats}, f, ensure_ascii=False, indent=2)
+        print(f"💾 Результаты сохранены: {args.json_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,580 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Локальный заменитель OpenRouter API для нагрузочного тестирования
+
+Поддерживает /chat/completions (обычный и потоковый SSE режим), /models и /key.
+Ответы - валидный JSON для каждого этапа анализатора, задержка берется из
+настраиваемого распределения, ошибки 429/5xx, обрезанные по max_tokens и
+невалидные ответы внедряются с заданной частотой.
+
+Запуск:
+    python -m tools.mock_openrouter --port 8765 --latency lognormal:0.8:0.5 --rate-429 0.05
+"""
+
+import sys
+import os
+import re
+import json
+import gzip
+import math
+import time
+import random
+import argparse
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Tuple
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.tokens import estimate_tokens
+
+# Маркеры этапов в промптах core/analyzer.py (порядок важен: первый найденный)
+STAGE_MARKERS: List[Tuple[str, str]] = [
+    ("fused", "Проведи ПОЛНЫЙ анализ интервью"),
+    ("chunk", "Проанализируй фрагмент интервью"),
+    ("profile", "Проанализируй профиль респондента"),
+    ("pains", "Найди ВСЕ боли"),
+    ("emotions", "Проанализируй эмоциональный опыт"),
+    ("quotes", "Найди самые важные цитаты"),
+    ("business", "Проанализируй бизнес-влияние"),
+    ("brief", "относящиеся к целям и вопросам брифа"),
+    ("cross_merge", "Обнови кросс-анализ"),
+    ("cross_reduce", "Объедини частичные кросс-анализы"),
+    ("cross_analysis", "кросс-анализ"),
+    ("final_findings", "Синтезируй ВСЕ данные"),
+]
+
+_QUOTE = ("Каждый раз, когда я открываю приложение вечером после работы, мне приходится заново искать "
+          "любимый ресторан, выбирать те же блюда и ждать, пока загрузится меню, и это занимает столько "
+          "времени, что иногда я просто закрываю приложение и звоню в ресторан напрямую")
+
+CANNED_RESPONSES: Dict[str, Any] = {
+    "chunk": (
+        "### РЕСПОНДЕНТ\nОфисный сотрудник, заказывает еду ежедневно.\n\n"
+        "### КЛЮЧЕВЫЕ ПРОБЛЕМЫ\n- Проблема: медленная загрузка меню\n"
+        f"- Цитата: \"{_QUOTE}\"\n- Контекст: вечерний заказ после работы\n\n"
+        "### ПОТРЕБНОСТИ И ЖЕЛАНИЯ\n- Явные потребности: быстрый повторный заказ\n\n"
+        "### ЭМОЦИОНАЛЬНЫЙ КОНТЕКСТ\n- Эмоциональные пики: раздражение при ожидании"
+    ),
+    "profile": {
+        "respondent_profile": {
+            "demographics": "30-35 лет", "occupation": "Офисный сотрудник", "experience_level": "Опытный",
+            "context": "Заказывает еду ежедневно", "tech_literacy": "Высокая",
+            "motivations": ["Экономия времени"], "archetype": "Прагматик",
+            "unique_traits": ["Заказывает одно и то же"]
+        },
+        "key_themes": [{
+            "theme": "Скорость заказа", "description": "Повторный заказ занимает слишком много шагов",
+            "frequency": "5 упоминаний", "importance": "Высокая", "quotes": [_QUOTE],
+            "emotional_tone": "Раздражение", "relevance_to_brief": "Отвечает на вопрос о болях"
+        }]
+    },
+    "pains": {
+        "pain_points": [{
+            "pain": "Медленная загрузка меню", "pain_type": "functional", "root_cause": "Тяжелые экраны",
+            "symptoms": ["Ожидание 10-15 секунд"], "context": "Вечерний заказ", "severity": "high",
+            "frequency": "Ежедневно", "impact": "Отказ от заказа", "current_solution": "Звонок в ресторан",
+            "ideal_solution": "Заказ в 2 клика", "quotes": [_QUOTE], "emotional_impact": "Раздражение",
+            "relevance_to_brief": "Ключевая боль"
+        }],
+        "needs": [{
+            "need": "Быстрый повторный заказ", "need_type": "functional", "job_to_be_done": "Поесть без усилий",
+            "current_satisfaction": "Низкая", "importance": "high", "triggers": ["Конец рабочего дня"],
+            "barriers": ["Много экранов"], "success_criteria": "Заказ меньше чем за минуту",
+            "quotes": [_QUOTE], "related_pains": ["Медленная загрузка меню"],
+            "relevance_to_brief": "Возможность для улучшения"
+        }]
+    },
+    "emotions": {
+        "emotional_journey": [{
+            "moment": "Ожидание загрузки меню", "trigger": "Долгая загрузка", "emotion": "Раздражение",
+            "emotion_family": "primary", "intensity": 7, "valence": "negative", "duration": "Несколько минут",
+            "body_language": "", "quote": _QUOTE, "coping": "Закрывает приложение", "impact": "Отказ от заказа",
+            "underlying_need": "Контроль над временем", "relevance_to_brief": "Эмоциональная боль"
+        }],
+        "insights": [{
+            "insight": "Пользователи воспринимают повторный заказ как рутину и ждут, что приложение запомнит выбор",
+            "insight_type": "behavioral", "confidence": "high", "evidence": ["Заказывает одно и то же"],
+            "contradiction": "", "hidden_motivation": "Экономия когнитивных усилий",
+            "design_opportunity": "Кнопка повторного заказа", "business_impact": "Рост частоты заказов",
+            "quotes": [_QUOTE], "relevance_to_brief": "Отвечает на вопрос о мотивации"
+        }],
+        "sentiment_score": -0.3
+    },
+    "quotes": {
+        "quotes": [{
+            "text": _QUOTE, "context": "Рассказ о вечернем заказе", "significance": "Показывает цену ожидания",
+            "reveals": {"about_user": "Ценит время", "about_product": "Медленный", "about_market": "Низкая лояльность"},
+            "emotions": ["Раздражение"], "keywords": ["загрузка", "меню"], "quote_type": "pain",
+            "relevance_to_questions": "Какие боли испытывают пользователи?"
+        }],
+        "contradictions": [{
+            "contradiction_type": "behavioral", "severity": "medium",
+            "statement_1": {"text": "В целом удобно", "context": "Начало интервью"},
+            "statement_2": {"text": "Иногда просто закрываю приложение", "context": "Рассказ о заказе"},
+            "analysis": {"nature": "Привычка против фрустрации", "possible_reasons": ["Нет альтернатив"]},
+            "full_quotes": [_QUOTE]
+        }]
+    },
+    "business": {
+        "business_pains": [{
+            "pain": "Потеря заказов", "source": "Медленная загрузка меню",
+            "impact": {"revenue": "Упущенные заказы", "costs": "", "efficiency": ""},
+            "urgency": "high", "quotes": [_QUOTE]
+        }],
+        "user_problems": [{
+            "problem": "Долгий повторный заказ", "frequency": "Ежедневно", "severity": "major",
+            "workaround": "Звонок в ресторан", "quotes": [_QUOTE]
+        }],
+        "opportunities": [{
+            "opportunity": "Повторный заказ в один клик", "opportunity_type": "quick_win",
+            "based_on_problems": ["Долгий повторный заказ"], "value_proposition": "Экономия времени",
+            "quotes": [_QUOTE]
+        }]
+    },
+    "brief": {
+        "goal_related_findings": [{
+            "goal": "Понять основные проблемы пользователей",
+            "findings": [{"finding": "Медленная загрузка меню", "quote": _QUOTE, "relevance": "Прямая"}]
+        }],
+        "question_related_findings": [{
+            "question": "Какие боли испытывают пользователи?",
+            "answers": [{"answer": "Долгий повторный заказ", "quote": _QUOTE, "confidence": "high"}]
+        }]
+    },
+    "cross_analysis": {
+        "common_patterns": [{
+            "pattern": "Пользователи повторяют один и тот же заказ и раздражаются из-за лишних шагов",
+            "pattern_type": "behavioral", "frequency": "3 из 3 респондентов (100%)", "confidence": "high",
+            "evidence": ["Повторные заказы"], "quotes": [_QUOTE], "underlying_need": "Экономия времени",
+            "design_implication": "Быстрый повторный заказ",
+            "relevance_to_brief": {"goals": ["Понять проблемы"], "questions": ["Какие боли?"]}
+        }],
+        "consensus_points": [{
+            "point": "Загрузка меню слишком медленная", "agreement_level": "100% (3 из 3)",
+            "quotes_sample": [_QUOTE], "implication": "Оптимизировать загрузку"
+        }],
+        "divergence_points": [{
+            "topic": "Отношение к отзывам",
+            "positions": [{"position": "Отзывам не доверяют", "holders": [2], "quote": _QUOTE}]
+        }]
+    },
+    "final_findings": {
+        "executive_summary": "Главная проблема пользователей - долгий повторный заказ и медленная загрузка меню.",
+        "key_insights": [{
+            "insight_id": "KI001", "problem_title": "Долгий повторный заказ",
+            "problem_statement": "Когда пользователь хочет повторить заказ, он проходит все экраны заново",
+            "problem_description": "Повторный заказ требует 5-6 экранов и ожидания загрузки меню",
+            "severity": "high", "affected_percentage": "100% (3 из 3)",
+            "business_impact": {"metric": "Конверсия", "current_impact": "Потери заказов",
+                                "potential_impact": "Рост частоты заказов"},
+            "root_cause": "Нет сценария повторного заказа", "evidence": ["Все респонденты"],
+            "quotes": [{"text": _QUOTE, "interview_id": 1, "context": "Вечерний заказ"}],
+            "opportunity": {"description": "Повторный заказ в один клик", "value_prop": "Экономия времени"},
+            "relevance_to_brief": {"addresses_goal": "Понять проблемы", "answers_question": "Какие боли?"},
+            "priority": "P0", "effort": "M"
+        }],
+        "strategic_recommendations": [{
+            "recommendation": "Добавить повторный заказ", "rationale": "Основная боль всех респондентов",
+            "expected_outcome": "Рост частоты заказов", "timeline": "1 квартал",
+            "success_metrics": ["Время заказа", "Частота заказов"]
+        }]
+    },
+}
+CANNED_RESPONSES["cross_merge"] = CANNED_RESPONSES["cross_analysis"]
+CANNED_RESPONSES["cross_reduce"] = CANNED_RESPONSES["cross_analysis"]
+CANNED_RESPONSES["fused"] = {
+    **CANNED_RESPONSES["profile"], **CANNED_RESPONSES["pains"], **CANNED_RESPONSES["emotions"],
+    **CANNED_RESPONSES["quotes"], **CANNED_RESPONSES["business"],
+    "brief_related_findings": CANNED_RESPONSES["brief"]
+}
+
+# Вызов исправления ответа этапа (core/repair.py): этап - в тексте промпта
+REPAIR_MARKER = re.compile(r'Исправь фрагмент JSON из ответа этапа анализа "(\w+)"')
+
+def detect_stage(prompt: str) -> str:
+    """Этап анализатора по тексту промпта"""
+    repair = REPAIR_MARKER.search(prompt)
+    if repair:
+        return f"{repair.group(1)}_repair"
+    for stage, marker in STAGE_MARKERS:
+        if marker in prompt:
+            return stage
+    return "unknown"
+
+def canned_response(stage: str) -> str:
+    """Готовый ответ для этапа (для исправления - исправленный ответ этапа)"""
+    response = CANNED_RESPONSES.get(stage[:-len("_repair")] if stage.endswith("_repair") else stage, {})
+    if isinstance(response, str):
+        return response
+    return json.dumps(response, ensure_ascii=False)
+
+def weak_response(content: str) -> str:
+    """Ответ слабой модели: JSON со всеми списками пустыми, текст - одной фразой"""
+    try:
+        data = json.loads(content)
+    except ValueError:
+        return content.split(".")[0] + "."
+    if not isinstance(data, dict):
+        return content
+    return json.dumps({key: [] if isinstance(value, list) else value for key, value in data.items()},
+                      ensure_ascii=False)
+
+def corrupt_response(content: str, roll: float) -> str:
+    """Невалидный ответ: висячая запятая или список, возвращенный строкой"""
+    try:
+        data = json.loads(content)
+    except ValueError:
+        return content
+    if not isinstance(data, dict):
+        return content
+    lists = [key for key, value in data.items() if isinstance(value, list)]
+    if roll < 0.5 or not lists:
+        body = json.dumps(data, ensure_ascii=False, indent=2)
+        return body[:body.rindex("]")] + ",\n  ]" + body[body.rindex("]") + 1:] if "]" in body else body
+    data[lists[0]] = "; ".join(json.dumps(item, ensure_ascii=False) for item in data[lists[0]])
+    return json.dumps(data, ensure_ascii=False)
+
+class LatencyModel:
+    """Распределение задержки ответа
+
+    Формат: fixed:SEC | uniform:MIN:MAX | normal:MEAN:STD | lognormal:MEDIAN:SIGMA
+    """
+
+    def __init__(self, spec: str = "fixed:0", seed: Optional[int] = None):
+        self.spec = spec
+        parts = spec.split(":")
+        self.kind = parts[0]
+        self.params = [float(p) for p in parts[1:]]
+        if self.kind not in ("fixed", "uniform", "normal", "lognormal"):
+            raise ValueError(f"Неизвестное распределение задержки: {spec}")
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        with self._lock:
+            if self.kind == "fixed":
+                return self.params[0] if self.params else 0.0
+            if self.kind == "uniform":
+                return self._rng.uniform(self.params[0], self.params[1])
+            if self.kind == "normal":
+                return max(0.0, self._rng.gauss(self.params[0], self.params[1]))
+            # lognormal: медиана и сигма логарифма
+            return self._rng.lognormvariate(math.log(max(self.params[0], 1e-6)), self.params[1])
+
+@dataclass
+class MockSettings:
+    """Настройки заменителя API"""
+    latency: str = "fixed:0.05"
+    rate_429: float = 0.0
+    rate_5xx: float = 0.0
+    rate_truncated: float = 0.0  # доля ответов, обрезанных по max_tokens (finish_reason "length")
+    rate_invalid: float = 0.0  # доля ответов с невалидным JSON
+    rate_weak: float = 0.0  # доля пустых ответов моделей с "mock_weak" (проверка каскада)
+    capacity: Optional[int] = None  # запросов в обработке, сверх которых отвечает 429 (None - без предела)
+    retry_after: float = 0.5
+    stream_chunk_chars: int = 40
+    seed: Optional[int] = None
+    models: List[Dict[str, Any]] = field(default_factory=lambda: [
+        {
+            "id": "anthropic/claude-3.5-sonnet", "name": "Claude 3.5 Sonnet (mock)",
+            "description": "Локальный заменитель", "context_length": 200000,
+            "pricing": {"prompt": "0.000003", "completion": "0.000015", "input_cache_read": "0.0000003"},
+            "supported_parameters": ["max_tokens", "temperature", "response_format", "structured_outputs"],
+            "top_provider": {"max_completion_tokens": 8192}
+        },
+        {
+            "id": "anthropic/claude-3-haiku", "name": "Claude 3 Haiku (mock)",
+            "description": "Дешевая модель", "context_length": 200000,
+            "pricing": {"prompt": "0.00000025", "completion": "0.00000125"},
+            "supported_parameters": ["max_tokens", "temperature"],
+            "top_provider": {"max_completion_tokens": 4096},
+            # Только для заменителя: задержка относительно --latency и слабые ответы (rate_weak)
+            "mock_latency_scale": 0.4, "mock_weak": True
+        }
+    ])
+
+class MockStats:
+    """Счетчики запросов к заменителю"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.by_stage: Dict[str, int] = {}
+        self.injected_429 = 0
+        self.injected_5xx = 0
+        self.structured = 0
+        self.rejected_structured = 0
+        self.injected_truncated = 0
+        self.injected_invalid = 0
+        self.continuations = 0
+        self.injected_weak = 0
+        self.over_capacity = 0
+        self.by_model: Dict[str, int] = {}
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def enter(self, stage: str, model: str = "") -> int:
+        """Учет запроса; результат - число запросов в обработке вместе с ним"""
+        with self._lock:
+            self.requests += 1
+            self.by_stage[stage] = self.by_stage.get(stage, 0) + 1
+            self.by_model[model] = self.by_model.get(model, 0) + 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            return self.in_flight
+
+    def leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def count(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "by_stage": dict(self.by_stage),
+                "by_model": dict(self.by_model),
+                "injected_429": self.injected_429,
+                "injected_5xx": self.injected_5xx,
+                "structured": self.structured,
+                "rejected_structured": self.rejected_structured,
+                "injected_truncated": self.injected_truncated,
+                "injected_invalid": self.injected_invalid,
+                "continuations": self.continuations,
+                "injected_weak": self.injected_weak,
+                "over_capacity": self.over_capacity,
+                "peak_in_flight": self.peak_in_flight
+            }
+
+class _MockHandler(BaseHTTPRequestHandler):
+    """HTTP обработчик (HTTP/1.1 keep-alive)"""
+    protocol_version = "HTTP/1.1"
+    server: "_MockHTTPServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, obj: Any, status: int = 200, headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.endswith("/models"):
+            self._send_json({"data": self.server.settings.models})
+        elif self.path.endswith("/key"):
+            self._send_json({"data": {"label": "mock", "usage": 0, "limit": None}})
+        else:
+            self._send_json({"error": {"message": "Not found"}}, 404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+
+        if not self.path.endswith("/chat/completions"):
+            self._send_json({"error": {"message": "Not found"}}, 404)
+            return
+
+        payload = json.loads(body.decode("utf-8"))
+        messages = payload.get("messages", [])
+        # Продолжение ответа: его начало передано сообщением ассистента (prefill)
+        prefill = messages[-1].get("content") if messages and messages[-1].get("role") == "assistant" else None
+        prompt = "\n".join(m.get("content", "") for m in messages
+                           if isinstance(m.get("content"), str) and m.get("role") != "assistant")
+        stage = detect_stage(prompt)
+        settings = self.server.settings
+        stats = self.server.stats
+
+        model = next((m for m in settings.models if m["id"] == payload.get("model")), None)
+        in_flight = stats.enter(stage, payload.get("model", ""))
+        try:
+            if settings.capacity is not None and in_flight > settings.capacity:
+                # Как у провайдера с лимитом одновременных запросов: 429 сверх емкости
+                stats.count("over_capacity")
+                self._send_json({"error": {"message": "Too many concurrent requests", "code": 429}}, 429,
+                                {"Retry-After": f"{settings.retry_after:g}"})
+                return
+
+            if payload.get("response_format") is not None:
+                if model is not None and "response_format" not in model.get("supported_parameters", []):
+                    # Как у провайдеров без структурированного вывода: 400 на неизвестный параметр
+                    stats.count("rejected_structured")
+                    self._send_json({"error": {"message": "response_format is not supported", "code": 400}}, 400)
+                    return
+                stats.count("structured")
+
+            roll = self.server.rng_uniform()
+            if roll < settings.rate_429:
+                stats.count("injected_429")
+                self._send_json({"error": {"message": "Rate limit exceeded", "code": 429}}, 429,
+                                {"Retry-After": f"{settings.retry_after:g}"})
+                return
+            if roll < settings.rate_429 + settings.rate_5xx:
+                stats.count("injected_5xx")
+                time.sleep(self.server.latency.sample() * 0.2)
+                self._send_json({"error": {"message": "Upstream error", "code": 502}}, 502)
+                return
+
+            content = canned_response(stage)
+            finish_reason = "stop"
+            if prefill is not None:
+                stats.count("continuations")
+                content = content[len(prefill):] if content.startswith(prefill) else content
+            elif not stage.endswith("_repair"):
+                roll = self.server.rng_uniform()
+                if roll < settings.rate_truncated:
+                    stats.count("injected_truncated")
+                    content, finish_reason = content[:len(content) // 2], "length"
+                elif roll < settings.rate_truncated + settings.rate_invalid:
+                    stats.count("injected_invalid")
+                    content = corrupt_response(content, self.server.rng_uniform())
+                elif model is not None and model.get("mock_weak") and self.server.rng_uniform() < settings.rate_weak:
+                    stats.count("injected_weak")
+                    content = weak_response(content)
+            # Как у провайдера: ответ длиннее max_tokens обрезается
+            limit = payload.get("max_tokens")
+            if limit and estimate_tokens(content) > limit:
+                content, finish_reason = content[:len(content) * limit // estimate_tokens(content)], "length"
+            usage = {
+                "prompt_tokens": estimate_tokens(prompt),
+                "completion_tokens": estimate_tokens(content),
+                "prompt_tokens_details": {"cached_tokens": 0}
+            }
+            delay = self.server.latency.sample() * (model or {}).get("mock_latency_scale", 1.0)
+            if payload.get("stream"):
+                self._stream(payload, content, usage, delay, finish_reason)
+            else:
+                time.sleep(delay)
+                self._send_json({
+                    "id": "mock-completion",
+                    "model": payload.get("model", ""),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                                 "finish_reason": finish_reason}],
+                    "usage": usage
+                })
+        finally:
+            stats.leave()
+
+    def _stream(self, payload: Dict[str, Any], content: str, usage: Dict[str, Any], delay: float,
+                finish_reason: str = "stop"):
+        """Ответ в формате SSE: первые токены после 20% задержки, остальное равномерно"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        size = max(1, self.server.settings.stream_chunk_chars)
+        pieces = [content[i:i + size] for i in range(0, len(content), size)] or [""]
+        time.sleep(delay * 0.2)
+        step = delay * 0.8 / len(pieces)
+
+        def send(obj: Dict[str, Any]):
+            self.wfile.write(f"data: {json.dumps(obj, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        self.wfile.write(b": OPENROUTER PROCESSING\n\n")
+        for piece in pieces:
+            send({"id": "mock-completion", "model": payload.get("model", ""),
+                  "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]})
+            time.sleep(step)
+        send({"id": "mock-completion", "model": payload.get("model", ""),
+              "choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}], "usage": usage})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+class _MockHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, address, settings: MockSettings):
+        super().__init__(address, _MockHandler)
+        self.settings = settings
+        self.stats = MockStats()
+        self.latency = LatencyModel(settings.latency, settings.seed)
+        self._rng = random.Random(settings.seed)
+        self._rng_lock = threading.Lock()
+
+    def rng_uniform(self) -> float:
+        with self._rng_lock:
+            return self._rng.random()
+
+class MockOpenRouterServer:
+    """Заменитель OpenRouter API в фоновом потоке"""
+
+    def __init__(self, settings: Optional[MockSettings] = None, host: str = "127.0.0.1", port: int = 0):
+        self.settings = settings or MockSettings()
+        self._server = _MockHTTPServer((host, port), self.settings)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """base_url для OpenRouterClient"""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api/v1"
+
+    @property
+    def stats(self) -> MockStats:
+        return self._server.stats
+
+    def start(self) -> "MockOpenRouterServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-openrouter", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "MockOpenRouterServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+def main():
+    """Запуск заменителя из командной строки"""
+    parser = argparse.ArgumentParser(description="Локальный заменитель OpenRouter API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", default="lognormal:0.8:0.5",
+                        help="fixed:SEC | uniform:MIN:MAX | normal:MEAN:STD | lognormal:MEDIAN:SIGMA")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Доля ответов 429")
+    parser.add_argument("--rate-5xx", type=float, default=0.0, help="Доля ответов 502")
+    parser.add_argument("--rate-truncated", type=float, default=0.0, help="Доля ответов, обрезанных по max_tokens")
+    parser.add_argument("--rate-invalid", type=float, default=0.0, help="Доля ответов с невалидным JSON")
+    parser.add_argument("--rate-weak", type=float, default=0.0, help="Доля пустых ответов дешевой модели")
+    parser.add_argument("--retry-after", type=float, default=0.5, help="Retry-After для 429 (сек)")
+    parser.add_argument("--capacity", type=int, default=None,
+                        help="Запросов в обработке, сверх которых отвечать 429")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    settings = MockSettings(latency=args.latency, rate_429=args.rate_429, rate_5xx=args.rate_5xx,
+                            rate_truncated=args.rate_truncated, rate_invalid=args.rate_invalid,
+                            rate_weak=args.rate_weak, capacity=args.capacity,
+                            retry_after=args.retry_after, seed=args.seed)
+    server = MockOpenRouterServer(settings, args.host, args.port)
+    print(f"🧪 Mock OpenRouter: {server.url}")
+    print(f"   Задержка: {settings.latency}, 429: {settings.rate_429:.0%}, 5xx: {settings.rate_5xx:.0%}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n📊 {server.stats.snapshot()}")
+
+if __name__ == "__main__":
+    main()
@@ -6,9 +6,14 @@
 
 import os
 import sys
+import asyncio
 from typing import List, Optional
 from pathlib import Path
 
+from core.checkpoint import list_runs
+from core.dedup import find_near_duplicates
+from core.clustering import merge_entities, collect_entities
+
 class UserInterface:
     """Пользовательский интерфейс для анализатора в стиле Reporter Dashboard"""
     
@@ -74,9 +79,12 @@ class UserInterface:
         """Основной цикл интерфейса"""
         self._print_header()
         
+        # Проверка API и загрузка метаданных модели в фоне, пока загружается бриф
+        analyzer.start_warmup()
+        
         while True:
             self._show_main_menu()
-            choice = input(f"\n{self.colors['primary']}Выберите действие (1-7):{self.colors['background']} ").strip()
+            choice = input(f"\n{self.colors['primary']}Выберите действие (1-8):{self.colors['background']} ").strip()
             
             if choice == "1":
                 self._load_brief(analyzer)
@@ -103,6 +111,8 @@ class UserInterface:
                 else:
                     self._print_error("❌ Сначала проведите анализ!")
             elif choice == "7":
+                self._resume_analysis(analyzer)
+            elif choice == "8":
                 self._print_success("👋 До свидания!")
                 break
             else:
@@ -120,7 +130,8 @@ class UserInterface:
             "4. 📊 Показать результаты",
             "5. 📄 Сгенерировать отчеты",
             "6. 🔍 Детальный анализ",
-            "7. 🚪 Выход"
+            "7. ♻️ Продолжить прерванный анализ",
+            "8. 🚪 Выход"
         ]
         
         for item in menu_items:
@@ -272,17 +283,41 @@ class UserInterface:
         
         # Загрузка выбранных файлов
         self.transcripts = []
+        loaded_names = []
         for file_path in found_files:
             try:
                 with open(file_path, 'r', encoding='utf-8') as f:
                     content = f.read()
                     if content.strip():
                         self.transcripts.append(content.strip())
+                        loaded_names.append(file_path.name)
                         self._print_success(f"Загружен: {file_path.name}")
             except Exception as e:
                 self._print_error(f"Ошибка при загрузке {file_path.name}: {e}")
         
         self._print_success(f"Загружено {len(self.transcripts)} транскриптов")
+        self._check_duplicate_transcripts(loaded_names)
+    
+    def _check_duplicate_transcripts(self, names: List[str]):
+        """Поиск почти одинаковых транскриптов (один разговор в разных файлах)"""
+        if len(self.transcripts) < 2:
+            return
+        
+        report = find_near_duplicates(self.transcripts)
+        if not report.has_duplicates:
+            return
+        
+        self._print_warning(f"Найдено почти одинаковых транскриптов: {len(report.duplicates)}")
+        for index, (original, similarity) in sorted(report.duplicates.items()):
+            print(f"   ♊ {names[index]} ≈ {names[original]} (сходство {similarity:.0%})")
+        print(f"   Экономия при удалении: ~{report.saved_tokens:,} токенов")
+        
+        confirm = input(f"\n{self.colors['warning']}Удалить дубликаты? (y/n):{self.colors['background']} ").strip().lower()
+        if confirm == 'y':
+            self.transcripts = [self.transcripts[i] for i in report.kept]
+            self._print_success(f"Осталось {len(self.transcripts)} транскриптов")
+        else:
+            self._print_info("Перед анализом дубликаты обрабатываются по настройке drop_duplicates")
     
     def _load_demo_transcripts(self):
         """Загрузка демо транскриптов"""
@@ -336,8 +371,19 @@ class UserInterface:
         print(f"\n{self.colors['primary']}Выберите тип анализа:{self.colors['background']}")
         print("1. 🧠 Обычный анализ")
         print("2. ⚡ Параллельный анализ")
+        print("3. 🚀 Асинхронный анализ")
+        if self.analysis_result:
+            print(f"4. ➕ Добавить к текущим результатам ({self.analysis_result.total_interviews} интервью)")
+        
+        choice = input(f"\n{self.colors['primary']}Выберите (1-{4 if self.analysis_result else 3}):"
+                       f"{self.colors['background']} ").strip()
         
-        choice = input(f"\n{self.colors['primary']}Выберите (1-2):{self.colors['background']} ").strip()
+        print(f"\n{self.colors['primary']}Режим извлечения:{self.colors['background']}")
+        print("1. 🧩 Поэтапный (отдельный запрос на каждый этап)")
+        print("2. 🎯 Объединенный (один запрос на интервью)")
+        
+        mode_choice = input(f"\n{self.colors['primary']}Выберите (1-2):{self.colors['background']} ").strip()
+        extraction_mode = "fused" if mode_choice == "2" else "staged"
         
         confirm = input(f"\n{self.colors['warning']}Начать анализ? (y/n):{self.colors['background']} ").strip().lower()
         if confirm != 'y':
@@ -351,10 +397,18 @@ class UserInterface:
             print(f"\n{self.colors['primary']}📈 Прогресс анализа:{self.colors['background']}")
             self._print_progress_bar(0, 100)
             
-            if choice == "2":
-                self.analysis_result = analyzer.analyze_transcripts_parallel(self.transcripts)
+            if choice == "4" and self.analysis_result:
+                self.analysis_result = analyzer.add_transcripts(
+                    self.analysis_result, self.transcripts, extraction_mode=extraction_mode)
+            elif choice == "2":
+                self.analysis_result = analyzer.analyze_transcripts_parallel(
+                    self.transcripts, extraction_mode=extraction_mode)
+            elif choice == "3":
+                self.analysis_result = asyncio.run(analyzer.analyze_transcripts_async(
+                    self.transcripts, extraction_mode=extraction_mode))
             else:
-                self.analysis_result = analyzer.analyze_transcripts(self.transcripts)
+                self.analysis_result = analyzer.analyze_transcripts(
+                    self.transcripts, extraction_mode=extraction_mode)
                 
             self._print_success("Анализ завершен успешно!")
             
@@ -362,6 +416,34 @@ class UserInterface:
             self._print_error(f"Ошибка при анализе: {e}")
             self.analysis_result = None
     
+    def _resume_analysis(self, analyzer):
+        """Продолжение прерванного анализа из контрольной точки"""
+        if not analyzer.checkpoint_dir:
+            self._print_error("❌ Контрольные точки отключены в настройках (checkpoint_enabled)")
+            return
+        
+        runs = [run for run in list_runs(analyzer.checkpoint_dir) if run['status'] != 'complete']
+        if not runs:
+            self._print_info("Нет прерванных прогонов")
+            return
+        
+        self._print_card("ПРЕРВАННЫЕ ПРОГОНЫ", "Выберите прогон для продолжения")
+        for i, run in enumerate(runs[:10], 1):
+            print(f"{i}. {run['run_id']}: готово {run['completed_interviews']}/{run['total_interviews']} интервью, "
+                  f"шагов: {run['saved_steps']}")
+        
+        choice = input(f"\n{self.colors['primary']}Выберите (1-{min(len(runs), 10)}):{self.colors['background']} ").strip()
+        if not choice.isdigit() or not 1 <= int(choice) <= min(len(runs), 10):
+            self._print_error("Неверный выбор!")
+            return
+        
+        try:
+            self._print_info("♻️ Продолжение анализа...")
+            self.analysis_result = analyzer.resume_analysis(runs[int(choice) - 1]['run_dir'])
+            self._print_success("Анализ завершен успешно!")
+        except Exception as e:
+            self._print_error(f"Ошибка при анализе: {e}")
+    
     def _show_analysis_results(self):
         """Показать результаты анализа в стиле AnalysisScreen"""
         if not self.analysis_result:
@@ -380,9 +462,14 @@ class UserInterface:
             ("Интервью проанализировано", str(result.total_interviews)),
             ("Время анализа", f"{result.analysis_duration:.1f} сек"),
             ("API вызовов", str(result.api_calls)),
-            ("Примерная стоимость", f"${result.total_cost:.4f}")
+            ("Стоимость", f"${result.total_cost:.4f}")
         ]
         
+        usage = result.token_usage
+        if usage:
+            metrics.append(("Токены (ввод / вывод)",
+                            f"{usage.get('prompt_tokens', 0)} / {usage.get('completion_tokens', 0)}"))
+        
         for label, value in metrics:
             self._print_metric(label, value, "📊")
         
@@ -487,10 +574,8 @@ class UserInterface:
             print(f"\n   Описание: {description[:200]}...")
     
     def _show_pain_points(self):
-        """Показать точки боли"""
-        all_pains = []
-        for summary in self.analysis_result.interview_summaries:
-            all_pains.extend(summary.pain_points or [])
+        """Показать точки боли (одинаковые боли разных интервью объединены)"""
+        all_pains = merge_entities(collect_entities(self.analysis_result.interview_summaries, 'pain_points'), ['pain'])
         
         if not all_pains:
             self._print_error("Точки боли не найдены!")
@@ -524,6 +609,7 @@ class UserInterface:
                 
                 pain_data = [
                     ("Тип", pain.get('pain_type', 'N/A')),
+                    ("Интервью", ", ".join(map(str, pain.get('interview_ids', []))) or 'N/A'),
                     ("Контекст", pain.get('context', 'N/A')[:80] + "..." if len(pain.get('context', '')) > 80 else pain.get('context', 'N/A'))
                 ]
                 
@@ -532,10 +618,8 @@ class UserInterface:
                         self._print_metric(f"      {label}", value, "📊")
     
     def _show_needs(self):
-        """Показать потребности"""
-        all_needs = []
-        for summary in self.analysis_result.interview_summaries:
-            all_needs.extend(summary.needs or [])
+        """Показать потребности (одинаковые потребности разных интервью объединены)"""
+        all_needs = merge_entities(collect_entities(self.analysis_result.interview_summaries, 'needs'), ['need'])
         
         if not all_needs:
             self._print_error("Потребности не найдены!")
@@ -752,7 +836,10 @@ class UserInterface:
                     'total_interviews': self.analysis_result.total_interviews,
                     'analysis_duration': self.analysis_result.analysis_duration,
                     'api_calls': self.analysis_result.api_calls,
-                    'total_cost': self.analysis_result.total_cost
+                    'total_cost': self.analysis_result.total_cost,
+                    'token_usage': self.analysis_result.token_usage,
+                    'usage_ledger': self.analysis_result.usage_ledger,
+                    'run_metadata': self.analysis_result.run_metadata
                 },
                 'interview_summaries': [
                     {